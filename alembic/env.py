@@ -22,8 +22,27 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 from movie_listing_app.database import Base
+from movie_listing_app import models  # noqa: F401, registers the tables on Base.metadata
 target_metadata = Base.metadata
 
+# objects of the full-text search, created by raw DDL (movie_listing_app.models.MOVIE_SEARCH_DDL)
+# and unknown to the metadata, so autogenerate would otherwise emit drops for them: the SQLite
+# FTS5 table with its shadow tables (movies_fts_data, ...) and the PostgreSQL tsvector column
+# with its GIN index. The SQLite triggers are not compared by autogenerate.
+SEARCH_COLUMNS = {"search_vector"}
+SEARCH_INDEXES = {"ix_movies_search_vector"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "table" and name is not None and (name == "movies_fts" or name.startswith("movies_fts_")):
+        return False
+    if type_ == "column" and name in SEARCH_COLUMNS and object.table.name == "movies":
+        return False
+    if type_ == "index" and name in SEARCH_INDEXES:
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -49,6 +68,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -70,7 +90,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
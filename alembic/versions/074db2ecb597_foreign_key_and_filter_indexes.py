@@ -0,0 +1,50 @@
+"""foreign key and filter indexes
+
+Revision ID: 074db2ecb597
+Revises: bcd398d42e23
+Create Date: 2026-10-18 16:22:40.381554
+
+Indexes the foreign keys and filter columns the crud lookups use:
+ratings by movie, user and score, comments by movie, user and parent,
+and movies by owner.
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY, so
+the tables stay writable while they build. That cannot run inside a
+transaction, so this revision runs outside of one. If a build fails it
+leaves an INVALID index behind, drop it before running the upgrade
+again.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '074db2ecb597'
+down_revision: Union[str, None] = 'bcd398d42e23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_ratings_movie_id', 'ratings', ['movie_id']),
+    ('ix_ratings_user_id', 'ratings', ['user_id']),
+    ('ix_ratings_rating', 'ratings', ['rating']),
+    ('ix_comments_movie_id', 'comments', ['movie_id']),
+    ('ix_comments_user_id', 'comments', ['user_id']),
+    ('ix_comments_parent_comment_id', 'comments', ['parent_comment_id']),
+    ('ix_movies_owner_id', 'movies', ['owner_id']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
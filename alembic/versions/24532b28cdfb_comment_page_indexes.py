@@ -0,0 +1,49 @@
+"""comment page indexes
+
+Revision ID: 24532b28cdfb
+Revises: 46f49e8e2654
+Create Date: 2026-10-18 19:05:12.204117
+
+Composite indexes for the cursor-paginated comment pages: the top-level
+comments of a movie by (movie_id, created_at, id), partial on
+parent_comment_id IS NULL, and the replies of a comment by
+(parent_comment_id, created_at, id), which replaces
+ix_comments_parent_comment_id.
+
+Built with CREATE INDEX CONCURRENTLY on PostgreSQL, outside of a
+transaction, like 074db2ecb597.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '24532b28cdfb'
+down_revision: Union[str, None] = '46f49e8e2654'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TOP_LEVEL = sa.text('parent_comment_id IS NULL')
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_comments_movie_id_created_at_id', 'comments', ['movie_id', 'created_at', 'id'],
+            postgresql_where=TOP_LEVEL, sqlite_where=TOP_LEVEL, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_comments_parent_comment_id_created_at_id', 'comments', ['parent_comment_id', 'created_at', 'id'],
+            postgresql_concurrently=True,
+        )
+        op.drop_index('ix_comments_parent_comment_id', table_name='comments', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_comments_parent_comment_id', 'comments', ['parent_comment_id'], postgresql_concurrently=True)
+        op.drop_index('ix_comments_parent_comment_id_created_at_id', table_name='comments', postgresql_concurrently=True)
+        op.drop_index('ix_comments_movie_id_created_at_id', table_name='comments', postgresql_concurrently=True)
@@ -0,0 +1,71 @@
+"""movie full text search
+
+Revision ID: 3c5f8e2a7d41
+Revises: 9e996f0cb74a
+Create Date: 2026-10-18 11:20:03.442715
+
+PostgreSQL gets a generated, weighted ``movies.search_vector`` tsvector
+column with a GIN index. SQLite gets an external content FTS5 table,
+the triggers that keep it in sync with ``movies`` and an initial build
+from the existing rows.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c5f8e2a7d41'
+down_revision: Union[str, None] = '9e996f0cb74a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(
+            "ALTER TABLE movies ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(genre, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(synopsis, '')), 'C')) STORED"
+        )
+        op.execute("CREATE INDEX ix_movies_search_vector ON movies USING GIN (search_vector)")
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE movies_fts USING fts5("
+            "title, genre, synopsis, content='movies', content_rowid='id', tokenize='porter unicode61')"
+        )
+        op.execute(
+            "CREATE TRIGGER movies_fts_insert AFTER INSERT ON movies BEGIN "
+            "INSERT INTO movies_fts(rowid, title, genre, synopsis) VALUES (new.id, new.title, new.genre, new.synopsis); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER movies_fts_delete AFTER DELETE ON movies BEGIN "
+            "INSERT INTO movies_fts(movies_fts, rowid, title, genre, synopsis) "
+            "VALUES ('delete', old.id, old.title, old.genre, old.synopsis); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER movies_fts_update AFTER UPDATE OF title, genre, synopsis ON movies BEGIN "
+            "INSERT INTO movies_fts(movies_fts, rowid, title, genre, synopsis) "
+            "VALUES ('delete', old.id, old.title, old.genre, old.synopsis); "
+            "INSERT INTO movies_fts(rowid, title, genre, synopsis) VALUES (new.id, new.title, new.genre, new.synopsis); "
+            "END"
+        )
+        op.execute("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX ix_movies_search_vector")
+        op.execute("ALTER TABLE movies DROP COLUMN search_vector")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER movies_fts_update")
+        op.execute("DROP TRIGGER movies_fts_delete")
+        op.execute("DROP TRIGGER movies_fts_insert")
+        op.execute("DROP TABLE movies_fts")
@@ -0,0 +1,66 @@
+"""one rating per user and movie
+
+Revision ID: 46f49e8e2654
+Revises: 074db2ecb597
+Create Date: 2026-10-18 17:04:55.918237
+
+Adds the unique ``(user_id, movie_id)`` index rating upserts conflict
+on. It leads with user_id, so it replaces ``ix_ratings_user_id``.
+
+Duplicate ratings are removed first, keeping each user's latest rating
+of a movie, and the aggregates of the movies that had duplicates are
+recomputed (leaderboard scores with the default settings). The removed
+ratings are not restored by the downgrade.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '46f49e8e2654'
+down_revision: Union[str, None] = '074db2ecb597'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the default leaderboard settings at the time of this revision
+PRIOR_MEAN = 3.0
+MIN_VOTES = 10
+SCORES = (1, 2, 3, 4, 5)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    duplicated = [
+        movie_id for (movie_id,) in bind.execute(sa.text(
+            "SELECT DISTINCT movie_id FROM ratings GROUP BY user_id, movie_id HAVING COUNT(*) > 1"
+        ))
+    ]
+    if duplicated:
+        bind.execute(sa.text(
+            "DELETE FROM ratings WHERE id NOT IN (SELECT MAX(id) FROM ratings GROUP BY user_id, movie_id)"
+        ))
+
+        def total(expression: str, condition: str = "") -> str:
+            return f"(SELECT {expression} FROM ratings WHERE ratings.movie_id = movies.id{condition})"
+
+        assignments = [
+            f"rating_sum = {total('COALESCE(SUM(rating), 0)')}",
+            f"rating_count = {total('COUNT(*)')}",
+            f"rating = {total('AVG(rating)')}",
+            f"weighted_rating = {total(f'(SUM(rating) + {PRIOR_MEAN * MIN_VOTES}) / (COUNT(*) + {MIN_VOTES})')}",
+        ] + [f"rating_{score}_count = {total('COUNT(*)', f' AND rating = {score}')}" for score in SCORES]
+        bind.execute(
+            sa.text(f"UPDATE movies SET {', '.join(assignments)} WHERE id IN :movie_ids")
+            .bindparams(sa.bindparam('movie_ids', duplicated, expanding=True))
+        )
+
+    op.create_index('uq_ratings_user_id_movie_id', 'ratings', ['user_id', 'movie_id'], unique=True)
+    op.drop_index('ix_ratings_user_id', table_name='ratings')
+
+
+def downgrade() -> None:
+    op.create_index('ix_ratings_user_id', 'ratings', ['user_id'])
+    op.drop_index('uq_ratings_user_id_movie_id', table_name='ratings')
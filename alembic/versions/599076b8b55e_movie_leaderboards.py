@@ -0,0 +1,51 @@
+"""movie leaderboards
+
+Revision ID: 599076b8b55e
+Revises: a08ccabf240c
+Create Date: 2026-10-18 15:10:26.774410
+
+Adds ``movies.weighted_rating``, the Bayesian average the leaderboards
+rank by, and ``movies.release_decade``, with the indexes the overall,
+per genre and per decade leaderboards are read from. Both columns are
+filled from the existing rows; the scores use the default leaderboard
+settings, run ``python -m movie_listing_app.cli refresh-leaderboards``
+afterwards when LEADERBOARD_PRIOR_MEAN or LEADERBOARD_MIN_VOTES are set.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '599076b8b55e'
+down_revision: Union[str, None] = 'a08ccabf240c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the default leaderboard settings at the time of this revision
+PRIOR_MEAN = 3.0
+MIN_VOTES = 10
+
+
+def upgrade() -> None:
+    op.add_column('movies', sa.Column('release_decade', sa.Integer(), nullable=True))
+    op.add_column('movies', sa.Column('weighted_rating', sa.Float(), nullable=True))
+    op.execute("UPDATE movies SET release_decade = release_year / 10 * 10 WHERE release_year IS NOT NULL")
+    op.execute(
+        "UPDATE movies SET weighted_rating = "
+        f"(CAST(rating_sum AS FLOAT) + {PRIOR_MEAN * MIN_VOTES}) / (rating_count + {MIN_VOTES}) "
+        "WHERE rating_count > 0"
+    )
+    op.create_index('ix_movies_weighted_rating_id', 'movies', ['weighted_rating', 'id'])
+    op.create_index('ix_movies_genre_weighted_rating_id', 'movies', ['genre', 'weighted_rating', 'id'])
+    op.create_index('ix_movies_release_decade_weighted_rating_id', 'movies', ['release_decade', 'weighted_rating', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_movies_release_decade_weighted_rating_id', table_name='movies')
+    op.drop_index('ix_movies_genre_weighted_rating_id', table_name='movies')
+    op.drop_index('ix_movies_weighted_rating_id', table_name='movies')
+    op.drop_column('movies', 'weighted_rating')
+    op.drop_column('movies', 'release_decade')
@@ -0,0 +1,41 @@
+"""comment counters
+
+Revision ID: 99f055edfecd
+Revises: 24532b28cdfb
+Create Date: 2026-10-18 20:41:09.517362
+
+Adds ``movies.comment_count`` (every comment on the movie, replies
+included) and ``comments.reply_count`` (direct replies), which comment
+writes now keep up to date, and fills them from the existing comments.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '99f055edfecd'
+down_revision: Union[str, None] = '24532b28cdfb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('movies', sa.Column('comment_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('comments', sa.Column('reply_count', sa.Integer(), nullable=False, server_default='0'))
+    # only the rows with comments need a count, the others keep the default
+    op.execute(
+        "UPDATE movies SET comment_count = (SELECT COUNT(*) FROM comments WHERE comments.movie_id = movies.id) "
+        "WHERE id IN (SELECT movie_id FROM comments)"
+    )
+    op.execute(
+        "UPDATE comments SET reply_count = (SELECT COUNT(*) FROM comments AS replies WHERE replies.parent_comment_id = comments.id) "
+        "WHERE id IN (SELECT parent_comment_id FROM comments WHERE parent_comment_id IS NOT NULL)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('comments', 'reply_count')
+    op.drop_column('movies', 'comment_count')
@@ -0,0 +1,70 @@
+"""movie normalized title
+
+Revision ID: 9e996f0cb74a
+Revises: a485e58a70ae
+Create Date: 2026-10-18 10:31:55.870164
+
+Adds the indexed ``movies.title_normalized`` column that title lookups
+go through, backfilled from the existing titles.
+
+"""
+from typing import Sequence, Union
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e996f0cb74a'
+down_revision: Union[str, None] = 'a485e58a70ae'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+movies = sa.table(
+    'movies',
+    sa.column('id', sa.Integer),
+    sa.column('title', sa.String),
+    sa.column('title_normalized', sa.String),
+)
+
+
+def normalize_title(title: str) -> str:
+    # frozen copy of movie_listing_app.models.normalize_title
+    folded = unicodedata.normalize("NFKC", unicodedata.normalize("NFKC", title).casefold())
+    return " ".join(folded.split())
+
+
+def upgrade() -> None:
+    op.add_column('movies', sa.Column('title_normalized', sa.String(), nullable=True))
+
+    bind = op.get_bind()
+    update = (
+        movies.update()
+        .where(movies.c.id == sa.bindparam('movie_id'))
+        .values(title_normalized=sa.bindparam('normalized'))
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(movies.c.id, movies.c.title)
+            .where(movies.c.id > last_id)
+            .order_by(movies.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(update, [{'movie_id': row.id, 'normalized': normalize_title(row.title)} for row in rows])
+        last_id = rows[-1].id
+
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.alter_column('title_normalized', existing_type=sa.String(), nullable=False)
+    op.create_index('ix_movies_title_normalized', 'movies', ['title_normalized'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_movies_title_normalized', table_name='movies')
+    with op.batch_alter_table('movies') as batch_op:
+        batch_op.drop_column('title_normalized')
@@ -0,0 +1,36 @@
+"""movie filter indexes
+
+Revision ID: a08ccabf240c
+Revises: e4d7a1c06b93
+Create Date: 2026-10-18 14:32:51.608214
+
+Composite indexes behind ``GET /movies/filter``: the keyset order on the
+normalized title, and genre-leading variants of the rating, release year
+and title orderings so a genre filter reads its page from one index range.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a08ccabf240c'
+down_revision: Union[str, None] = 'e4d7a1c06b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_movies_title_normalized_id', 'movies', ['title_normalized', 'id'])
+    op.create_index('ix_movies_genre_rating_id', 'movies', ['genre', 'rating', 'id'])
+    op.create_index('ix_movies_genre_release_year_id', 'movies', ['genre', 'release_year', 'id'])
+    op.create_index('ix_movies_genre_title_normalized_id', 'movies', ['genre', 'title_normalized', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_movies_genre_title_normalized_id', table_name='movies')
+    op.drop_index('ix_movies_genre_release_year_id', table_name='movies')
+    op.drop_index('ix_movies_genre_rating_id', table_name='movies')
+    op.drop_index('ix_movies_title_normalized_id', table_name='movies')
@@ -0,0 +1,31 @@
+"""movie keyset indexes
+
+Revision ID: a485e58a70ae
+Revises: b89a246afb0c
+Create Date: 2026-10-18 09:48:07.114902
+
+Composite indexes behind keyset pagination of ``GET /movies/`` when it
+is ordered by rating or release year, with the id as the tie breaker.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a485e58a70ae'
+down_revision: Union[str, None] = 'b89a246afb0c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_movies_rating_id', 'movies', ['rating', 'id'])
+    op.create_index('ix_movies_release_year_id', 'movies', ['release_year', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_movies_release_year_id', table_name='movies')
+    op.drop_index('ix_movies_rating_id', table_name='movies')
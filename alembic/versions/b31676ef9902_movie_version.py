@@ -0,0 +1,30 @@
+"""movie version
+
+Revision ID: b31676ef9902
+Revises: d57d636e858e
+Create Date: 2026-10-18 22:03:17.640271
+
+Adds ``movies.version``, incremented by every write to a movie, its
+ratings or its comments. The ETags of the movie, rating and comment
+reads derive from it. Existing movies start at version 1.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b31676ef9902'
+down_revision: Union[str, None] = 'd57d636e858e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('movies', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    op.drop_column('movies', 'version')
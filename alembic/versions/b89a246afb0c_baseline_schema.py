@@ -0,0 +1,99 @@
+"""baseline schema
+
+Revision ID: b89a246afb0c
+Revises: 
+Create Date: 2026-10-18 09:12:41.503218
+
+Creates the tables as they were originally built by
+``Base.metadata.create_all``. Databases that were created that way
+already have this schema and only need ``alembic stamp b89a246afb0c``
+before upgrading. Foreign keys carry the names PostgreSQL gives
+unnamed constraints so later revisions can address them on both kinds
+of database.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b89a246afb0c'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('first_name', sa.String(), nullable=False),
+        sa.Column('last_name', sa.String(), nullable=False),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=False),
+        sa.Column('role', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id', name='users_pkey'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table(
+        'movies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('release_year', sa.Integer(), nullable=True),
+        sa.Column('genre', sa.String(), nullable=True),
+        sa.Column('rating', sa.Float(), nullable=True),
+        sa.Column('synopsis', sa.Text(), nullable=True),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], name='movies_owner_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='movies_pkey'),
+    )
+    op.create_index('ix_movies_id', 'movies', ['id'])
+    op.create_index('ix_movies_title', 'movies', ['title'])
+
+    op.create_table(
+        'comments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('movie_id', sa.Integer(), nullable=False),
+        sa.Column('comment', sa.Text(), nullable=False),
+        sa.Column('parent_comment_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='comments_user_id_fkey'),
+        sa.ForeignKeyConstraint(['movie_id'], ['movies.id'], name='comments_movie_id_fkey'),
+        sa.ForeignKeyConstraint(['parent_comment_id'], ['comments.id'], name='comments_parent_comment_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='comments_pkey'),
+    )
+    op.create_index('ix_comments_id', 'comments', ['id'])
+
+    op.create_table(
+        'ratings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('movie_id', sa.Integer(), nullable=False),
+        sa.Column('rating', sa.Integer(), nullable=False),
+        sa.Column('review', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='ratings_user_id_fkey'),
+        sa.ForeignKeyConstraint(['movie_id'], ['movies.id'], name='ratings_movie_id_fkey'),
+        sa.PrimaryKeyConstraint('id', name='ratings_pkey'),
+    )
+    op.create_index('ix_ratings_id', 'ratings', ['id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ratings_id', table_name='ratings')
+    op.drop_table('ratings')
+    op.drop_index('ix_comments_id', table_name='comments')
+    op.drop_table('comments')
+    op.drop_index('ix_movies_title', table_name='movies')
+    op.drop_index('ix_movies_id', table_name='movies')
+    op.drop_table('movies')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
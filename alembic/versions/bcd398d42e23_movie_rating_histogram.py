@@ -0,0 +1,41 @@
+"""movie rating histogram
+
+Revision ID: bcd398d42e23
+Revises: 599076b8b55e
+Create Date: 2026-10-18 15:48:12.530967
+
+Adds ``movies.rating_1_count`` to ``movies.rating_5_count``, the number
+of ratings of each score that the rating statistics are computed from,
+and fills them from the existing ratings.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bcd398d42e23'
+down_revision: Union[str, None] = '599076b8b55e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCORES = (1, 2, 3, 4, 5)
+
+
+def upgrade() -> None:
+    for score in SCORES:
+        op.add_column('movies', sa.Column(f'rating_{score}_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute(
+        "UPDATE movies SET " + ", ".join(
+            f"rating_{score}_count = (SELECT COUNT(*) FROM ratings "
+            f"WHERE ratings.movie_id = movies.id AND ratings.rating = {score})"
+            for score in SCORES
+        ) + " WHERE rating_count > 0"
+    )
+
+
+def downgrade() -> None:
+    for score in reversed(SCORES):
+        op.drop_column('movies', f'rating_{score}_count')
@@ -0,0 +1,50 @@
+"""cascade movie deletes
+
+Revision ID: d57d636e858e
+Revises: 99f055edfecd
+Create Date: 2026-10-18 21:12:40.204815
+
+Recreates the foreign keys of ``ratings.movie_id``,
+``comments.movie_id`` and ``comments.parent_comment_id`` with
+``ON DELETE CASCADE``, so the database removes a deleted movie's
+ratings and comments (and a deleted comment's replies) instead of the
+ORM loading and deleting them one by one. SQLite rebuilds the two
+tables, and only enforces the constraints on connections that enable
+``PRAGMA foreign_keys``.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd57d636e858e'
+down_revision: Union[str, None] = '99f055edfecd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, constraint, column, referred table)
+FOREIGN_KEYS = [
+    ('ratings', 'ratings_movie_id_fkey', 'movie_id', 'movies'),
+    ('comments', 'comments_movie_id_fkey', 'movie_id', 'movies'),
+    ('comments', 'comments_parent_comment_id_fkey', 'parent_comment_id', 'comments'),
+]
+
+
+def replace_foreign_keys(ondelete: Union[str, None]) -> None:
+    for table in ('ratings', 'comments'):
+        with op.batch_alter_table(table) as batch_op:
+            for fk_table, name, column, referred in FOREIGN_KEYS:
+                if fk_table == table:
+                    batch_op.drop_constraint(name, type_='foreignkey')
+                    batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    replace_foreign_keys('CASCADE')
+
+
+def downgrade() -> None:
+    replace_foreign_keys(None)
@@ -0,0 +1,38 @@
+"""movie rating aggregates
+
+Revision ID: e4d7a1c06b93
+Revises: 3c5f8e2a7d41
+Create Date: 2026-10-18 12:05:37.219840
+
+Adds ``movies.rating_sum`` and ``movies.rating_count``, the running
+totals rating writes now update incrementally, and fills them (and
+``movies.rating``) from the existing ratings.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4d7a1c06b93'
+down_revision: Union[str, None] = '3c5f8e2a7d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('movies', sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('movies', sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute(
+        "UPDATE movies SET "
+        "rating_sum = COALESCE((SELECT SUM(ratings.rating) FROM ratings WHERE ratings.movie_id = movies.id), 0), "
+        "rating_count = (SELECT COUNT(*) FROM ratings WHERE ratings.movie_id = movies.id), "
+        "rating = (SELECT AVG(ratings.rating) FROM ratings WHERE ratings.movie_id = movies.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('movies', 'rating_count')
+    op.drop_column('movies', 'rating_sum')
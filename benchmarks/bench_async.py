@@ -0,0 +1,122 @@
+# benchmarks/bench_async.py
+# Read endpoint throughput at high concurrency, threadpool sessions compared with async sessions
+# (DATABASE_ASYNC). requests go through the ASGI app in process, so only the app and the database count.
+# run with: python -m benchmarks.bench_async [--requests N] [--concurrency N] [--database-url URL]
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")  # the app engine is not used here
+
+import httpx
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from movie_listing_app import crud, database, models
+from movie_listing_app.database import Base
+from movie_listing_app.dependencies import get_read_db
+from movie_listing_app.main import app
+
+GENRES = ("Drama", "Comedy", "Sci-Fi", "Horror")
+
+
+def seed(engine, movies: int):
+    with engine.begin() as conn:
+        owner_id = conn.execute(
+            insert(models.User).values(first_name="bench", last_name="owner", username="bench", email="bench@example.com", password="x")
+            .returning(models.User.id)
+        ).scalar_one()
+        conn.execute(insert(models.Movie), [
+            {"title": f"Bench Movie {index}", "title_normalized": f"bench movie {index}", "release_year": 1950 + index % 75,
+             "genre": GENRES[index % 4], "owner_id": owner_id, "rating_sum": 0, "rating_count": 0}
+            for index in range(movies)
+        ])
+        conn.execute(insert(models.Rating), [
+            {"rating": 1 + index % 5, "user_id": owner_id, "movie_id": index + 1} for index in range(movies)
+        ])
+        crud_session = sessionmaker(bind=conn)()
+        crud.recompute_movie_ratings(crud_session)
+        crud_session.flush()
+
+
+async def run(label: str, requests: int, concurrency: int):
+    paths = [f"/movies/-/filter?genre={GENRES[index % 4]}&sort=rating&limit=20" for index in range(requests)]
+    timings = []
+    transport = httpx.ASGITransport(app=app) # type: ignore
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(paths[0])  # warm up the pool and the statement cache
+        pending = iter(paths)
+
+        async def worker():
+            for path in pending:
+                start = time.perf_counter()
+                response = await client.get(path)
+                timings.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    timings.sort()
+    print(
+        f"{label:<10} {requests / elapsed:8.1f} requests/s   "
+        f"median {statistics.median(timings) * 1000:8.2f} ms   "
+        f"p99 {timings[int(len(timings) * 0.99) - 1] * 1000:8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_async")
+    parser.add_argument("--requests", type=int, default=2000, help="requests sent per mode")
+    parser.add_argument("--concurrency", type=int, default=200, help="requests in flight at once")
+    parser.add_argument("--movies", type=int, default=10000, help="movies in the catalog")
+    parser.add_argument("--database-url", help="empty database to run against, a temporary SQLite file by default")
+    args = parser.parse_args()
+    # the request logging would dominate the timings
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.database_url or f"sqlite:///{directory}/bench.db"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine)
+        seed(engine, args.movies)
+        print(f"{args.requests} requests, {args.concurrency} concurrent, {args.movies} movies ({engine.url.get_backend_name()})")
+
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+        def get_threadpool_db():
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_read_db] = get_threadpool_db
+        asyncio.run(run("threadpool", args.requests, args.concurrency))
+
+        async def benchmark_async():
+            async_engine = create_async_engine(database.async_database_url(url))
+            AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+            async def get_async_db():
+                async with AsyncSessionLocal() as db:
+                    yield db
+
+            app.dependency_overrides[get_read_db] = get_async_db
+            try:
+                await run("async", args.requests, args.concurrency)
+            finally:
+                await async_engine.dispose()
+
+        asyncio.run(benchmark_async())
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_import.py
+# Bulk movie import throughput, compared with creating the same movies one at a time.
+# run with: python -m benchmarks.bench_import [--rows N] [--batch-size N] [--database-url URL]
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")  # the app engine is not used here
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from movie_listing_app import crud, importer, models, schemas
+from movie_listing_app.database import Base
+
+
+def ndjson_lines(count: int, prefix: str):
+    for index in range(count):
+        yield json.dumps({
+            "title": f"{prefix} Movie {index}",
+            "release_year": 1950 + index % 75,
+            "genre": ("Drama", "Comedy", "Sci-Fi", "Horror")[index % 4],
+            "synopsis": f"Synopsis of movie number {index}, long enough to be indexed for search.",
+        }) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_import")
+    parser.add_argument("--rows", type=int, default=100000, help="rows imported in bulk")
+    parser.add_argument("--single-rows", type=int, default=1000, help="rows created one at a time for comparison")
+    parser.add_argument("--batch-size", type=int, default=importer.DEFAULT_BATCH_SIZE)
+    parser.add_argument("--database-url", help="empty database to run against, a temporary SQLite file by default")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(args.database_url or f"sqlite:///{directory}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+        with engine.begin() as conn:
+            owner_id = conn.execute(insert(models.User).values(
+                first_name="bench", last_name="owner", username="bench", email="bench@example.com", password="x"
+            ).returning(models.User.id)).scalar_one()
+
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            for line in ndjson_lines(args.single_rows, "Single"):
+                crud.create_movie(db, schemas.MovieCreate.model_validate_json(line), user_id=owner_id)
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            report = importer.import_movies(
+                db, ndjson_lines(args.rows, "Bulk"), format="ndjson", owner_id=owner_id, batch_size=args.batch_size
+            )
+            bulk = time.perf_counter() - start
+        finally:
+            db.close()
+        engine.dispose()
+
+    print(f"one at a time  {args.single_rows / single:10.0f} movies/s")
+    print(f"bulk import    {report['imported'] / bulk:10.0f} movies/s ({report['imported']} rows, batches of {args.batch_size})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_lookups.py
+# Per-call cost of the hot crud lookups, with the prebuilt statements compared with the legacy
+# db.query(...).filter(...).first() form they replaced. the database is a small in-memory SQLite,
+# so the timings are dominated by the Python side of building and executing the query.
+# run with: python -m benchmarks.bench_lookups [--calls N]
+
+import argparse
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")  # the app engine is not used here
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from movie_listing_app import crud, models
+from movie_listing_app.database import Base
+
+
+def legacy_get_user_by_username(db, username: str):
+    return db.query(models.User).filter(models.User.username == username).first()
+
+
+def legacy_get_movie_by_id(db, movie_id: int):
+    return db.query(models.Movie).options(crud.MOVIE_OWNER_LOADER).filter(models.Movie.id == movie_id).first()
+
+
+def legacy_get_movie_by_title(db, title: str):
+    return (
+        db.query(models.Movie).options(crud.MOVIE_OWNER_LOADER)
+        .filter(models.Movie.title_normalized == models.normalize_title(title)).first()
+    )
+
+
+LOOKUPS = [
+    ("get_user_by_username", legacy_get_user_by_username, crud.get_user_by_username, "bench7"),
+    ("get_movie_by_id", legacy_get_movie_by_id, crud.get_movie_by_id, 7),
+    ("get_movie_by_title", legacy_get_movie_by_title, crud.get_movie_by_title, "Bench Movie 7"),
+]
+
+
+def seed(engine, count: int):
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"first_name": "bench", "last_name": "user", "username": f"bench{i}", "email": f"bench{i}@example.com", "password": "x"}
+            for i in range(count)
+        ])
+        conn.execute(insert(models.Movie), [
+            {"title": f"Bench Movie {i}", "title_normalized": f"bench movie {i}", "owner_id": 1 + i, "rating_sum": 0, "rating_count": 0}
+            for i in range(count)
+        ])
+
+
+def per_call(session_factory, lookup, argument, calls: int):
+    db = session_factory()
+    try:
+        lookup(db, argument)  # warm up the compiled cache
+        start = time.perf_counter()
+        for _ in range(calls):
+            lookup(db, argument)
+            db.expunge_all()  # every request starts with an empty session
+        return (time.perf_counter() - start) / calls
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_lookups")
+    parser.add_argument("--calls", type=int, default=20000, help="calls per lookup and implementation")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    seed(engine, 100)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+    print(f"{args.calls} calls per lookup")
+    for name, legacy, current, argument in LOOKUPS:
+        before = per_call(session_factory, legacy, argument, args.calls)
+        after = per_call(session_factory, current, argument, args.calls)
+        print(f"{name:<22} legacy {before * 1e6:7.1f} us   prebuilt {after * 1e6:7.1f} us   {(1 - after / before) * 100:5.1f}% less")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/bench_writes.py
+# Rating write path: latency and statements per rating, compared with the previous
+# add/commit/refresh/AVG/commit/refresh implementation.
+# run with: python -m benchmarks.bench_writes [--ratings N] [--existing N] [--database-url URL]
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")  # the app engine is not used here
+
+from sqlalchemy import create_engine, event, func, insert
+from sqlalchemy.orm import sessionmaker
+from movie_listing_app import crud, models, schemas
+from movie_listing_app.database import Base
+
+
+def legacy_create_rating(db, rating: schemas.RatingCreate, user_id: int):
+    # the write path before ratings were written in a single transaction
+    db_rating = models.Rating(rating=rating.rating, review=rating.review, user_id=user_id, movie_id=rating.movie_id)
+    db.add(db_rating)
+    db.commit()
+    db.refresh(db_rating)
+    avg_rating = db.query(func.avg(models.Rating.rating)).filter(models.Rating.movie_id == rating.movie_id).scalar()
+    db_movie = db.query(models.Movie).filter(models.Movie.id == rating.movie_id).first()
+    db_movie.rating = avg_rating
+    db.commit()
+    db.refresh(db_movie)
+    return db_rating
+
+
+def seed(engine, users: int, existing: int):
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"first_name": "bench", "last_name": "user", "username": f"bench{i}", "email": f"bench{i}@example.com", "password": "x"}
+            for i in range(users)
+        ])
+        user_ids = [row.id for row in conn.execute(models.User.__table__.select().order_by(models.User.id))]
+        movie_ids = []
+        for title in ("Legacy Benchmark", "Current Benchmark"):
+            movie_ids.append(conn.execute(
+                insert(models.Movie).values(title=title, title_normalized=title.lower(), owner_id=user_ids[0], rating_sum=0, rating_count=0)
+                .returning(models.Movie.id)
+            ).scalar_one())
+        # both movies start out as equally popular
+        for movie_id in movie_ids:
+            if existing:
+                conn.execute(insert(models.Rating), [
+                    {"rating": 1 + i % 5, "user_id": user_ids[i], "movie_id": movie_id} for i in range(existing)
+                ])
+        crud_session = sessionmaker(bind=conn)()
+        crud.recompute_movie_ratings(crud_session)
+        crud_session.flush()
+    return user_ids[existing:], movie_ids
+
+
+def run(label, engine, session_factory, create_rating, user_ids, movie_id):
+    statements = 0
+    counting = False
+
+    def count(*args):
+        nonlocal statements
+        if counting:
+            statements += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    timings = []
+    try:
+        for index, user_id in enumerate(user_ids):
+            db = session_factory()
+            try:
+                user = db.get(models.User, user_id)  # the authenticated user, loaded by the request
+                counting = True
+                start = time.perf_counter()
+                create_rating(db, schemas.RatingCreate(rating=1 + index % 5, review="benchmark", movie_id=movie_id), user.id)
+                timings.append(time.perf_counter() - start)
+                counting = False
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    total = len(user_ids)
+    print(
+        f"{label:<8} median {statistics.median(timings) * 1000:7.3f} ms   "
+        f"p95 {sorted(timings)[int(total * 0.95) - 1] * 1000:7.3f} ms   "
+        f"{statements / total:4.1f} statements per rating"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_writes")
+    parser.add_argument("--ratings", type=int, default=500, help="ratings written per implementation")
+    parser.add_argument("--existing", type=int, default=5000, help="ratings each movie already has")
+    parser.add_argument("--database-url", help="empty database to run against, a temporary SQLite file by default")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(args.database_url or f"sqlite:///{directory}/bench.db")
+        Base.metadata.create_all(bind=engine)
+        user_ids, (legacy_movie_id, movie_id) = seed(engine, args.existing + 2 * args.ratings, args.existing)
+
+        print(f"{args.ratings} ratings on a movie with {args.existing} existing ratings ({engine.url.get_backend_name()})")
+        run("legacy", engine, sessionmaker(autocommit=False, autoflush=False, bind=engine),
+            legacy_create_rating, user_ids[:args.ratings], legacy_movie_id)
+        run("current", engine, sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine),
+            crud.create_rating, user_ids[args.ratings:], movie_id)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
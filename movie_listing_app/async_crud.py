@@ -0,0 +1,87 @@
+# movie_listing_app/async_crud.py
+# async versions of the read-only crud functions, awaited by the read endpoints.
+# with an AsyncSession (DATABASE_ASYNC) the crud function runs on the event loop through
+# AsyncSession.run_sync, the async driver does the IO and no worker thread is involved.
+# with a regular Session it runs in the threadpool, like the body of a sync endpoint would.
+
+from typing import Callable, List, Optional, Union
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from . import crud
+
+ReadSession = Union[Session, AsyncSession]
+
+
+async def run(db: ReadSession, function: Callable, *args, **kwargs):
+    """
+    Calls a crud function with the session, without blocking the event loop.
+
+    :param db: AsyncSession or SQLAlchemy database session.
+    :param function: crud function taking the session as its first argument.
+    :return: what the crud function returns. Everything the response needs has to be
+        loaded by then, an AsyncSession cannot lazy load while the response is serialized.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(function, *args, **kwargs)
+    return await run_in_threadpool(function, db, *args, **kwargs)
+
+
+async def get_all_movies(db: ReadSession, skip: int = 0, limit: int = 10, view: str = "full"):
+    return await run(db, crud.get_all_movies, skip=skip, limit=limit, view=view)
+
+
+async def get_movies_page(db: ReadSession, **kwargs):
+    # takes the ordering, cursor, filters and view of crud.get_movies_page
+    return await run(db, crud.get_movies_page, **kwargs)
+
+
+async def get_movie_by_title(db: ReadSession, title: str):
+    return await run(db, crud.get_movie_by_title, title=title)
+
+
+async def get_movie_version(db: ReadSession, **kwargs):
+    # takes the movie_id, title or comment_id of crud.get_movie_version
+    return await run(db, crud.get_movie_version, **kwargs)
+
+
+async def get_movies_by_ids(db: ReadSession, movie_ids: List[int], view: str = "full"):
+    return await run(db, crud.get_movies_by_ids, movie_ids=movie_ids, view=view)
+
+
+async def get_movies_by_titles(db: ReadSession, titles: List[str], view: str = "full"):
+    return await run(db, crud.get_movies_by_titles, titles=titles, view=view)
+
+
+async def search_movies(db: ReadSession, query: str, skip: int = 0, limit: int = 10, view: str = "full"):
+    return await run(db, crud.search_movies, query=query, skip=skip, limit=limit, view=view)
+
+
+async def get_movie_by_release_year(db: ReadSession, release_year: int):
+    return await run(db, crud.get_movie_by_release_year, release_year=release_year)
+
+
+async def get_ratings_by_movie(db: ReadSession, movie_id: int, view: str = "full"):
+    return await run(db, crud.get_ratings_by_movie, movie_id=movie_id, view=view)
+
+
+async def get_ratings_by_score(db: ReadSession, score: int, view: str = "full"):
+    return await run(db, crud.get_ratings_by_score, score=score, view=view)
+
+
+async def get_rating_stats(db: ReadSession, movie_id: int):
+    return await run(db, crud.get_rating_stats, movie_id=movie_id)
+
+
+async def get_leaderboard(db: ReadSession, genre: Optional[str] = None, decade: Optional[int] = None,
+                          skip: int = 0, limit: int = crud.DEFAULT_LEADERBOARD_SIZE, view: str = "full"):
+    return await run(db, crud.get_leaderboard, genre=genre, decade=decade, skip=skip, limit=limit, view=view)
+
+
+async def get_comment_thread(db: ReadSession, movie_id: int, max_depth: int = crud.DEFAULT_THREAD_DEPTH):
+    return await run(db, crud.get_comment_thread, movie_id=movie_id, max_depth=max_depth)
+
+
+async def get_comments_page(db: ReadSession, **kwargs):
+    # takes the parent, ordering and cursor of crud.get_comments_page
+    return await run(db, crud.get_comments_page, **kwargs)
@@ -0,0 +1,119 @@
+# movie_listing_app/cli.py
+# maintenance commands, run with: python -m movie_listing_app.cli <command>
+
+import argparse
+import sys
+from . import crud, database, exporter, importer
+
+
+def reconcile_ratings(args: argparse.Namespace):
+    db = database.SessionLocal()
+    try:
+        repaired = crud.recompute_movie_ratings(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"{repaired} movies had out of date rating aggregates and were repaired")
+
+
+def refresh_leaderboards(args: argparse.Namespace):
+    db = database.SessionLocal()
+    try:
+        changed = crud.refresh_leaderboards(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"{changed} movies had their leaderboard score or decade updated")
+
+
+def import_movies(args: argparse.Namespace):
+    file_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    db = database.SessionLocal()
+    try:
+        owner = crud.get_user_by_username(db, username=args.owner)
+        if owner is None:
+            sys.exit(f"user {args.owner} does not exist")
+        with open(args.path, encoding="utf-8-sig", newline="") as file:
+            report = importer.import_movies(db, file, format=file_format, owner_id=owner.id, batch_size=args.batch_size)
+    finally:
+        db.close()
+    for error in report["errors"]:
+        print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+    print(f"{report['imported']} movies imported, {report['failed']} rows failed")
+
+
+def export_table(args: argparse.Namespace):
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in exporter.export_table(
+            database.SessionLocal(), args.table, format=args.format, compress=args.gzip, after_id=args.after_id
+        ):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+def grant_admin(args: argparse.Namespace):
+    db = database.SessionLocal()
+    try:
+        user = crud.get_user_by_username(db, username=args.username)
+        if user is None:
+            sys.exit(f"user {args.username} does not exist")
+        user.role = "admin" # type: ignore
+        db.commit()
+    finally:
+        db.close()
+    print(f"{args.username} is now an administrator")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m movie_listing_app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reconcile = commands.add_parser(
+        "reconcile-ratings",
+        help="recompute every movie's rating aggregates from the ratings table",
+    )
+    reconcile.set_defaults(handler=reconcile_ratings)
+
+    leaderboards_command = commands.add_parser(
+        "refresh-leaderboards",
+        help="recompute every movie's leaderboard score, needed after changing the leaderboard settings",
+    )
+    leaderboards_command.set_defaults(handler=refresh_leaderboards)
+
+    import_command = commands.add_parser(
+        "import-movies",
+        help="import movies from an NDJSON or CSV file (with a header row)",
+    )
+    import_command.add_argument("path", help="file to import, .csv files are read as CSV")
+    import_command.add_argument("--owner", required=True, help="username that will own the imported movies")
+    import_command.add_argument("--format", choices=importer.IMPORT_FORMATS, help="override the format guessed from the file name")
+    import_command.add_argument("--batch-size", type=int, default=importer.DEFAULT_BATCH_SIZE, help="movies inserted per statement")
+    import_command.set_defaults(handler=import_movies)
+
+    export_command = commands.add_parser(
+        "export",
+        help="stream a table as NDJSON or CSV, to stdout or a file",
+    )
+    export_command.add_argument("table", choices=list(exporter.EXPORT_COLUMNS))
+    export_command.add_argument("--format", choices=exporter.EXPORT_FORMATS, default="ndjson")
+    export_command.add_argument("--gzip", action="store_true", help="gzip the output")
+    export_command.add_argument("--after-id", type=int, help="resume after the last id already exported")
+    export_command.add_argument("--output", help="file to write, stdout by default")
+    export_command.set_defaults(handler=export_table)
+
+    admin_command = commands.add_parser(
+        "grant-admin",
+        help="give a user the admin role, needed for bulk rating ingestion",
+    )
+    admin_command.add_argument("username")
+    admin_command.set_defaults(handler=grant_admin)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
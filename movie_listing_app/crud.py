@@ -1,230 +1,1080 @@
-import datetime
-from fastapi import HTTPException
-from starlette import status
-from sqlalchemy import func
-from sqlalchemy.orm import Session
-from . import models, schemas
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# User CRUD operations
-def get_user(db: Session, user_id: int):
-    """
-    Fetches a user.
-
-    :param db: SQLAlchemy database session.
-    :param user_id: user ID.
-    :return: first User with the ID once found.
-    """
-    return db.query(models.User).filter(models.User.id == user_id).first()
-
-def get_user_by_username(db: Session, username: str):
-    """
-    Fetches a user by their username.
-
-    :param db: SQLAlchemy database session.
-    :param user_id: user ID.
-    :return: first User with the username once found.
-    """
-    return db.query(models.User).filter(models.User.username == username).first()
-
-def get_user_by_email(db: Session, email: str):
-    """
-    Fetches a user by their email.
-
-    :param db: SQLAlchemy database session.
-    :param user_id: user ID.
-    :return: first User with the email once found.
-    """
-    return db.query(models.User).filter(models.User.email == email).first()
-
-# function to create a user.
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = pwd_context.hash(user.password)  # This encrypts the password
-    db_user = models.User(
-        username=user.username,
-        email=user.email,
-        password=hashed_password,
-        first_name=user.first_name,
-        last_name=user.last_name,
-        role='user'  # Default role for new users
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
-
-# Movie CRUD operations
-def get_movie_by_id(db: Session, movie_id: int):
-    """
-    Fetches a movie by ID.
-
-    :param db: SQLAlchemy database session.
-    :param movie_id: Optional movie ID.
-    :param title: Optional movie title.
-    :return: Movie object.
-    """
-    return db.query(models.Movie).filter(models.Movie.id == movie_id).first()
-
-def get_all_movies(db: Session, skip: int = 0, limit: int = 10):
-    """
-    Fetches all movies with a limit(optional) and skip(optional).
-
-    :param db: SQLAlchemy database session.
-    :return: Movie object with the set limit and skip.
-    """
-    return db.query(models.Movie).offset(skip).limit(limit).all()
-
-def get_movie_by_title(db: Session, title: str):
-    """
-    Fetches a movie by title regardless of the case(i.e it is case insensitive)
-
-    :param db: SQLAlchemy database session.
-    :param movie_title: movie title.
-    :param title: Optional movie title.
-    :return: Movie object.
-    """
-    return db.query(models.Movie).filter(func.lower(models.Movie.title) == func.lower(title)).first()
-
-def get_movie_by_release_year(db: Session, release_year: int):
-    return db.query(models.Movie).filter(models.Movie.release_year == release_year).first()
-
-# this funcion is used to create a movie
-def create_movie(db: Session, movie: schemas.MovieCreate, user_id: int):
-    db_movie = models.Movie(**movie.model_dump(), owner_id=user_id)
-    db.add(db_movie)
-    db.commit()
-    db.refresh(db_movie)
-    return db_movie
-
-# this funcion is used to update the details of a movie whilst filtering by the movie id
-def update_movie_by_id(db: Session, movie_id: int, movie: schemas.MovieCreate):
-    db_movie = get_movie_by_id(db, movie_id)
-    if not db_movie:
-        return None
-    for key, value in movie.model_dump().items():
-        setattr(db_movie, key, value)
-    db.commit()
-    db.refresh(db_movie)
-    return db_movie
-
-# this funcion is used to delete a movie oncec it is found, using the movie id to search
-def delete_movie_by_id(db: Session, movie_id: int):
-    db_movie = get_movie_by_id(db, movie_id)
-    if db_movie:
-        db.delete(db_movie)
-        db.commit()
-    return db_movie
-
-# this funcion is used to update the details of a movie whilst filtering by the movie title
-def update_movie_by_title(db: Session, movie_title: str, movie: schemas.MovieCreate):
-    db_movie = get_movie_by_title(db, movie_title)
-    if not db_movie:
-        return None
-    for key, value in movie.model_dump().items():
-        setattr(db_movie, key, value)
-    db.commit()
-    db.refresh(db_movie)
-    return db_movie
-
-# this funcion is used to delete a movie oncec it is found, using the movie title to search
-def delete_movie_by_title(db: Session, movie_title: str):
-    db_movie = get_movie_by_title(db, movie_title)
-    if db_movie:
-        db.delete(db_movie)
-        db.commit()
-    return db_movie
-# Rating CRUD operations
-def get_rating(db: Session, rating_id: int):
-    return db.query(models.Rating).filter(models.Rating.id == rating_id).first()
-
-def get_ratings_by_movie(db: Session, movie_id: int):
-    return db.query(models.Rating).filter(models.Rating.movie_id == movie_id).all()
-
-def get_ratings_by_user(db: Session, user_id: int):
-    return db.query(models.Rating).filter(models.Rating.user_id == user_id).all()
-
-def get_ratings_by_score(db: Session, score: int):
-    return db.query(models.Rating).filter(models.Rating.rating == score).all()
-
-def create_rating(db: Session, rating: schemas.RatingCreate, user_id: int):
-    db_rating = models.Rating(
-        rating=rating.rating,
-        review=rating.review,
-        user_id=user_id,
-        movie_id=rating.movie_id 
-    )
-    db.add(db_rating)
-    db.commit()
-    db.refresh(db_rating)
-    update_movie_rating(db, rating.movie_id)
-    return db_rating
-
-def create_rating_by_title(db: Session, rating: schemas.RatingCreate, user_id: int, title: str):
-    movie = get_movie_by_title(db=db, title=title)
-    if not movie:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
-    
-    db_rating = models.Rating(
-        rating=rating.rating,
-        review=rating.review,
-        user_id=user_id,
-        movie_id=movie.id
-    )
-    
-    db.add(db_rating)
-    db.commit()
-    db.refresh(db_rating)
-    update_movie_rating_by_title(db=db, movie=movie)
-    return db_rating
-
-
-def update_movie_rating(db: Session, movie_id: int):
-    avg_rating = db.query(func.avg(models.Rating.rating)).filter(models.Rating.movie_id == movie_id).scalar()
-    db_movie = get_movie_by_id(db, movie_id)
-    if db_movie:
-        db_movie.rating = avg_rating
-        db.commit()
-        db.refresh(db_movie)
-
-def update_movie_rating_by_title(db: Session, movie: models.Movie):
-    # Calculate the average rating
-    avg_rating = db.query(func.avg(models.Rating.rating)).filter(models.Rating.movie_id == movie.id).scalar()
-    movie.rating = avg_rating
-    db.commit()
-    db.refresh(movie)
-    
-
-
-def delete_rating(db: Session, rating_id: int):
-    db_rating = get_rating(db, rating_id)
-    if db_rating:
-        db.delete(db_rating)
-        db.commit()
-        update_movie_rating(db, db_rating.movie_id) # type: ignore
-    return db_rating
-
-# Comment CRUD operations
-def get_comment(db: Session, comment_id: int):
-    return db.query(models.Comment).filter(models.Comment.id == comment_id).first()
-
-
-def create_comment(db: Session, comment: schemas.CommentCreate, user_id: int):
-    db_comment = models.Comment(
-        comment=comment.comment,
-        user_id=user_id,
-        movie_id=comment.movie_id,
-        parent_comment_id=comment.parent_comment_id if comment.parent_comment_id else None,
-        created_at=datetime.datetime.now()
-    )
-    db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
-    return db_comment
-
-def get_comments_by_movie(db: Session, movie_id: int):
-    return db.query(models.Comment).filter(models.Comment.movie_id == movie_id).all()
-
-def get_comments_by_user(db: Session, user_id: int):
-    return db.query(models.Comment).filter(models.Comment.user_id == user_id).all()
\ No newline at end of file
+import datetime
+import io
+import math
+import os
+import re
+from collections import defaultdict
+from typing import List, Optional
+from fastapi import HTTPException
+from starlette import status
+from sqlalchemy import Float, bindparam, case, cast, delete, exists, func, insert, or_, select, tuple_, update, literal_column, table, column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, load_only
+from sqlalchemy.orm.attributes import set_committed_value
+from . import models, schemas, pagination
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Loader strategy for the movie read paths. schemas.Movie always nests the
+# owner, so it is joined onto the movie query instead of being lazy loaded
+# once per row while the response is serialized.
+MOVIE_OWNER_LOADER = joinedload(models.Movie.owner)
+# schemas.Rating nests the user and the movie with its owner, which are joined the same way.
+RATING_LOADERS = (joinedload(models.Rating.user), joinedload(models.Rating.movie).joinedload(models.Movie.owner))
+# The summary view of the list endpoints (schemas.MovieSummary, schemas.RatingSummary) only reads the
+# columns it returns plus the sort keys, leaving out the synopsis, the review and the nested objects.
+MOVIE_SUMMARY_LOADER = load_only(
+    models.Movie.id, models.Movie.title, models.Movie.title_normalized, models.Movie.release_year, models.Movie.genre,
+    models.Movie.rating, models.Movie.rating_count, models.Movie.weighted_rating, models.Movie.comment_count,
+)
+RATING_SUMMARY_LOADER = load_only(models.Rating.id, models.Rating.rating, models.Rating.user_id, models.Rating.movie_id)
+
+# Hot lookups (the authenticated user on every request, movies by id and title), built once at import
+# with bound parameters. Calls only bind the value, instead of building a Query with its options each
+# time, and the engine's compiled cache finds the SQL without rebuilding it.
+USER_BY_USERNAME = select(models.User).where(models.User.username == bindparam("username")).limit(1)
+MOVIE_BY_ID = select(models.Movie).options(MOVIE_OWNER_LOADER).where(models.Movie.id == bindparam("movie_id")).limit(1)
+# a title shared by several movies resolves to the oldest, read in order from ix_movies_title_normalized_id
+MOVIE_BY_TITLE = (
+    select(models.Movie).options(MOVIE_OWNER_LOADER)
+    .where(models.Movie.title_normalized == bindparam("title_normalized")).order_by(models.Movie.id).limit(1)
+)
+# the (id, version) of a movie, all a conditional GET reads when the client's copy is current
+MOVIE_VERSION_BY_ID = select(models.Movie.id, models.Movie.version).where(models.Movie.id == bindparam("movie_id")).limit(1)
+MOVIE_VERSION_BY_TITLE = (
+    select(models.Movie.id, models.Movie.version)
+    .where(models.Movie.title_normalized == bindparam("title_normalized")).order_by(models.Movie.id).limit(1)
+)
+MOVIE_VERSION_BY_COMMENT = (
+    select(models.Movie.id, models.Movie.version)
+    .join(models.Comment, models.Comment.movie_id == models.Movie.id)
+    .where(models.Comment.id == bindparam("comment_id")).limit(1)
+)
+
+# Keyset pagination: the type of the sort key a cursor may carry for each ordering,
+# and the column holding the key when it is not named like the ordering.
+CURSOR_VALUE_TYPES = {
+    "id": (type(None),),
+    "title": (str,),
+    "rating": (int, float, type(None)),
+    "release_year": (int, type(None)),
+}
+CURSOR_COLUMNS = {"title": "title_normalized"}
+
+# Leaderboards rank movies by a Bayesian average, which pulls the average of a movie with few
+# ratings towards LEADERBOARD_PRIOR_MEAN as if it had LEADERBOARD_MIN_VOTES more ratings of
+# that score. Run the refresh-leaderboards command after changing either setting.
+LEADERBOARD_PRIOR_MEAN = float(os.getenv("LEADERBOARD_PRIOR_MEAN", "3.0"))
+LEADERBOARD_MIN_VOTES = int(os.getenv("LEADERBOARD_MIN_VOTES", "10"))
+DEFAULT_LEADERBOARD_SIZE = 50
+
+# Depth limits for comment thread responses, replies below the limit are cut off.
+DEFAULT_THREAD_DEPTH = 10
+MAX_THREAD_DEPTH = 50
+
+# Comment pages: top-level comments of a movie or replies of a comment, oldest or newest first.
+DEFAULT_COMMENT_PAGE_SIZE = 20
+MAX_COMMENT_PAGE_SIZE = 100
+
+# most movies GET /movies/-/batch resolves in one request
+MAX_BATCH_MOVIES = 100
+
+# times rate_movie retries a rating that a concurrent submit by the same user got in first
+RATE_MOVIE_ATTEMPTS = 5
+
+# User CRUD operations
+def get_user(db: Session, user_id: int):
+    """
+    Fetches a user.
+
+    :param db: SQLAlchemy database session.
+    :param user_id: user ID.
+    :return: first User with the ID once found.
+    """
+    return db.query(models.User).filter(models.User.id == user_id).first()
+
+def get_user_by_username(db: Session, username: str):
+    """
+    Fetches a user by their username.
+
+    :param db: SQLAlchemy database session.
+    :param user_id: user ID.
+    :return: first User with the username once found.
+    """
+    return db.scalars(USER_BY_USERNAME, {"username": username}).first()
+
+def get_user_by_email(db: Session, email: str):
+    """
+    Fetches a user by their email.
+
+    :param db: SQLAlchemy database session.
+    :param user_id: user ID.
+    :return: first User with the email once found.
+    """
+    return db.query(models.User).filter(models.User.email == email).first()
+
+# function to create a user.
+def create_user(db: Session, user: schemas.UserCreate):
+    hashed_password = pwd_context.hash(user.password)  # This encrypts the password
+    db_user = models.User(
+        username=user.username,
+        email=user.email,
+        password=hashed_password,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        role='user'  # Default role for new users
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+# Movie CRUD operations
+def get_movie_by_id(db: Session, movie_id: int):
+    """
+    Fetches a movie by ID.
+
+    :param db: SQLAlchemy database session.
+    :param movie_id: Optional movie ID.
+    :param title: Optional movie title.
+    :return: Movie object.
+    """
+    return db.scalars(MOVIE_BY_ID, {"movie_id": movie_id}).first()
+
+def movie_loader(view: str = "full"):
+    # loader option of the movie list queries for the "full" or the "summary" view
+    return MOVIE_SUMMARY_LOADER if view == "summary" else MOVIE_OWNER_LOADER
+
+def rating_loaders(view: str = "full"):
+    # loader options of the rating list queries for the "full" or the "summary" view
+    return (RATING_SUMMARY_LOADER,) if view == "summary" else RATING_LOADERS
+
+def get_all_movies(db: Session, skip: int = 0, limit: int = 10, view: str = "full"):
+    """
+    Fetches all movies with a limit(optional) and skip(optional).
+
+    :param db: SQLAlchemy database session.
+    :param view: "full" for whole movies with their owner, "summary" for the summary columns only.
+    :return: Movie object with the set limit and skip.
+    """
+    return db.query(models.Movie).options(movie_loader(view)).order_by(models.Movie.id).offset(skip).limit(limit).all()
+
+def get_movies_page(
+    db: Session,
+    order_by: str = "id",
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    genre: Optional[str] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    min_rating: Optional[float] = None,
+    view: str = "full",
+):
+    """
+    Fetches a page of movies using keyset pagination, so deep pages cost the same as the first one.
+    The filters are optional and combine, each combination is served by one of the composite movie indexes.
+
+    :param db: SQLAlchemy database session.
+    :param order_by: "id" or "title" (ascending), "rating" or "release_year" (highest first), ties broken by id.
+    :param limit: page size.
+    :param cursor: next_cursor returned with the previous page, None for the first page.
+    :param genre: only movies of this genre (exact match).
+    :param year_from: only movies released in or after this year.
+    :param year_to: only movies released in or before this year.
+    :param min_rating: only movies with at least this average rating.
+    :param view: "full" for whole movies with their owner, "summary" for the summary columns only.
+    :return: tuple of the movies on the page and the cursor of the next page (None on the last page).
+    """
+    position = pagination.decode_cursor(cursor) if cursor else None
+    if position is not None and (
+        position.get("order_by") != order_by
+        or not isinstance(position.get("id"), int)
+        or not isinstance(position.get("value"), CURSOR_VALUE_TYPES[order_by])
+    ):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor does not match the requested ordering")
+
+    query = db.query(models.Movie).options(movie_loader(view))
+    if genre is not None:
+        query = query.filter(models.Movie.genre == genre)
+    if year_from is not None:
+        query = query.filter(models.Movie.release_year >= year_from)
+    if year_to is not None:
+        query = query.filter(models.Movie.release_year <= year_to)
+    if min_rating is not None:
+        query = query.filter(models.Movie.rating >= min_rating)
+
+    if order_by == "id":
+        if position is not None:
+            query = query.filter(models.Movie.id > position["id"])
+        movies = query.order_by(models.Movie.id).limit(limit + 1).all()
+    elif order_by == "title":
+        # titles sort case insensitively, on the normalized title
+        if position is not None:
+            query = query.filter(tuple_(models.Movie.title_normalized, models.Movie.id) > tuple_(position["value"], position["id"]))
+        movies = query.order_by(models.Movie.title_normalized, models.Movie.id).limit(limit + 1).all()
+    else:
+        column = getattr(models.Movie, order_by)
+        movies = []
+        # movies with a value for the sort key come first, as one range scan over the composite index
+        if position is None or position.get("value") is not None:
+            ranked = query.filter(column.isnot(None))
+            if position is not None:
+                ranked = ranked.filter(tuple_(column, models.Movie.id) < tuple_(position["value"], position["id"]))
+            movies = ranked.order_by(column.desc(), models.Movie.id.desc()).limit(limit + 1).all()
+        # followed by the movies without one, newest first
+        if len(movies) <= limit:
+            unranked = query.filter(column.is_(None))
+            if position is not None and position.get("value") is None:
+                unranked = unranked.filter(models.Movie.id < position["id"])
+            movies += unranked.order_by(models.Movie.id.desc()).limit(limit + 1 - len(movies)).all()
+
+    next_cursor = None
+    if len(movies) > limit:
+        movies = movies[:limit]
+        last = movies[-1]
+        next_position = {"order_by": order_by, "id": last.id}
+        if order_by != "id":
+            next_position["value"] = getattr(last, CURSOR_COLUMNS.get(order_by, order_by))
+        next_cursor = pagination.encode_cursor(next_position)
+    return movies, next_cursor
+
+def get_movie_by_title(db: Session, title: str):
+    """
+    Fetches a movie by title regardless of the case(i.e it is case insensitive),
+    Unicode form or extra whitespace, through the index on the normalized title.
+
+    :param db: SQLAlchemy database session.
+    :param title: movie title.
+    :return: Movie object.
+    """
+    return db.scalars(MOVIE_BY_TITLE, {"title_normalized": models.normalize_title(title)}).first()
+
+def get_movie_version(db: Session, movie_id: Optional[int] = None, title: Optional[str] = None,
+                      comment_id: Optional[int] = None):
+    """
+    Reads the version of a movie without loading it, for answering conditional GETs.
+    Exactly one of movie_id, title and comment_id is given.
+
+    :param db: SQLAlchemy database session.
+    :param movie_id: movie ID.
+    :param title: movie title, matched like get_movie_by_title.
+    :param comment_id: a comment on the movie.
+    :return: (movie ID, version) row, or None when the movie does not exist.
+    """
+    if movie_id is not None:
+        return db.execute(MOVIE_VERSION_BY_ID, {"movie_id": movie_id}).first()
+    if title is not None:
+        return db.execute(MOVIE_VERSION_BY_TITLE, {"title_normalized": models.normalize_title(title)}).first()
+    return db.execute(MOVIE_VERSION_BY_COMMENT, {"comment_id": comment_id}).first()
+
+def get_movies_by_ids(db: Session, movie_ids: List[int], view: str = "full"):
+    """
+    Fetches many movies by ID with a single IN query, owners included (full view).
+
+    :param db: SQLAlchemy database session.
+    :param movie_ids: movie IDs, repeated IDs are only queried once.
+    :param view: "full", or "summary" to read only the columns of schemas.MovieSummary.
+    :return: list with the Movie of each requested ID in request order, None where it does not exist.
+    """
+    if not movie_ids:
+        return []
+    movies = db.query(models.Movie).options(movie_loader(view)).filter(models.Movie.id.in_(set(movie_ids))).all()
+    by_id = {movie.id: movie for movie in movies}
+    return [by_id.get(movie_id) for movie_id in movie_ids]
+
+def get_movies_by_titles(db: Session, titles: List[str], view: str = "full"):
+    """
+    Fetches many movies by title with a single IN query on the normalized title,
+    matching titles the way get_movie_by_title does.
+
+    :param db: SQLAlchemy database session.
+    :param titles: movie titles.
+    :param view: "full", or "summary" to read only the columns of schemas.MovieSummary.
+    :return: list with the Movie of each requested title in request order, None where it does not exist.
+        When several movies share a title, the oldest one is returned.
+    """
+    if not titles:
+        return []
+    normalized = [models.normalize_title(title) for title in titles]
+    movies = (
+        db.query(models.Movie)
+        .options(movie_loader(view))
+        .filter(models.Movie.title_normalized.in_(set(normalized)))
+        .order_by(models.Movie.id)
+        .all()
+    )
+    by_title = {}
+    for movie in movies:
+        by_title.setdefault(movie.title_normalized, movie)
+    return [by_title.get(title) for title in normalized]
+
+def search_movies(db: Session, query: str, skip: int = 0, limit: int = 10, view: str = "full"):
+    """
+    Full-text search over movie titles, genres and synopses, best matches first.
+    Title matches weigh more than genre matches, which weigh more than synopsis matches.
+
+    :param db: SQLAlchemy database session.
+    :param query: search terms, every term has to match.
+    :param skip: number of results to skip.
+    :param limit: maximum number of results.
+    :param view: "full" for whole movies with their owner, "summary" for the summary columns only.
+    :return: list of (Movie, relevance score) tuples.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        ts_query = func.websearch_to_tsquery("english", query)
+        search_vector = literal_column("movies.search_vector")
+        score = func.ts_rank_cd(search_vector, ts_query).label("score")
+        results = db.query(models.Movie, score).filter(search_vector.op("@@")(ts_query))
+    else:
+        # quote every word so FTS5 never parses user input as query syntax
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return []
+        movies_fts = table("movies_fts", column("rowid"))
+        score = (-func.bm25(literal_column("movies_fts"), 10.0, 5.0, 1.0)).label("score")
+        results = (
+            db.query(models.Movie, score)
+            .join(movies_fts, movies_fts.c.rowid == models.Movie.id)
+            .filter(literal_column("movies_fts").op("MATCH")(" ".join(f'"{term}"' for term in terms)))
+        )
+    return (
+        results.options(movie_loader(view))
+        .order_by(score.desc(), models.Movie.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+def get_movie_by_release_year(db: Session, release_year: int):
+    return db.query(models.Movie).options(MOVIE_OWNER_LOADER).filter(models.Movie.release_year == release_year).first()
+
+# column values of a movie as written by the insert and update statements below, which
+# bypass the ORM attribute events that keep the derived columns in step
+def movie_values(movie: schemas.MovieCreate):
+    values = movie.model_dump()
+    values["title_normalized"] = models.normalize_title(movie.title)
+    values["release_decade"] = models.release_decade(movie.release_year)
+    return values
+
+# this funcion is used to create a movie, the new row comes back from INSERT ... RETURNING
+def create_movie(db: Session, movie: schemas.MovieCreate, user_id: int):
+    db_movie = db.scalars(
+        insert(models.Movie).values(**movie_values(movie), owner_id=user_id).returning(models.Movie)
+    ).one()
+    db.commit()
+    return db_movie
+
+# this funcion is used to insert a batch of movies for one owner in a single statement, the rows
+# are sent with executemany (COPY on PostgreSQL) and nothing is loaded back. Returns the number inserted.
+def create_movies_bulk(db: Session, movies: List[schemas.MovieCreate], owner_id: int):
+    if not movies:
+        return 0
+    rows = [dict(movie_values(movie), owner_id=owner_id) for movie in movies]
+    if db.get_bind().dialect.name == "postgresql":
+        copy_movies(db, rows)
+    else:
+        db.execute(insert(models.Movie), rows, execution_options={"render_nulls": True})
+    return len(rows)
+
+def copy_movies(db: Session, rows: List[dict]):
+    """
+    Streams movie rows into PostgreSQL with COPY, inside the session's transaction.
+
+    :param db: SQLAlchemy database session bound to PostgreSQL.
+    :param rows: column values, every row with the same keys.
+    """
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        # unquoted empty fields are NULL in COPY's csv format, quoted ones are strings
+        buffer.write(",".join(
+            "" if row[name] is None else '"' + str(row[name]).replace('"', '""') + '"' for name in columns
+        ))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {models.Movie.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+
+# this funcion is used to update the details of a movie whilst filtering by the movie id,
+# when owner_id is given only a movie owned by that user is updated. Returns None when nothing was updated.
+def update_movie_by_id(db: Session, movie_id: int, movie: schemas.MovieCreate, owner_id: Optional[int] = None):
+    statement = update(models.Movie).where(models.Movie.id == movie_id)
+    if owner_id is not None:
+        statement = statement.where(models.Movie.owner_id == owner_id)
+    db_movie = db.scalars(
+        statement.values(**movie_values(movie), version=models.Movie.version + 1).returning(models.Movie),
+        execution_options={"synchronize_session": "fetch"},
+    ).one_or_none()
+    db.commit()
+    return db_movie
+
+# this funcion is used to delete a movie oncec it is found, using the movie id to search
+# its ratings and comments are deleted by the database (ON DELETE CASCADE) without being loaded
+def delete_movie_by_id(db: Session, movie_id: int):
+    db_movie = get_movie_by_id(db, movie_id)
+    if db_movie:
+        db.delete(db_movie)
+        db.commit()
+    return db_movie
+
+# this funcion is used to update the details of a movie whilst filtering by the movie title
+def update_movie_by_title(db: Session, movie_title: str, movie: schemas.MovieCreate):
+    db_movie = get_movie_by_title(db, movie_title)
+    if not db_movie:
+        return None
+    for key, value in movie.model_dump().items():
+        setattr(db_movie, key, value)
+    db_movie.version = models.Movie.version + 1 # type: ignore
+    db.commit()
+    return db_movie
+
+# this funcion is used to delete a movie oncec it is found, using the movie title to search
+# its ratings and comments are deleted by the database (ON DELETE CASCADE) without being loaded
+def delete_movie_by_title(db: Session, movie_title: str):
+    db_movie = get_movie_by_title(db, movie_title)
+    if db_movie:
+        db.delete(db_movie)
+        db.commit()
+    return db_movie
+# Rating CRUD operations
+def get_rating(db: Session, rating_id: int):
+    return db.query(models.Rating).filter(models.Rating.id == rating_id).first()
+
+def get_ratings_by_movie(db: Session, movie_id: int, view: str = "full"):
+    return db.query(models.Rating).options(*rating_loaders(view)).filter(models.Rating.movie_id == movie_id).all()
+
+def get_ratings_by_user(db: Session, user_id: int):
+    return db.query(models.Rating).options(*RATING_LOADERS).filter(models.Rating.user_id == user_id).all()
+
+def get_ratings_by_score(db: Session, score: int, view: str = "full"):
+    return db.query(models.Rating).options(*rating_loaders(view)).filter(models.Rating.rating == score).all()
+
+def upsert_ratings(db: Session, rows: List[dict], batch_size: int = 1000):
+    """
+    Inserts ratings, replacing the score and review of the ratings the users already gave
+    those movies. PostgreSQL and SQLite do it with INSERT ... ON CONFLICT on the unique
+    (user_id, movie_id) index, other databases with insert_or_update_ratings. Used for
+    batches: SQLAlchemy does not cache the compiled form of ON CONFLICT statements.
+
+    :param db: SQLAlchemy database session.
+    :param rows: rating values, at most one per user and movie.
+    :param batch_size: number of ratings per statement.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        for start in range(0, len(rows), batch_size):
+            insert_or_update_ratings(db, rows[start:start + batch_size])
+        return
+    statement = postgresql.insert(models.Rating) if dialect == "postgresql" else sqlite.insert(models.Rating)
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.Rating.user_id, models.Rating.movie_id],
+        set_={"rating": statement.excluded.rating, "review": statement.excluded.review},
+    )
+    for start in range(0, len(rows), batch_size):
+        # render_nulls keeps rows without a review in the same executemany batch
+        db.execute(statement, rows[start:start + batch_size], execution_options={"render_nulls": True})
+
+def insert_or_update_ratings(db: Session, rows: List[dict]):
+    """
+    Portable form of upsert_ratings for databases without ON CONFLICT: the existing
+    ratings among the rows are looked up, then updated in one executemany UPDATE,
+    and the others are inserted.
+
+    :param db: SQLAlchemy database session.
+    :param rows: rating values, at most one per user and movie.
+    """
+    if not rows:
+        return
+    existing = set(db.execute(
+        select(models.Rating.user_id, models.Rating.movie_id)
+        .where(models.Rating.user_id.in_({row["user_id"] for row in rows}))
+        .where(models.Rating.movie_id.in_({row["movie_id"] for row in rows}))
+    ).tuples())
+    updates = [row for row in rows if (row["user_id"], row["movie_id"]) in existing]
+    inserts = [row for row in rows if (row["user_id"], row["movie_id"]) not in existing]
+    if updates:
+        ratings = models.Rating.__table__
+        db.connection().execute(
+            update(ratings)
+            .where(ratings.c.user_id == bindparam("match_user_id"), ratings.c.movie_id == bindparam("match_movie_id"))
+            .values(rating=bindparam("new_rating"), review=bindparam("new_review")),
+            [
+                {"match_user_id": row["user_id"], "match_movie_id": row["movie_id"],
+                 "new_rating": row["rating"], "new_review": row["review"]}
+                for row in updates
+            ],
+        )
+    if inserts:
+        db.execute(insert(models.Rating), inserts, execution_options={"render_nulls": True})
+
+def rate_movie(db: Session, movie_id: int, rating: schemas.RatingBase, user_id: int):
+    """
+    Creates the user's rating of a movie, or replaces the score and review of the rating
+    they already gave it, and adjusts the movie's aggregates by the difference, in one
+    transaction. The movie row is locked first and the user's previous score is read by a
+    separate statement once the lock is held, which decides between a plain INSERT and an
+    UPDATE of the rating. On PostgreSQL the lock runs concurrent ratings of the same movie
+    one after the other. SQLite has no row locks (FOR UPDATE compiles to nothing), so two
+    submits by one user can both read the same previous score: the later INSERT then fails
+    on the unique (user_id, movie_id) index, or the later UPDATE, which only matches the
+    score it read, changes no row. Either way the transaction is rolled back and the rating
+    retried against the committed rating, at most RATE_MOVIE_ATTEMPTS times.
+
+    :param db: SQLAlchemy database session.
+    :param movie_id: movie ID.
+    :param rating: score and review.
+    :param user_id: ID of the rating user.
+    :return: the Rating, or None when the movie does not exist.
+    """
+    for attempt in range(1, RATE_MOVIE_ATTEMPTS + 1):
+        # lock the movie, which also checks that it exists
+        locked = db.execute(select(models.Movie.id).where(models.Movie.id == movie_id).with_for_update()).first()
+        if locked is None:
+            db.rollback()
+            return None
+        # not part of the locking statement: on PostgreSQL its snapshot predates the wait for the lock,
+        # and a rating committed meanwhile by the same user would be missed
+        previous_score = db.scalar(
+            select(models.Rating.rating).where(models.Rating.user_id == user_id, models.Rating.movie_id == movie_id)
+        )
+        if previous_score is None:
+            statement = insert(models.Rating).values(rating=rating.rating, review=rating.review, user_id=user_id, movie_id=movie_id)
+        else:
+            statement = (
+                update(models.Rating)
+                .where(models.Rating.user_id == user_id, models.Rating.movie_id == movie_id)
+                .where(models.Rating.rating == previous_score)
+                .values(rating=rating.rating, review=rating.review)
+            )
+        try:
+            db_rating = db.scalars(statement.returning(models.Rating), execution_options={"populate_existing": True}).one_or_none()
+        except IntegrityError:
+            # the same user's rating was inserted since previous_score was read
+            db.rollback()
+            if attempt == RATE_MOVIE_ATTEMPTS:
+                raise
+            continue
+        if db_rating is None:
+            # the same user's rating was changed since previous_score was read
+            db.rollback()
+            continue
+        movie = apply_rating_change(db, movie_id=movie_id, score=rating.rating, previous_score=previous_score)
+        # the movie row came back from the aggregate update, hand it to the response as is
+        set_committed_value(db_rating, "movie", movie)
+        db.commit()
+        return db_rating
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Rating changed concurrently, try again")
+
+def create_rating(db: Session, rating: schemas.RatingCreate, user_id: int):
+    """
+    Rates a movie by ID, a user's second rating of a movie replaces their first.
+
+    :param db: SQLAlchemy database session.
+    :param rating: rating to create.
+    :param user_id: ID of the rating user.
+    :return: the Rating, or None when the movie does not exist.
+    """
+    return rate_movie(db, movie_id=rating.movie_id, rating=rating, user_id=user_id)
+
+def create_rating_by_title(db: Session, rating: schemas.RatingCreate, user_id: int, title: str):
+    movie = get_movie_by_title(db=db, title=title)
+    if not movie:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    db_rating = rate_movie(db, movie_id=movie.id, rating=rating, user_id=user_id) # type: ignore
+    if db_rating is None:
+        # deleted since it was looked up
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    return db_rating
+
+
+def create_ratings_bulk(db: Session, items: List[schemas.BulkRatingItem], batch_size: int = 1000):
+    """
+    Inserts many ratings in one transaction. Users and movies are resolved with one
+    lookup per kind of reference instead of one per rating, the ratings are upserted in
+    batches and each affected movie's aggregates are recomputed once at the end.
+
+    :param db: SQLAlchemy database session.
+    :param items: ratings, each naming its user and movie by ID or by username/title.
+    :param batch_size: number of ratings per INSERT.
+    :return: number inserted, errors as (index, message) pairs, IDs of the affected movies.
+    """
+    usernames = {item.username for item in items if item.username is not None}
+    user_ids = {item.user_id for item in items if item.user_id is not None}
+    titles = {models.normalize_title(item.title) for item in items if item.title is not None}
+    movie_ids = {item.movie_id for item in items if item.movie_id is not None}
+
+    users_by_name = dict(db.execute(
+        select(models.User.username, models.User.id).where(models.User.username.in_(usernames))
+    ).all()) if usernames else {}
+    known_user_ids = set(db.scalars(
+        select(models.User.id).where(models.User.id.in_(user_ids))
+    )) if user_ids else set()
+    # like get_movie_by_title, a title shared by several movies resolves to one of them
+    movies_by_title = dict(db.execute(
+        select(models.Movie.title_normalized, func.min(models.Movie.id))
+        .where(models.Movie.title_normalized.in_(titles))
+        .group_by(models.Movie.title_normalized)
+    ).all()) if titles else {}
+    known_movie_ids = set(db.scalars(
+        select(models.Movie.id).where(models.Movie.id.in_(movie_ids))
+    )) if movie_ids else set()
+
+    # one rating per user and movie, a later item replaces an earlier one like an existing rating
+    rows, errors = {}, []
+    for index, item in enumerate(items):
+        user_id = users_by_name.get(item.username) if item.username is not None else item.user_id
+        movie_id = movies_by_title.get(models.normalize_title(item.title)) if item.title is not None else item.movie_id
+        if user_id is None or (item.user_id is not None and user_id not in known_user_ids):
+            errors.append((index, "User not found"))
+        elif movie_id is None or (item.movie_id is not None and movie_id not in known_movie_ids):
+            errors.append((index, "Movie not found"))
+        else:
+            rows[user_id, movie_id] = {"rating": item.rating, "review": item.review, "user_id": user_id, "movie_id": movie_id}
+
+    rows = list(rows.values())
+    upsert_ratings(db, rows, batch_size=batch_size)
+    affected = sorted({row["movie_id"] for row in rows})
+    if affected:
+        recompute_movie_ratings(db, movie_ids=affected)
+        # a replaced review leaves the aggregates as they were, the movie's ratings still changed
+        db.execute(
+            update(models.Movie).where(models.Movie.id.in_(affected)).values(version=models.Movie.version + 1),
+            execution_options={"synchronize_session": False},
+        )
+    db.commit()
+    return len(rows), errors, affected
+
+def apply_rating_change(db: Session, movie_id: int, score: Optional[int] = None, previous_score: Optional[int] = None):
+    """
+    Adjusts the rating aggregates and histogram of a movie for a rating being added (score),
+    removed (previous_score) or changed (both), with a single UPDATE in the caller's
+    transaction (nothing is committed here). The cost does not depend on how many
+    ratings the movie already has.
+
+    :param db: SQLAlchemy database session.
+    :param movie_id: movie ID.
+    :param score: score of the new or changed rating, None when a rating is removed.
+    :param previous_score: score the rating had before, None for a new rating.
+    :return: the updated Movie, or None when the movie does not exist.
+    """
+    rating_sum = models.Movie.rating_sum + ((score or 0) - (previous_score or 0))
+    rating_count = models.Movie.rating_count + (int(score is not None) - int(previous_score is not None))
+    histogram_deltas = defaultdict(int)
+    if score is not None:
+        histogram_deltas[score] += 1
+    if previous_score is not None:
+        histogram_deltas[previous_score] -= 1
+    # a score outside 1-5, stored before ratings were validated, has no histogram column
+    histogram_deltas = {key: delta for key, delta in histogram_deltas.items() if key in models.RATING_SCORES}
+    return db.scalars(
+        update(models.Movie)
+        .where(models.Movie.id == movie_id)
+        .values(
+            **{
+                f"rating_{histogram_score}_count": models.histogram_column(histogram_score) + delta
+                for histogram_score, delta in histogram_deltas.items() if delta
+            },
+            rating_sum=rating_sum,
+            rating_count=rating_count,
+            rating=case((rating_count > 0, cast(rating_sum, Float) / rating_count), else_=None),
+            weighted_rating=weighted_rating(rating_sum, rating_count),
+            version=models.Movie.version + 1,
+        )
+        .returning(models.Movie),
+        execution_options={"synchronize_session": "fetch"},
+    ).one_or_none()
+
+def apply_comment_change(db: Session, movie_id: int, parent_comment_id: Optional[int] = None, delta: int = 1):
+    """
+    Adjusts the comment_count of a movie, and the reply_count of the parent comment for a
+    reply, for comments being added (delta > 0) or removed (delta < 0). Each count is one
+    UPDATE in the caller's transaction (nothing is committed here).
+
+    :param db: SQLAlchemy database session.
+    :param movie_id: movie ID.
+    :param parent_comment_id: comment the comment replies to, None for a top-level comment.
+    :param delta: number of comments added, negative for removed comments.
+    :return: the updated Movie, or None when the movie does not exist.
+    """
+    if parent_comment_id is not None:
+        db.execute(
+            update(models.Comment)
+            .where(models.Comment.id == parent_comment_id)
+            .values(reply_count=models.Comment.reply_count + delta),
+            execution_options={"synchronize_session": "fetch"},
+        )
+    return db.scalars(
+        update(models.Movie)
+        .where(models.Movie.id == movie_id)
+        .values(comment_count=models.Movie.comment_count + delta, version=models.Movie.version + 1)
+        .returning(models.Movie),
+        execution_options={"synchronize_session": "fetch"},
+    ).one_or_none()
+
+def recompute_movie_ratings(db: Session, movie_ids: Optional[List[int]] = None):
+    """
+    Recomputes the rating aggregates of movies from the ratings table, repairing any drift
+    of the incrementally maintained values. Nothing is committed here.
+
+    :param db: SQLAlchemy database session.
+    :param movie_ids: movies to recompute, all movies when None.
+    :return: number of movies whose aggregates were out of date.
+    """
+    totals = (
+        select(
+            models.Rating.movie_id,
+            func.sum(models.Rating.rating).label("rating_sum"),
+            func.count(models.Rating.id).label("rating_count"),
+            *(
+                func.sum(case((models.Rating.rating == score, 1), else_=0)).label(f"rating_{score}_count")
+                for score in models.RATING_SCORES
+            ),
+        )
+        .group_by(models.Rating.movie_id)
+    )
+    if movie_ids is not None:
+        totals = totals.where(models.Rating.movie_id.in_(movie_ids))
+    totals = totals.subquery()
+    rated = db.execute(
+        update(models.Movie)
+        .where(models.Movie.id == totals.c.movie_id)
+        .where(or_(
+            models.Movie.rating_sum != totals.c.rating_sum,
+            models.Movie.rating_count != totals.c.rating_count,
+            models.Movie.rating.is_(None),
+            models.Movie.weighted_rating.is_(None),
+            *(models.histogram_column(score) != totals.c[f"rating_{score}_count"] for score in models.RATING_SCORES),
+        ))
+        .values(
+            **{f"rating_{score}_count": totals.c[f"rating_{score}_count"] for score in models.RATING_SCORES},
+            rating_sum=totals.c.rating_sum,
+            rating_count=totals.c.rating_count,
+            rating=cast(totals.c.rating_sum, Float) / totals.c.rating_count,
+            weighted_rating=weighted_rating(totals.c.rating_sum, totals.c.rating_count),
+            version=models.Movie.version + 1,
+        ),
+        execution_options={"synchronize_session": False},
+    )
+
+    # movies that no longer have any rating
+    unrated = (
+        update(models.Movie)
+        .where(~exists().where(models.Rating.movie_id == models.Movie.id))
+        .where(or_(
+            models.Movie.rating_count != 0,
+            models.Movie.rating_sum != 0,
+            models.Movie.rating.isnot(None),
+            models.Movie.weighted_rating.isnot(None),
+            *(models.histogram_column(score) != 0 for score in models.RATING_SCORES),
+        ))
+    )
+    if movie_ids is not None:
+        unrated = unrated.where(models.Movie.id.in_(movie_ids))
+    cleared = db.execute(
+        unrated.values(
+            **{f"rating_{score}_count": 0 for score in models.RATING_SCORES},
+            rating_sum=0, rating_count=0, rating=None, weighted_rating=None, version=models.Movie.version + 1,
+        ),
+        execution_options={"synchronize_session": False},
+    )
+    db.expire_all()
+    return rated.rowcount + cleared.rowcount # type: ignore
+
+
+def get_rating_stats(db: Session, movie_id: int):
+    """
+    Fetches the rating distribution of a movie from its stored histogram, without reading its ratings.
+
+    :param db: SQLAlchemy database session.
+    :param movie_id: movie ID.
+    :return: dict with the rating count, the count per score, the mean, median and
+        (population) standard deviation, and the movie's version, or None when the movie does not exist.
+    """
+    row = db.execute(
+        select(models.Movie.version, models.Movie.rating_count, *(models.histogram_column(score) for score in models.RATING_SCORES))
+        .where(models.Movie.id == movie_id)
+    ).first()
+    if row is None:
+        return None
+    histogram = dict(zip(models.RATING_SCORES, row[2:]))
+    stats = {"movie_id": movie_id, "version": row.version, "rating_count": row.rating_count, "histogram": histogram,
+             "mean": None, "median": None, "std_dev": None}
+    total = sum(histogram.values())
+    if total:
+        mean = sum(score * count for score, count in histogram.items()) / total
+        variance = sum(count * (score - mean) ** 2 for score, count in histogram.items()) / total
+
+        # the scores at the middle position(s) of the sorted ratings
+        def score_at(position: int):
+            seen = 0
+            for score, count in histogram.items():
+                seen += count
+                if position < seen:
+                    return score
+
+        stats.update(mean=mean, median=(score_at((total - 1) // 2) + score_at(total // 2)) / 2, std_dev=math.sqrt(variance))
+    return stats
+
+def weighted_rating(rating_sum, rating_count):
+    # SQL expression of the leaderboard score for the given rating aggregates
+    return case(
+        (
+            rating_count > 0,
+            (cast(rating_sum, Float) + LEADERBOARD_PRIOR_MEAN * LEADERBOARD_MIN_VOTES) / (rating_count + LEADERBOARD_MIN_VOTES),
+        ),
+        else_=None,
+    )
+
+def refresh_leaderboards(db: Session):
+    """
+    Recomputes every movie's leaderboard score and decade from the stored aggregates,
+    e.g. after the leaderboard settings changed. Nothing is committed here.
+
+    :param db: SQLAlchemy database session.
+    :return: number of movies whose score or decade changed.
+    """
+    score = weighted_rating(models.Movie.rating_sum, models.Movie.rating_count)
+    decade = case((models.Movie.release_year.isnot(None), models.Movie.release_year // 10 * 10), else_=None)
+    result = db.execute(
+        update(models.Movie)
+        .where(or_(models.Movie.weighted_rating.is_distinct_from(score), models.Movie.release_decade.is_distinct_from(decade)))
+        .values(weighted_rating=score, release_decade=decade),
+        execution_options={"synchronize_session": False},
+    )
+    db.expire_all()
+    return result.rowcount # type: ignore
+
+def get_leaderboard(db: Session, genre: Optional[str] = None, decade: Optional[int] = None,
+                    skip: int = 0, limit: int = DEFAULT_LEADERBOARD_SIZE, view: str = "full"):
+    """
+    Fetches the best rated movies by their stored Bayesian average, read in order from
+    one of the leaderboard indexes instead of aggregating the ratings.
+
+    :param db: SQLAlchemy database session.
+    :param genre: only movies of this genre (exact match).
+    :param decade: only movies released in this decade, e.g. 1990.
+    :param skip: number of places to skip.
+    :param limit: number of places to return.
+    :param view: "full" for whole movies with their owner, "summary" for the summary columns only.
+    :return: rated Movie objects, best first.
+    """
+    query = db.query(models.Movie).options(movie_loader(view)).filter(models.Movie.weighted_rating.isnot(None))
+    if genre is not None:
+        query = query.filter(models.Movie.genre == genre)
+    if decade is not None:
+        query = query.filter(models.Movie.release_decade == models.release_decade(decade))
+    return query.order_by(models.Movie.weighted_rating.desc(), models.Movie.id.desc()).offset(skip).limit(limit).all()
+
+def delete_rating(db: Session, rating_id: int):
+    """
+    Deletes a rating with DELETE ... RETURNING and takes its score off the movie's aggregates
+    in the same transaction. The score comes from the row the DELETE removed, so a change of
+    the rating committed after the caller looked it up is the one subtracted, and a rating
+    deleted concurrently is not subtracted twice.
+
+    :param db: SQLAlchemy database session.
+    :param rating_id: rating ID.
+    :return: the deleted Rating with its user and movie, or None when it no longer exists.
+    """
+    db_rating = db.scalars(
+        delete(models.Rating).where(models.Rating.id == rating_id).returning(models.Rating),
+        execution_options={"populate_existing": True},
+    ).one_or_none()
+    if db_rating is None:
+        db.rollback()
+        return None
+    movie = apply_rating_change(db, movie_id=db_rating.movie_id, previous_score=db_rating.rating) # type: ignore
+    # the deleted rating is still returned, hand it the rater (usually already in the session) and the updated movie
+    set_committed_value(db_rating, "user", db.get(models.User, db_rating.user_id))
+    set_committed_value(db_rating, "movie", movie)
+    db.commit()
+    return db_rating
+
+# Comment CRUD operations
+def get_comment(db: Session, comment_id: int):
+    return db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+
+
+def create_comment(db: Session, comment: schemas.CommentCreate, user_id: int):
+    """
+    Comments on a movie in a single transaction. The movie is loaded with its owner,
+    which both checks that it exists and provides everything the response needs,
+    then the parent comment of a reply is loaded and checked to be a comment on the
+    same movie, then the comment is inserted with INSERT ... RETURNING and the comment
+    counts of the movie and of the parent comment are incremented.
+
+    :param db: SQLAlchemy database session.
+    :param comment: comment to create.
+    :param user_id: ID of the commenting user.
+    :return: the new Comment, or None when the movie does not exist.
+    :raises HTTPException: 404 when the parent comment does not exist, 400 when it is
+        a comment on another movie.
+    """
+    movie = get_movie_by_id(db, comment.movie_id)
+    if movie is None:
+        db.rollback()
+        return None
+    if comment.parent_comment_id:
+        parent = db.get(models.Comment, comment.parent_comment_id)
+        if parent is None:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent comment not found")
+        if parent.movie_id != movie.id: # type: ignore
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parent comment is on another movie")
+    db_comment = db.scalars(
+        insert(models.Comment)
+        .values(
+            comment=comment.comment,
+            user_id=user_id,
+            movie_id=movie.id,
+            parent_comment_id=comment.parent_comment_id if comment.parent_comment_id else None,
+            created_at=datetime.datetime.now()
+        )
+        .returning(models.Comment)
+    ).one()
+    apply_comment_change(db, movie.id, db_comment.parent_comment_id) # type: ignore
+    # the movie was just loaded and a new comment has no replies yet, no need to query for either.
+    # a reply refers to its parent by parent_comment_id, the parent's replies would include the reply itself
+    set_committed_value(db_comment, "movie", movie)
+    set_committed_value(db_comment, "replies", [])
+    set_committed_value(db_comment, "parent_comment", None)
+    db.commit()
+    return db_comment
+
+def get_comments_by_movie(db: Session, movie_id: int):
+    return db.query(models.Comment).filter(models.Comment.movie_id == movie_id).all()
+
+def get_comments_by_user(db: Session, user_id: int):
+    return db.query(models.Comment).filter(models.Comment.user_id == user_id).all()
+
+def get_comments_page(
+    db: Session,
+    movie_id: Optional[int] = None,
+    parent_comment_id: Optional[int] = None,
+    order: str = "newest",
+    limit: int = DEFAULT_COMMENT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+):
+    """
+    Fetches a page of comments with their authors using keyset pagination on (created_at, id):
+    either the top-level comments of a movie or the direct replies of a comment, never their
+    replies. Each comment carries its reply_count, replies are fetched page by page in turn.
+
+    :param db: SQLAlchemy database session.
+    :param movie_id: movie whose top-level comments are listed.
+    :param parent_comment_id: comment whose replies are listed, instead of a movie's comments.
+    :param order: "newest" or "oldest" first.
+    :param limit: page size.
+    :param cursor: next_cursor returned with the previous page, None for the first page.
+    :return: tuple of the Comments and the cursor of the next page (None on the last page).
+    """
+    position = pagination.decode_cursor(cursor) if cursor else None
+    if position is not None:
+        try:
+            if position.get("order") != order or not isinstance(position.get("id"), int):
+                raise ValueError
+            created_at = datetime.datetime.fromisoformat(position["created_at"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor does not match the requested ordering")
+
+    query = db.query(models.Comment).options(joinedload(models.Comment.user))
+    if parent_comment_id is not None:
+        query = query.filter(models.Comment.parent_comment_id == parent_comment_id)
+    else:
+        query = query.filter(models.Comment.movie_id == movie_id, models.Comment.parent_comment_id.is_(None))
+
+    key = tuple_(models.Comment.created_at, models.Comment.id)
+    if order == "newest":
+        if position is not None:
+            query = query.filter(key < tuple_(created_at, position["id"]))
+        query = query.order_by(models.Comment.created_at.desc(), models.Comment.id.desc())
+    else:
+        if position is not None:
+            query = query.filter(key > tuple_(created_at, position["id"]))
+        query = query.order_by(models.Comment.created_at, models.Comment.id)
+    comments = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        last = comments[-1]
+        next_cursor = pagination.encode_cursor({"order": order, "created_at": last.created_at.isoformat(), "id": last.id})
+    return comments, next_cursor
+
+def get_comment_thread(db: Session, movie_id: int, max_depth: int = DEFAULT_THREAD_DEPTH):
+    """
+    Fetches every comment on a movie together with its author in a single query
+    and assembles the reply tree in memory.
+
+    :param db: SQLAlchemy database session.
+    :param movie_id: movie ID.
+    :param max_depth: number of reply levels to include, deeper replies are cut off.
+    :return: list of top-level CommentThread objects with their nested replies.
+    """
+    comments = (
+        db.query(models.Comment)
+        .options(joinedload(models.Comment.user))
+        .filter(models.Comment.movie_id == movie_id)
+        .order_by(models.Comment.created_at, models.Comment.id)
+        .all()
+    )
+    by_id = {comment.id: comment for comment in comments}
+    children = defaultdict(list)
+    roots = []
+    for comment in comments:
+        parent_id = comment.parent_comment_id
+        # replies whose parent is missing or on another movie are shown at the top level
+        if parent_id is None or parent_id == comment.id or parent_id not in by_id:
+            roots.append(comment)
+        else:
+            children[parent_id].append(comment)
+
+    users = {}
+    visited = set()
+
+    def skip(comment_ids):
+        # marks the replies cut off at max_depth and everything below them as handled
+        pending = list(comment_ids)
+        while pending:
+            comment_id = pending.pop()
+            if comment_id not in visited:
+                visited.add(comment_id)
+                pending.extend(reply.id for reply in children[comment_id])
+
+    def build(comment: models.Comment, depth: int):
+        visited.add(comment.id)
+        if comment.user_id not in users:
+            users[comment.user_id] = schemas.User.model_validate(comment.user)
+        node = schemas.CommentThread(
+            id=comment.id, # type: ignore
+            comment=comment.comment, # type: ignore
+            user_id=comment.user_id, # type: ignore
+            movie_id=comment.movie_id, # type: ignore
+            parent_comment_id=comment.parent_comment_id, # type: ignore
+            created_at=comment.created_at, # type: ignore
+            reply_count=comment.reply_count, # type: ignore
+            user=users[comment.user_id],
+        )
+        replies = [reply for reply in children[comment.id] if reply.id not in visited]
+        if depth >= max_depth:
+            node.replies_truncated = bool(replies)
+            skip(reply.id for reply in replies)
+        else:
+            node.replies = [build(reply, depth + 1) for reply in replies]
+        return node
+
+    thread = [build(root, 1) for root in roots]
+    # comments caught in a parent cycle are never reached from a root, so each
+    # cycle is broken at its oldest comment instead of being dropped
+    for comment in comments:
+        if comment.id not in visited:
+            thread.append(build(comment, 1))
+    return thread
@@ -1,21 +1,97 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from dotenv import load_dotenv
-import os
-
-
-load_dotenv()
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-engine = create_engine(DATABASE_URL) # type: ignore
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-print(engine)
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker, declarative_base
+from dotenv import load_dotenv
+from .pool import pool_options
+import itertools
+import os
+
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+# optional read replicas of DATABASE_URL, comma separated
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+# "round_robin" or "least_busy" (fewest connections checked out)
+REPLICA_SELECTION = os.getenv("REPLICA_SELECTION", "round_robin")
+# "true" serves the read-only endpoints from async sessions (asyncpg / aiosqlite) instead of the threadpool
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# async driver used for each backend when DATABASE_ASYNC is set
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_url(url: str):
+    # postgresql://... -> postgresql+asyncpg://..., sqlite:///... -> sqlite+aiosqlite:///...
+    parsed = make_url(url)
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{ASYNC_DRIVERS[parsed.get_backend_name()]}")
+
+
+def enable_sqlite_foreign_keys(engine):
+    """
+    Turns on foreign key enforcement for every connection of a SQLite engine. SQLite leaves it
+    off by default, which would also leave the ON DELETE CASCADE of ratings and comments unapplied.
+
+    :param engine: sync engine, engines of other databases are left alone.
+    :return: the engine.
+    """
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def set_foreign_keys(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+    return engine
+
+
+engine = enable_sqlite_foreign_keys(create_engine(DATABASE_URL, **pool_options(DATABASE_URL))) # type: ignore
+replica_engines = [create_engine(url, **pool_options(url)) for url in REPLICA_DATABASE_URLS]
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+Base = declarative_base()
+
+
+class ReplicaSelector:
+    """
+    Picks the replica engine for the next read-only session.
+
+    :param engines: replica engines, reads go to the primary engine when there are none.
+    :param strategy: "round_robin", or "least_busy" to prefer the replica with the fewest
+        checked out connections (ties are broken round robin).
+    :param primary: engine used when there are no replicas, the primary engine by default.
+    """
+
+    def __init__(self, engines, strategy: str = "round_robin", primary=None):
+        self.engines = engines
+        self.strategy = strategy
+        self.primary = engine if primary is None else primary
+        self.turns = itertools.count()
+
+    def choose(self):
+        if not self.engines:
+            return self.primary
+        start = next(self.turns) % len(self.engines)
+        rotated = self.engines[start:] + self.engines[:start]
+        if self.strategy == "least_busy":
+            return min(rotated, key=lambda replica: getattr(replica.pool, "checkedout", lambda: 0)())
+        return rotated[0]
+
+
+replica_selector = ReplicaSelector(replica_engines, REPLICA_SELECTION)
+
+# async engines of the primary and the replicas, only created in async mode
+def create_async_pooled_engine(url: str):
+    async_url = async_database_url(url)
+    return create_async_engine(async_url, **pool_options(async_url))
+
+
+async_engine = create_async_pooled_engine(DATABASE_URL) if DATABASE_ASYNC else None # type: ignore
+async_replica_engines = [create_async_pooled_engine(url) for url in REPLICA_DATABASE_URLS] if DATABASE_ASYNC else []
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+async_replica_selector = ReplicaSelector(async_replica_engines, REPLICA_SELECTION, primary=async_engine)
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
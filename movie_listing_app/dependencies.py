@@ -1,43 +1,77 @@
-from typing import Union
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from . import models, crud, database
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
-
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256" 
-
-
-
-# Dependency to get a database session
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Dependency to get the current authenticated user
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]) # type: ignore
-        username: Union[str, None] = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = crud.get_user_by_username(db, username=username)
-    if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+from typing import Union
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError, jwt
+from sqlalchemy.orm import Session
+from . import models, crud, database
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = "HS256" 
+
+# set after a write, reads stay on the primary while it lasts so clients see their own writes
+READ_PRIMARY_COOKIE = "read_primary"
+REPLICA_LAG_SECONDS = int(os.getenv("REPLICA_LAG_SECONDS", "5"))
+
+
+
+# Dependency to get a database session
+def get_db():
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency to get a session for read-only handlers. It reads from a replica when replicas
+# are configured, unless the client wrote recently (see middleware.ReadYourWritesMiddleware).
+def get_read_db(request: Request):
+    if request.cookies.get(READ_PRIMARY_COOKIE):
+        db = database.SessionLocal()
+    else:
+        db = database.SessionLocal(bind=database.replica_selector.choose())
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Async counterpart of get_read_db, used by the read-only handlers when DATABASE_ASYNC is set
+async def get_async_read_db(request: Request):
+    if request.cookies.get(READ_PRIMARY_COOKIE):
+        bind = database.async_engine
+    else:
+        bind = database.async_replica_selector.choose()
+    async with database.AsyncSessionLocal(bind=bind) as db:
+        yield db
+
+# The session dependency of the read-only handlers, see async_crud for how they use either kind of session
+read_db = get_async_read_db if database.DATABASE_ASYNC else get_read_db
+
+# Dependency to get the current authenticated user
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]) # type: ignore
+        username: Union[str, None] = payload.get("sub")
+        if username is None:
+            raise credentials_exception
+    except JWTError:
+        raise credentials_exception
+    user = crud.get_user_by_username(db, username=username)
+    if user is None:
+        raise credentials_exception
+    return user
+
+# Dependency to get the current authenticated user, only when they are an administrator
+def get_current_admin(current_user: models.User = Depends(get_current_user)):
+    if current_user.role != "admin": # type: ignore
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administrator access required")
+    return current_user
\ No newline at end of file
@@ -0,0 +1,63 @@
+# movie_listing_app/etags.py
+# conditional GETs for the movie, rating and comment reads. their ETags are derived from
+# Movie.version, which every write to a movie, its ratings or its comments increments, so an
+# unchanged resource is recognised from the version alone and answered with 304 Not Modified.
+
+from typing import Optional
+from fastapi import Request, Response
+from starlette import status
+
+
+def movie_etag(resource: str, movie_id: int, version: int) -> str:
+    """
+    Strong ETag of a resource that only changes with its movie.
+
+    :param resource: name of the representation, e.g. "movie" or "comments", so the
+        different reads of one movie never share a tag.
+    :param movie_id: movie ID.
+    :param version: Movie.version.
+    :return: quoted entity tag, e.g. "movie-7-3".
+    """
+    return f'"{resource}-{movie_id}-{version}"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """
+    Whether the client's If-None-Match header matches an ETag, compared weakly as RFC 9110 asks.
+
+    :param request: incoming request.
+    :param etag: current ETag of the resource.
+    :return: True when the client's copy is current.
+    """
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    # 304 Not Modified, it carries the ETag but no body
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def conditional(request: Request, response: Response, resource: str, version) -> Optional[Response]:
+    """
+    Answers a conditional GET from the version of the resource's movie.
+
+    :param request: incoming request.
+    :param response: response of the endpoint, which gets the ETag header.
+    :param resource: name of the representation, as for movie_etag.
+    :param version: (movie ID, version) row from crud.get_movie_version, None when the
+        movie does not exist and the endpoint answers as it would without an ETag.
+    :return: a 304 response when the client's copy is current, else None and the
+        endpoint builds the full response.
+    """
+    if version is None:
+        return None
+    etag = movie_etag(resource, *version)
+    if if_none_match(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return None
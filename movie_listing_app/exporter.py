@@ -0,0 +1,112 @@
+# movie_listing_app/exporter.py
+# streaming export of movies, ratings and comments as NDJSON or CSV, used by GET /export/{table}
+# and the export command. rows are read through a server-side cursor in id order, so memory use
+# does not grow with the table and an interrupted export can resume after the last id it wrote.
+
+import csv
+import datetime
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from . import models
+
+EXPORT_FORMATS = ("ndjson", "csv")
+# rows fetched from the cursor at a time, also the number of rows per written chunk
+EXPORT_BATCH_SIZE = 1000
+
+# exported columns of each table, the derived and internal columns are left out
+EXPORT_COLUMNS = {
+    "movies": (
+        models.Movie.id, models.Movie.title, models.Movie.release_year, models.Movie.genre,
+        models.Movie.synopsis, models.Movie.rating, models.Movie.rating_count, models.Movie.owner_id,
+    ),
+    "ratings": (
+        models.Rating.id, models.Rating.rating, models.Rating.review, models.Rating.user_id, models.Rating.movie_id,
+    ),
+    "comments": (
+        models.Comment.id, models.Comment.comment, models.Comment.user_id, models.Comment.movie_id,
+        models.Comment.parent_comment_id, models.Comment.created_at,
+    ),
+}
+
+
+def iter_batches(db: Session, table: str, after_id: Optional[int] = None, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Reads a table in id order through a server-side cursor (yield_per streams the results).
+
+    :param db: SQLAlchemy database session.
+    :param table: one of EXPORT_COLUMNS.
+    :param after_id: only rows with a greater id are exported, to resume an export.
+    :param batch_size: rows fetched per round trip.
+    :return: iterator over lists of rows.
+    """
+    columns = EXPORT_COLUMNS[table]
+    id_column = columns[0]
+    statement = select(*columns).order_by(id_column)
+    if after_id is not None:
+        statement = statement.where(id_column > after_id)
+    result = db.execute(statement.execution_options(yield_per=batch_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def encode_value(value):
+    # timestamps are written in ISO 8601, like the API responses
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+
+def to_ndjson(table: str, batches: Iterable[list]) -> Iterator[str]:
+    names = [column.key for column in EXPORT_COLUMNS[table]]
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(names, row)), default=encode_value) + "\n" for row in rows)
+
+
+def to_csv(table: str, batches: Iterable[list]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in EXPORT_COLUMNS[table]])
+    for rows in batches:
+        writer.writerows([encode_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    # wbits=31 writes a gzip header and trailer, so the output is a regular .gz file
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_table(db: Session, table: str, format: str = "ndjson", compress: bool = False,
+                 after_id: Optional[int] = None, batch_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Streams a table as NDJSON or CSV (with a header row), optionally gzip compressed.
+    The session is closed once the export is finished or abandoned.
+
+    :param db: SQLAlchemy database session, owned by the export from here on.
+    :param table: "movies", "ratings" or "comments".
+    :param format: "ndjson" or "csv".
+    :param compress: gzip the output on the fly.
+    :param after_id: resume after this id.
+    :param batch_size: rows fetched and written at a time, EXPORT_BATCH_SIZE by default.
+    :return: iterator over the encoded output.
+    """
+    try:
+        batches = iter_batches(db, table, after_id=after_id, batch_size=batch_size or EXPORT_BATCH_SIZE)
+        text = to_csv(table, batches) if format == "csv" else to_ndjson(table, batches)
+        chunks = (chunk.encode() for chunk in text)
+        yield from (gzip_chunks(chunks) if compress else chunks)
+    finally:
+        db.close()
@@ -0,0 +1,122 @@
+# movie_listing_app/importer.py
+# bulk movie import from NDJSON or CSV, used by POST /movies/import and the import-movies command.
+# rows are read, validated and inserted batch by batch, so the file is never held in memory.
+
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+from anyio import from_thread
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from . import crud, schemas
+
+IMPORT_FORMATS = ("ndjson", "csv")
+DEFAULT_BATCH_SIZE = 1000
+MAX_BATCH_SIZE = 10000
+# only the first errors are reported row by row, the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Splits a stream of UTF-8 byte chunks into lines, keeping the line endings.
+
+    :param chunks: raw body chunks, split anywhere.
+    :return: iterator over the decoded lines.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def iter_sync(stream: AsyncIterator[bytes]) -> Iterator[bytes]:
+    """
+    Pulls an async byte stream from a worker thread started by anyio.
+
+    :param stream: async iterator owned by the event loop, e.g. request.stream().
+    :return: iterator that blocks the worker thread until the next chunk arrives.
+    """
+    async def next_chunk() -> Optional[bytes]:
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    while (chunk := from_thread.run(next_chunk)) is not None:
+        yield chunk
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[Tuple[int, object]]:
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as exc:
+            yield line_number, ValueError(f"invalid JSON: {exc}")
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Tuple[int, object]]:
+    reader = csv.DictReader(lines)
+    try:
+        for row in reader:
+            if None in row:
+                yield reader.line_num, ValueError("row has more fields than the header")
+                continue
+            # empty cells are missing values, not empty strings
+            yield reader.line_num, {key: value for key, value in row.items() if value not in ("", None)}
+    except csv.Error as exc:
+        yield reader.line_num, ValueError(f"invalid CSV: {exc}")
+
+
+def describe_error(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()
+        )
+    return str(exc)
+
+
+def import_movies(db: Session, lines: Iterable[str], format: str, owner_id: int, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Validates movie rows with schemas.MovieCreate and inserts the valid ones in batches.
+    Each batch is committed on its own, so rows imported before a failure are kept.
+
+    :param db: SQLAlchemy database session.
+    :param lines: text lines of the file, with their line endings.
+    :param format: "ndjson" or "csv" (with a header row).
+    :param owner_id: user that owns the imported movies.
+    :param batch_size: number of movies inserted per statement.
+    :return: report with the imported and failed counts and the errors by line number.
+    """
+    rows = read_csv(lines) if format == "csv" else read_ndjson(lines)
+    imported = failed = 0
+    errors: List[dict] = []
+    batch: List[schemas.MovieCreate] = []
+
+    for line_number, row in rows:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            batch.append(schemas.MovieCreate.model_validate(row))
+        except (ValidationError, ValueError) as exc:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": line_number, "error": describe_error(exc)})
+            continue
+        if len(batch) >= batch_size:
+            imported += crud.create_movies_bulk(db, batch, owner_id=owner_id)
+            db.commit()
+            batch = []
+
+    imported += crud.create_movies_bulk(db, batch, owner_id=owner_id)
+    db.commit()
+    return {"imported": imported, "failed": failed, "errors": errors, "errors_truncated": failed > len(errors)}
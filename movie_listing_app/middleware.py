@@ -0,0 +1,38 @@
+# movie_listing_app/middleware.py
+
+from http.cookies import SimpleCookie
+from . import database, dependencies
+
+# request methods that never write
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadYourWritesMiddleware:
+    """
+    Marks clients that just wrote with the read-primary cookie, for REPLICA_LAG_SECONDS,
+    so get_read_db serves their next reads from the primary instead of a replica that may
+    not have replayed the write yet. Does nothing when no replicas are configured.
+    Plain ASGI, so streamed request and response bodies pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not database.replica_engines:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = SimpleCookie()
+                cookie[dependencies.READ_PRIMARY_COOKIE] = "1"
+                cookie[dependencies.READ_PRIMARY_COOKIE]["max-age"] = dependencies.REPLICA_LAG_SECONDS
+                cookie[dependencies.READ_PRIMARY_COOKIE]["path"] = "/"
+                cookie[dependencies.READ_PRIMARY_COOKIE]["httponly"] = True
+                cookie[dependencies.READ_PRIMARY_COOKIE]["samesite"] = "lax"
+                header = cookie.output(header="").strip().encode("latin-1")
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"set-cookie", header)])
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
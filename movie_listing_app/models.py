@@ -1,63 +1,198 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime
-from sqlalchemy.orm import relationship
-from sqlalchemy.ext.declarative import declarative_base
-from movie_listing_app.database import Base
-import datetime
-
-class User(Base):
-    __tablename__ = 'users'
-    id = Column(Integer, primary_key=True, index=True)
-    first_name = Column(String, nullable=False)
-    last_name = Column(String, nullable=False)
-    username = Column(String, unique=True, index=True, nullable=False)
-    email = Column(String, unique=True, index=True, nullable=False)
-    password = Column(String, nullable=False)
-    role = Column(String, default="user")
-
-    ratings = relationship('Rating', back_populates='user')
-    comments = relationship('Comment', back_populates='user')
-    movies = relationship('Movie', back_populates='owner')
-
-
-class Movie(Base):
-    __tablename__ = 'movies'
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True, nullable=False)
-    release_year = Column(Integer)
-    genre = Column(String)
-    rating = Column(Float)
-    synopsis = Column(Text)
-    owner_id = Column(Integer, ForeignKey('users.id'))
-
-    owner = relationship('User', back_populates='movies')
-    ratings = relationship('Rating', back_populates='movie')
-    comments = relationship('Comment', back_populates='movie')
-
-
-class Rating(Base):
-    __tablename__ = 'ratings'
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    movie_id = Column(Integer, ForeignKey('movies.id'), nullable=False)
-    rating = Column(Integer, nullable=False)
-    review = Column(Text)
-
-    user = relationship('User', back_populates='ratings')
-    movie = relationship('Movie', back_populates='ratings')
-
-
-
-
-class Comment(Base):
-    __tablename__ = 'comments'
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    movie_id = Column(Integer, ForeignKey('movies.id'), nullable=False)
-    comment = Column(Text, nullable=False)
-    parent_comment_id = Column(Integer, ForeignKey('comments.id'), nullable=True)
-    created_at = Column(DateTime, default=datetime.datetime.now)
-
-    user = relationship('User', back_populates='comments')
-    movie = relationship('Movie', back_populates='comments')
-    parent_comment = relationship('Comment', remote_side=[id], back_populates='replies')
-    replies = relationship('Comment', back_populates='parent_comment', cascade='all, delete-orphan')
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Index, DDL, event
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy.ext.declarative import declarative_base
+from movie_listing_app.database import Base
+import datetime
+import unicodedata
+
+
+def normalize_title(title: str) -> str:
+    """
+    Folds a movie title into the form stored in Movie.title_normalized, so
+    lookups that differ only in case, Unicode form or spacing find the same movie.
+
+    :param title: movie title as typed.
+    :return: NFKC normalized, casefolded title with runs of whitespace collapsed.
+    """
+    folded = unicodedata.normalize("NFKC", unicodedata.normalize("NFKC", title).casefold())
+    return " ".join(folded.split())
+
+
+def release_decade(release_year):
+    """
+    The decade a release year belongs to, as stored in Movie.release_decade.
+
+    :param release_year: release year, or None.
+    :return: first year of the decade (1994 -> 1990), None without a year.
+    """
+    return None if release_year is None else release_year // 10 * 10
+
+
+# the scores a rating can give, one histogram column of Movie each
+RATING_SCORES = (1, 2, 3, 4, 5)
+
+
+def histogram_column(score: int):
+    # the Movie column counting the ratings of a score
+    return getattr(Movie, f"rating_{score}_count")
+
+
+class User(Base):
+    __tablename__ = 'users'
+    id = Column(Integer, primary_key=True, index=True)
+    first_name = Column(String, nullable=False)
+    last_name = Column(String, nullable=False)
+    username = Column(String, unique=True, index=True, nullable=False)
+    email = Column(String, unique=True, index=True, nullable=False)
+    password = Column(String, nullable=False)
+    role = Column(String, default="user")
+
+    ratings = relationship('Rating', back_populates='user')
+    comments = relationship('Comment', back_populates='user')
+    movies = relationship('Movie', back_populates='owner')
+
+
+class Movie(Base):
+    __tablename__ = 'movies'
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, index=True, nullable=False)
+    title_normalized = Column(String, index=True, nullable=False)
+    release_year = Column(Integer)
+    release_decade = Column(Integer)
+    genre = Column(String)
+    rating = Column(Float)
+    # Bayesian average the leaderboards rank by, None while the movie has no rating
+    weighted_rating = Column(Float)
+    # running totals behind rating, kept up to date by every rating write
+    rating_sum = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_count = Column(Integer, nullable=False, default=0, server_default='0')
+    # number of ratings of each score, the histogram behind the rating statistics
+    rating_1_count = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_2_count = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_3_count = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_4_count = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_5_count = Column(Integer, nullable=False, default=0, server_default='0')
+    # number of comments on the movie, replies included, kept up to date by every comment write
+    comment_count = Column(Integer, nullable=False, default=0, server_default='0')
+    # incremented by every write to the movie, its ratings or its comments, the ETags of the reads derive from it
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    synopsis = Column(Text)
+    owner_id = Column(Integer, ForeignKey('users.id'), index=True)
+
+    owner = relationship('User', back_populates='movies')
+    # the database deletes the ratings and comments of a deleted movie (ON DELETE CASCADE),
+    # passive_deletes keeps the ORM from loading them first
+    ratings = relationship('Rating', back_populates='movie', cascade='all, delete', passive_deletes=True)
+    comments = relationship('Comment', back_populates='movie', cascade='all, delete', passive_deletes=True)
+
+    @validates('title')
+    def validate_title(self, key, title):
+        self.title_normalized = normalize_title(title)
+        return title
+
+    @validates('release_year')
+    def validate_release_year(self, key, release_year):
+        self.release_decade = release_decade(release_year)
+        return release_year
+
+    # keyset pagination indexes, the id breaks ties between equal sort keys. The genre
+    # variants serve GET /movies/-/filter, where genre is the usual equality filter.
+    __table_args__ = (
+        Index('ix_movies_rating_id', 'rating', 'id'),
+        Index('ix_movies_release_year_id', 'release_year', 'id'),
+        Index('ix_movies_title_normalized_id', 'title_normalized', 'id'),
+        Index('ix_movies_genre_rating_id', 'genre', 'rating', 'id'),
+        Index('ix_movies_genre_release_year_id', 'genre', 'release_year', 'id'),
+        Index('ix_movies_genre_title_normalized_id', 'genre', 'title_normalized', 'id'),
+        # leaderboards, overall and per genre or decade
+        Index('ix_movies_weighted_rating_id', 'weighted_rating', 'id'),
+        Index('ix_movies_genre_weighted_rating_id', 'genre', 'weighted_rating', 'id'),
+        Index('ix_movies_release_decade_weighted_rating_id', 'release_decade', 'weighted_rating', 'id'),
+    )
+
+
+# Full-text search over title, genre and synopsis. PostgreSQL keeps a weighted
+# tsvector in a generated column with a GIN index, SQLite (local and test setups)
+# mirrors the searchable columns into an FTS5 table kept in sync by triggers.
+# Either way the index follows every insert and update of a movie by itself.
+MOVIE_SEARCH_DDL = [
+    DDL(
+        "ALTER TABLE movies ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(genre, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(synopsis, '')), 'C')) STORED"
+    ).execute_if(dialect='postgresql'),
+    DDL("CREATE INDEX ix_movies_search_vector ON movies USING GIN (search_vector)").execute_if(dialect='postgresql'),
+    DDL(
+        "CREATE VIRTUAL TABLE movies_fts USING fts5("
+        "title, genre, synopsis, content='movies', content_rowid='id', tokenize='porter unicode61')"
+    ).execute_if(dialect='sqlite'),
+    DDL(
+        "CREATE TRIGGER movies_fts_insert AFTER INSERT ON movies BEGIN "
+        "INSERT INTO movies_fts(rowid, title, genre, synopsis) VALUES (new.id, new.title, new.genre, new.synopsis); "
+        "END"
+    ).execute_if(dialect='sqlite'),
+    DDL(
+        "CREATE TRIGGER movies_fts_delete AFTER DELETE ON movies BEGIN "
+        "INSERT INTO movies_fts(movies_fts, rowid, title, genre, synopsis) "
+        "VALUES ('delete', old.id, old.title, old.genre, old.synopsis); "
+        "END"
+    ).execute_if(dialect='sqlite'),
+    DDL(
+        "CREATE TRIGGER movies_fts_update AFTER UPDATE OF title, genre, synopsis ON movies BEGIN "
+        "INSERT INTO movies_fts(movies_fts, rowid, title, genre, synopsis) "
+        "VALUES ('delete', old.id, old.title, old.genre, old.synopsis); "
+        "INSERT INTO movies_fts(rowid, title, genre, synopsis) VALUES (new.id, new.title, new.genre, new.synopsis); "
+        "END"
+    ).execute_if(dialect='sqlite'),
+]
+
+for ddl in MOVIE_SEARCH_DDL:
+    event.listen(Movie.__table__, 'after_create', ddl)
+event.listen(Movie.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS movies_fts").execute_if(dialect='sqlite'))
+
+
+class Rating(Base):
+    __tablename__ = 'ratings'
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'), nullable=False, index=True)
+    rating = Column(Integer, nullable=False, index=True)
+    review = Column(Text)
+
+    user = relationship('User', back_populates='ratings')
+    movie = relationship('Movie', back_populates='ratings')
+
+    # one rating per user and movie, rating again replaces it. Also serves the lookups by user.
+    __table_args__ = (
+        Index('uq_ratings_user_id_movie_id', 'user_id', 'movie_id', unique=True),
+    )
+
+
+
+
+class Comment(Base):
+    __tablename__ = 'comments'
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    movie_id = Column(Integer, ForeignKey('movies.id', ondelete='CASCADE'), nullable=False, index=True)
+    comment = Column(Text, nullable=False)
+    parent_comment_id = Column(Integer, ForeignKey('comments.id', ondelete='CASCADE'), nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.now)
+    # number of direct replies, kept up to date by every comment write
+    reply_count = Column(Integer, nullable=False, default=0, server_default='0')
+
+    user = relationship('User', back_populates='comments')
+    movie = relationship('Movie', back_populates='comments')
+    parent_comment = relationship('Comment', remote_side=[id], back_populates='replies')
+    replies = relationship('Comment', back_populates='parent_comment', cascade='all, delete-orphan', passive_deletes=True)
+
+    # comment pages in creation order: the top-level comments of a movie (partial index, replies
+    # are left out) and the replies of a comment, which also serves the lookups by parent
+    __table_args__ = (
+        Index(
+            'ix_comments_movie_id_created_at_id', 'movie_id', 'created_at', 'id',
+            postgresql_where=parent_comment_id.is_(None), sqlite_where=parent_comment_id.is_(None),
+        ),
+        Index('ix_comments_parent_comment_id_created_at_id', 'parent_comment_id', 'created_at', 'id'),
+    )
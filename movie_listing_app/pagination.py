@@ -0,0 +1,33 @@
+import base64
+import binascii
+import json
+from fastapi import HTTPException
+from starlette import status
+
+
+def encode_cursor(position: dict) -> str:
+    """
+    Encodes the position of the last row on a page into an opaque cursor.
+
+    :param position: JSON serializable values identifying the last row.
+    :return: URL safe cursor string.
+    """
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    :param cursor: cursor string sent back by the client.
+    :return: the position the cursor was built from.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not isinstance(position, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return position
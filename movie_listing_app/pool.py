@@ -0,0 +1,126 @@
+# movie_listing_app/pool.py
+# connection pool settings and telemetry. the pool is sized from the environment, and every queue pool
+# records how long checkouts wait and how often they time out, served by GET /metrics/pool.
+
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from sqlalchemy import exc, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+load_dotenv()
+
+# pool settings, the defaults are SQLAlchemy's. with uvicorn workers, each worker process has its own pool
+# of up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections, which together have to fit the database's limit.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# seconds a checkout waits for a free connection before failing with "QueuePool limit ... reached"
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# seconds after which a connection is replaced, -1 keeps connections forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+# test connections with a round trip on checkout, so connections dropped by the server are replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+# reuse the most recently returned connection first, so idle connections can time out server side
+DB_POOL_USE_LIFO = os.getenv("DB_POOL_USE_LIFO", "false").lower() in ("1", "true", "yes")
+
+
+class PoolMetrics:
+    """
+    Checkout counters of one pool. Waits include establishing a new connection and the pre-ping.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait: float, timed_out: bool):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+
+class InstrumentedPoolMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect() # type: ignore
+        except exc.TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            logging.warning(f"database connection pool exhausted: {self.status()}") # type: ignore
+            raise
+        self.metrics.record(time.perf_counter() - start, timed_out=False)
+        return connection
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(url, **overrides):
+    """
+    Engine arguments that apply the pool settings to a database URL.
+
+    :param url: database URL, sync or async.
+    :param overrides: pool settings replacing the configured ones, e.g. pool_size=1.
+    :return: keyword arguments for create_engine / create_async_engine. Databases that do
+        not use a queue pool (SQLite in memory, aiosqlite) only get the pre-ping setting.
+    """
+    parsed = make_url(url)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    pool_class = parsed.get_dialect().get_pool_class(parsed)
+    if issubclass(pool_class, QueuePool):
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool if issubclass(pool_class, AsyncAdaptedQueuePool) else InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_use_lifo=DB_POOL_USE_LIFO,
+        )
+    options.update(overrides)
+    return options
+
+
+def pool_stats(name: str, engine):
+    """
+    Current state and checkout counters of an engine's pool.
+
+    :param name: label of the engine in the report, e.g. "primary".
+    :param engine: sync or async engine.
+    :return: dict in the shape of schemas.PoolStats.
+    """
+    pool = engine.pool
+    metrics = getattr(pool, "metrics", None)
+    stats = {"name": name, "pool": type(pool).__name__, "instrumented": metrics is not None}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(), idle=pool.checkedin(), overflow=max(pool.overflow(), 0))
+    if metrics is not None:
+        with metrics.lock:
+            stats.update(
+                checkouts=metrics.checkouts,
+                timeouts=metrics.timeouts,
+                wait_seconds_total=metrics.wait_seconds_total,
+                wait_seconds_max=metrics.wait_seconds_max,
+                wait_seconds_mean=(
+                    metrics.wait_seconds_total / (metrics.checkouts + metrics.timeouts)
+                    if metrics.checkouts + metrics.timeouts else None
+                ),
+            )
+    return stats
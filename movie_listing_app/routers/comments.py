@@ -1,68 +1,136 @@
-import logging
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import schemas, models, crud, dependencies
-from movie_listing_app.logging_config import configure_logging
-
-router = APIRouter(
-    prefix="/comments",
-    tags=["comments"],
-)
-
-configure_logging()
-
-
-# endpoint to create comment by movie ID
-@router.post("/", response_model=schemas.Comment, status_code=status.HTTP_201_CREATED)
-def create_comment(
-    comment: schemas.CommentCreate,
-    db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(dependencies.get_current_user)
-):
-    db_movie = crud.get_movie_by_id(db, movie_id=comment.movie_id)
-    if not db_movie:
-        logging.warning("movie not found")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
-    logging.info(f"user: {current_user.username} commented on movie: {db_movie.title}")
-    return crud.create_comment(db=db, comment=comment, user_id=current_user.id) # type: ignore
-
-# if a user does not know the movie ID, this is an endpoint to create comment by movie title
-@router.post("/by-title/", response_model=schemas.Comment)
-def create_comment_by_title(
-    comment: schemas.CommentBase,
-    movie_title: str,
-    db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(dependencies.get_current_user)
-):
-    db_movie = crud.get_movie_by_title(db, title=movie_title)
-    if not db_movie:
-        logging.warning("movie not found")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
-    comment_create = schemas.CommentCreate(
-        comment=comment.comment,
-        movie_id=db_movie.id, # type: ignore
-        parent_comment_id=None 
-    )
-    logging.info(f"user: {current_user.username} commented on movie: {db_movie.title}")
-    return crud.create_comment(db=db, comment=comment_create, user_id=current_user.id) # type: ignore
-
-# endpoint to get all comments by movie ID
-@router.get("/movie/{movie_id}", response_model=List[schemas.Comment])
-def read_comments_by_movie(movie_id: int, db: Session = Depends(dependencies.get_db)):
-    logging.info(f"reading comments for movie: {movie_id}")
-    return crud.get_comments_by_movie(db, movie_id=movie_id)
-
-# endpoint to get all comments by movie title
-@router.get("/by-title/{movie_title}", response_model=List[schemas.Comment])
-def read_comments_by_movie_title(movie_title: str, db: Session = Depends(dependencies.get_db)):
-    logging.info(f"Fetching comments for movie '{movie_title}'")
-    movie = crud.get_movie_by_title(db=db, title=movie_title)
-    if not movie:
-        logging.error(f"Movie not found for title '{movie_title}' during comment retrieval")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
-    
-    comments = crud.get_comments_by_movie(db=db, movie_id=movie.id) # type: ignore
-    logging.info(f"Retrieved {len(comments)} comments for movie '{movie.title}'")
-    return comments
-
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional, Union
+from .. import schemas, models, crud, async_crud, dependencies, etags
+from movie_listing_app.logging_config import configure_logging
+
+router = APIRouter(
+    prefix="/comments",
+    tags=["comments"],
+)
+
+configure_logging()
+
+
+def comment_page(comments, next_cursor: Optional[str]):
+    items = [
+        schemas.CommentEntry.model_validate(comment).model_copy(update={"has_replies": comment.reply_count > 0})
+        for comment in comments
+    ]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# endpoint to create comment by movie ID
+@router.post("/", response_model=schemas.Comment, status_code=status.HTTP_201_CREATED)
+def create_comment(
+    comment: schemas.CommentCreate,
+    db: Session = Depends(dependencies.get_db),
+    current_user: models.User = Depends(dependencies.get_current_user)
+):
+    db_comment = crud.create_comment(db=db, comment=comment, user_id=current_user.id) # type: ignore
+    if db_comment is None:
+        logging.warning("movie not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    logging.info(f"user: {current_user.username} commented on movie: {db_comment.movie.title}")
+    return db_comment
+
+# if a user does not know the movie ID, this is an endpoint to create comment by movie title
+@router.post("/by-title/", response_model=schemas.Comment)
+def create_comment_by_title(
+    comment: schemas.CommentBase,
+    movie_title: str,
+    db: Session = Depends(dependencies.get_db),
+    current_user: models.User = Depends(dependencies.get_current_user)
+):
+    db_movie = crud.get_movie_by_title(db, title=movie_title)
+    if not db_movie:
+        logging.warning("movie not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    comment_create = schemas.CommentCreate(
+        comment=comment.comment,
+        movie_id=db_movie.id, # type: ignore
+        parent_comment_id=None 
+    )
+    logging.info(f"user: {current_user.username} commented on movie: {db_movie.title}")
+    return crud.create_comment(db=db, comment=comment_create, user_id=current_user.id) # type: ignore
+
+# endpoint to get the comments of a movie by movie ID, either every comment as reply threads or,
+# with pagination=cursor, a page of top-level comments {"items": [...], "next_cursor": ...} whose
+# replies are fetched from GET /comments/{comment_id}/replies. pass next_cursor back for the next page.
+@router.get("/movie/{movie_id}", response_model=Union[List[schemas.CommentThread], schemas.CommentPage])
+async def read_comments_by_movie(
+    movie_id: int,
+    request: Request,
+    response: Response,
+    max_depth: int = Query(crud.DEFAULT_THREAD_DEPTH, ge=1, le=crud.MAX_THREAD_DEPTH),
+    pagination: Literal["thread", "cursor"] = "thread",
+    order: Literal["newest", "oldest"] = "newest",
+    limit: int = Query(crud.DEFAULT_COMMENT_PAGE_SIZE, ge=1, le=crud.MAX_COMMENT_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: async_crud.ReadSession = Depends(dependencies.read_db)
+):
+    # the version is read first, a comment written meanwhile makes the ETag stale rather than the comments
+    version = await async_crud.get_movie_version(db, movie_id=movie_id)
+    not_modified = etags.conditional(request, response, "comments", version)
+    if not_modified is not None:
+        logging.info(f"comments for movie {movie_id} not modified")
+        return not_modified
+    if pagination == "cursor" or cursor is not None:
+        comments, next_cursor = await async_crud.get_comments_page(db, movie_id=movie_id, order=order, limit=limit, cursor=cursor)
+        logging.info(f"reading a page of comments for movie: {movie_id}")
+        return comment_page(comments, next_cursor)
+    logging.info(f"reading comments for movie: {movie_id}")
+    return await async_crud.get_comment_thread(db, movie_id=movie_id, max_depth=max_depth)
+
+# endpoint to get a page of the direct replies of a comment, oldest first by default.
+# replies that have replies of their own say so with has_replies, fetch those the same way.
+@router.get("/{comment_id}/replies", response_model=schemas.CommentPage)
+async def read_comment_replies(
+    comment_id: int,
+    request: Request,
+    response: Response,
+    order: Literal["newest", "oldest"] = "oldest",
+    limit: int = Query(crud.DEFAULT_COMMENT_PAGE_SIZE, ge=1, le=crud.MAX_COMMENT_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: async_crud.ReadSession = Depends(dependencies.read_db)
+):
+    # the comment's movie and its version, which also tells whether the comment exists
+    version = await async_crud.get_movie_version(db, comment_id=comment_id)
+    if version is None:
+        logging.warning(f"comment {comment_id} not found while reading its replies")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
+    not_modified = etags.conditional(request, response, "replies", version)
+    if not_modified is not None:
+        logging.info(f"replies to comment {comment_id} not modified")
+        return not_modified
+    comments, next_cursor = await async_crud.get_comments_page(
+        db, parent_comment_id=comment_id, order=order, limit=limit, cursor=cursor
+    )
+    logging.info(f"reading replies to comment: {comment_id}")
+    return comment_page(comments, next_cursor)
+
+# endpoint to get the comment threads of a movie by movie title
+@router.get("/by-title/{movie_title}", response_model=List[schemas.CommentThread])
+async def read_comments_by_movie_title(
+    movie_title: str,
+    request: Request,
+    response: Response,
+    max_depth: int = Query(crud.DEFAULT_THREAD_DEPTH, ge=1, le=crud.MAX_THREAD_DEPTH),
+    db: async_crud.ReadSession = Depends(dependencies.read_db)
+):
+    logging.info(f"Fetching comments for movie '{movie_title}'")
+    # only the movie's id and version are needed, its row is not loaded
+    version = await async_crud.get_movie_version(db, title=movie_title)
+    if version is None:
+        logging.error(f"Movie not found for title '{movie_title}' during comment retrieval")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    not_modified = etags.conditional(request, response, "comments", version)
+    if not_modified is not None:
+        logging.info(f"Comments for movie '{movie_title}' not modified")
+        return not_modified
+
+    comments = await async_crud.get_comment_thread(db, movie_id=version.id, max_depth=max_depth)
+    logging.info(f"Retrieved {len(comments)} comment threads for movie '{movie_title}'")
+    return comments
+
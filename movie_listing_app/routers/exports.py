@@ -0,0 +1,37 @@
+import logging
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Literal, Optional
+from .. import models, dependencies, exporter
+from movie_listing_app.logging_config import configure_logging
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+)
+
+configure_logging()
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+# endpoint to download a whole table as NDJSON or CSV, rows come in id order and are streamed as they are read.
+# pass the last id received as after_id to resume an interrupted export, gzip=true compresses the download.
+@router.get("/{table}")
+def export_table(
+    table: Literal["movies", "ratings", "comments"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    after_id: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(dependencies.get_read_db),
+    current_user: models.User = Depends(dependencies.get_current_user)
+):
+    logging.info(f"User {current_user.username} exported {table} as {format} after id {after_id}")
+    filename = f"{table}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        # the export closes the session itself when the download ends
+        exporter.export_table(db, table, format=format, compress=gzip, after_id=after_id),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,58 @@
+import logging
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+from .. import schemas, crud, async_crud, dependencies
+from .movies import MovieView, as_view
+from movie_listing_app.logging_config import configure_logging
+
+router = APIRouter(
+    prefix="/leaderboards",
+    tags=["leaderboards"],
+)
+
+configure_logging()
+
+
+async def leaderboard(db: async_crud.ReadSession, skip: int, limit: int, view: str,
+                      genre: Optional[str] = None, decade: Optional[int] = None):
+    movies = await async_crud.get_leaderboard(db, genre=genre, decade=decade, skip=skip, limit=limit, view=view)
+    return [
+        {"rank": skip + place, "weighted_rating": movie.weighted_rating, "movie": entry}
+        for place, (movie, entry) in enumerate(zip(movies, as_view(movies, view)), start=1)
+    ]
+
+# endpoint for the top rated movies overall. movies are ranked by a Bayesian average, so a movie
+# with a handful of ratings does not outrank one with many good ratings.
+@router.get("/", response_model=List[schemas.LeaderboardEntry])
+async def read_leaderboard(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(crud.DEFAULT_LEADERBOARD_SIZE, ge=1, le=100),
+    view: MovieView = "full",
+    db: async_crud.ReadSession = Depends(dependencies.read_db)
+):
+    logging.info("user viewed the leaderboard")
+    return await leaderboard(db, skip=skip, limit=limit, view=view)
+
+# endpoint for the top rated movies of a genre
+@router.get("/genre/{genre}", response_model=List[schemas.LeaderboardEntry])
+async def read_genre_leaderboard(
+    genre: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(crud.DEFAULT_LEADERBOARD_SIZE, ge=1, le=100),
+    view: MovieView = "full",
+    db: async_crud.ReadSession = Depends(dependencies.read_db)
+):
+    logging.info(f"user viewed the leaderboard for genre {genre}")
+    return await leaderboard(db, skip=skip, limit=limit, view=view, genre=genre)
+
+# endpoint for the top rated movies of a release decade, any year of the decade can be given (1994 -> 1990s)
+@router.get("/decade/{decade}", response_model=List[schemas.LeaderboardEntry])
+async def read_decade_leaderboard(
+    decade: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(crud.DEFAULT_LEADERBOARD_SIZE, ge=1, le=100),
+    view: MovieView = "full",
+    db: async_crud.ReadSession = Depends(dependencies.read_db)
+):
+    logging.info(f"user viewed the leaderboard for the {decade}s")
+    return await leaderboard(db, skip=skip, limit=limit, view=view, decade=decade)
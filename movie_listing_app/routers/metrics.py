@@ -0,0 +1,26 @@
+import logging
+from fastapi import APIRouter, Depends
+from typing import List
+from .. import schemas, database, pool, models, dependencies
+from movie_listing_app.logging_config import configure_logging
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+configure_logging()
+
+
+# endpoint for the connection pool telemetry of every engine: connections in use, idle and in overflow,
+# with the number of checkouts, how long they waited and how many timed out since the process started.
+# the figures describe the deployment, so only administrators can read them.
+@router.get("/pool", response_model=List[schemas.PoolStats])
+def read_pool_stats(current_admin: models.User = Depends(dependencies.get_current_admin)):
+    engines = [("primary", database.engine)]
+    engines += [(f"replica-{index}", replica) for index, replica in enumerate(database.replica_engines)]
+    if database.async_engine is not None:
+        engines.append(("async-primary", database.async_engine))
+        engines += [(f"async-replica-{index}", replica) for index, replica in enumerate(database.async_replica_engines)]
+    logging.info(f"pool statistics were read by {current_admin.username}")
+    return [pool.pool_stats(name, engine) for name, engine in engines]
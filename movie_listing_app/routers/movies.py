@@ -1,73 +1,180 @@
-import logging
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import schemas, models, crud, dependencies
-from movie_listing_app.logging_config import configure_logging
-
-router = APIRouter(
-    prefix="/movies",
-    tags=["movies"],
-)
-configure_logging()
-
-# endpoint for listing a new movie
-@router.post("/", response_model=schemas.Movie, status_code=status.HTTP_201_CREATED)
-def create_movie(movie: schemas.MovieCreate, db: Session = Depends(dependencies.get_db), 
-                 current_user: models.User = Depends(dependencies.get_current_user)):
-    logging.info(f"Movie created: {movie.title} by user {current_user.username}")
-    return crud.create_movie(db=db, movie=movie, user_id=current_user.id) # type: ignore
-
-# endpoint for retrieving all movies
-@router.get("/", response_model=List[schemas.Movie])
-def read_movies(skip: int = 0, limit: int = 10, db: Session = Depends(dependencies.get_db)):
-    movies = crud.get_all_movies(db, skip=skip, limit=limit)
-    logging.info("user tried to get all movies and found them")
-    return movies
-
-# endpoint for retrieving a single movie by title
-@router.get("/{title}", response_model=schemas.Movie)
-def read_movie(movie_title: str, db: Session = Depends(dependencies.get_db)):
-    db_movie = crud.get_movie_by_title(db, title=movie_title)
-    if db_movie is None:
-        logging.warning("movie not found")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
-    logging.info(f"user viewed movie: {db_movie.title}")
-    return db_movie
-
-
-# endpoint for retrieving movies by release year
-@router.get("/search/{release_year}", response_model=schemas.Movie)
-def read_movie_by_release_year(release_year: int, db: Session = Depends(dependencies.get_db)):
-    db_movie = crud.get_movie_by_release_year(db, release_year=release_year)
-    if db_movie is None:
-        logging.warning("movie not found")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND , detail="Movie not found")
-    logging.info(f"user viewed movie: {db_movie.title}")
-    return db_movie
-
-# endpoint for making updates to listed movies, current user dependency injection in place.
-@router.put("/{movie_id}", response_model=schemas.Movie)
-def update_movie(movie_id: int, movie: schemas.MovieCreate, db: Session = Depends(dependencies.get_db), current_user: models.User = Depends(dependencies.get_current_user)):
-    db_movie = crud.get_movie_by_id(db, movie_id=movie_id)
-    if db_movie is None:
-        logging.warning("movie not found, failed to update")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
-    if db_movie.owner_id != current_user.id: # type: ignore
-        logging.warning("Unauthorized movie update attempt by user")
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this movie")
-    logging.info(f"Movie updated: {movie.title} by user {current_user.username}")
-    return crud.update_movie_by_id(db, movie_id=movie_id, movie=movie)
-
-# endpoint for deleting listed movies, current user dependency injection in place.
-@router.delete("/{movie_id}", response_model=schemas.Movie)
-def delete_movie(movie_id: int, db: Session = Depends(dependencies.get_db), current_user: models.User = Depends(dependencies.get_current_user)):
-    db_movie = crud.get_movie_by_id(db, movie_id=movie_id)
-    if db_movie is None:
-        logging.warning("movie not found, failed to delete")
-        raise HTTPException(status_code=404, detail="Movie not found")
-    if db_movie.owner_id != current_user.id: # type: ignore
-        logging.warning(f"Unauthorized movie deletion attempt by user {current_user.username}")
-        raise HTTPException(status_code=403, detail="Not authorized to delete this movie")
-    logging.info(f"Movie deleted: {db_movie.title} by user {current_user.username}")
-    return crud.delete_movie_by_id(db, movie_id=movie_id)
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional, Union
+from .. import schemas, models, crud, async_crud, dependencies, etags, importer
+from movie_listing_app.logging_config import configure_logging
+
+router = APIRouter(
+    prefix="/movies",
+    tags=["movies"],
+)
+configure_logging()
+
+# list endpoints return whole movies by default, view=summary returns schemas.MovieSummary
+# (no synopsis, no owner) from a query that only reads those columns.
+MovieView = Literal["full", "summary"]
+
+
+def as_view(movies, view: str):
+    # summaries are built here, so the response never reads the columns the query left out
+    return [schemas.MovieSummary.model_validate(movie) for movie in movies] if view == "summary" else movies
+
+# endpoint for listing a new movie
+@router.post("/", response_model=schemas.Movie, status_code=status.HTTP_201_CREATED)
+def create_movie(movie: schemas.MovieCreate, db: Session = Depends(dependencies.get_db), 
+                 current_user: models.User = Depends(dependencies.get_current_user)):
+    logging.info(f"Movie created: {movie.title} by user {current_user.username}")
+    return crud.create_movie(db=db, movie=movie, user_id=current_user.id) # type: ignore
+
+# endpoint for importing many movies at once from an NDJSON or CSV request body (CSV needs a header row).
+# the body is streamed and inserted in batches of batch_size, rows that fail validation are reported by line number.
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_movies(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    batch_size: int = Query(importer.DEFAULT_BATCH_SIZE, ge=1, le=importer.MAX_BATCH_SIZE),
+    db: Session = Depends(dependencies.get_db),
+    current_user: models.User = Depends(dependencies.get_current_user)
+):
+    # the database work runs in a worker thread that pulls the body from the event loop as it goes
+    lines = importer.iter_lines(importer.iter_sync(request.stream()))
+    report = await run_in_threadpool(
+        importer.import_movies, db, lines, format=format, owner_id=current_user.id, batch_size=batch_size
+    )
+    logging.info(f"Movies imported: {report['imported']} ({report['failed']} failed) by user {current_user.username}")
+    return report
+
+# endpoint for retrieving all movies, either by offset (skip/limit) or with an opaque cursor.
+# cursor mode returns {"items": [...], "next_cursor": ...}, pass next_cursor back to get the next page.
+@router.get("/", response_model=Union[List[Union[schemas.Movie, schemas.MovieSummary]], schemas.MoviePage])
+async def read_movies(
+    skip: int = 0,
+    limit: int = Query(10, ge=1),
+    pagination: Literal["offset", "cursor"] = "offset",
+    order_by: Literal["id", "rating", "release_year"] = "id",
+    cursor: Optional[str] = None,
+    view: MovieView = "full",
+    db: async_crud.ReadSession = Depends(dependencies.read_db)
+):
+    if pagination == "cursor" or cursor is not None:
+        movies, next_cursor = await async_crud.get_movies_page(db, order_by=order_by, limit=limit, cursor=cursor, view=view)
+        logging.info(f"user paged through movies ordered by {order_by}")
+        return {"items": as_view(movies, view), "next_cursor": next_cursor}
+    movies = await async_crud.get_all_movies(db, skip=skip, limit=limit, view=view)
+    logging.info("user tried to get all movies and found them")
+    return as_view(movies, view)
+
+# endpoint for full-text search over movie titles, genres and synopses, best matches first.
+# the listing routes live under /movies/-/, a single path segment after /movies/ is always a movie title.
+@router.get("/-/search", response_model=List[schemas.MovieSearchResult])
+async def search_movies(
+    q: str = Query(..., min_length=1),
+    skip: int = 0,
+    limit: int = Query(10, ge=1, le=100),
+    view: MovieView = "full",
+    db: async_crud.ReadSession = Depends(dependencies.read_db)
+):
+    results = await async_crud.search_movies(db, query=q, skip=skip, limit=limit, view=view)
+    logging.info(f"user searched movies for '{q}' and found {len(results)}")
+    movies = as_view([movie for movie, _ in results], view)
+    return [{"movie": movie, "score": score} for movie, (_, score) in zip(movies, results)]
+
+# endpoint for browsing movies by release year range, genre and minimum rating, sorted by rating,
+# release year (both highest first) or title. pages are cursor based, pass next_cursor back for the next page.
+@router.get("/-/filter", response_model=schemas.MoviePage)
+async def filter_movies(
+    genre: Optional[str] = None,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    min_rating: Optional[float] = Query(None, ge=0),
+    sort: Literal["rating", "release_year", "title"] = "rating",
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    view: MovieView = "full",
+    db: async_crud.ReadSession = Depends(dependencies.read_db)
+):
+    movies, next_cursor = await async_crud.get_movies_page(
+        db, order_by=sort, limit=limit, cursor=cursor,
+        genre=genre, year_from=year_from, year_to=year_to, min_rating=min_rating, view=view,
+    )
+    logging.info(f"user filtered movies by genre {genre}, years {year_from}-{year_to}, rating {min_rating}")
+    return {"items": as_view(movies, view), "next_cursor": next_cursor}
+
+# endpoint for fetching many movies at once, e.g. a watchlist: ?ids=3&ids=1 or ?titles=Heat&titles=Alien.
+# the movies come back in request order, with null for every id or title that has no movie.
+@router.get("/-/batch", response_model=List[Optional[Union[schemas.Movie, schemas.MovieSummary]]])
+async def read_movies_batch(
+    ids: Optional[List[int]] = Query(None, max_length=crud.MAX_BATCH_MOVIES),
+    titles: Optional[List[str]] = Query(None, max_length=crud.MAX_BATCH_MOVIES),
+    view: MovieView = "full",
+    db: async_crud.ReadSession = Depends(dependencies.read_db)
+):
+    if (ids is None) == (titles is None):
+        logging.warning("batch movie request without ids or titles, or with both")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pass either ids or titles")
+    if ids is not None:
+        movies = await async_crud.get_movies_by_ids(db, movie_ids=ids, view=view)
+    else:
+        movies = await async_crud.get_movies_by_titles(db, titles=titles, view=view) # type: ignore
+    logging.info(f"user fetched {len(movies)} movies in a batch, {movies.count(None)} not found")
+    found = iter(as_view([movie for movie in movies if movie is not None], view))
+    return [None if movie is None else next(found) for movie in movies]
+
+# endpoint for retrieving a single movie by title. the response has an ETag, a request sending it back
+# in If-None-Match gets 304 Not Modified after reading only the movie's version while the movie is unchanged.
+@router.get("/{title}", response_model=schemas.Movie)
+async def read_movie(title: str, request: Request, response: Response,
+                     db: async_crud.ReadSession = Depends(dependencies.read_db)):
+    if "if-none-match" in request.headers:
+        version = await async_crud.get_movie_version(db, title=title)
+        not_modified = etags.conditional(request, response, "movie", version)
+        if not_modified is not None:
+            logging.info(f"movie not modified: {title}")
+            return not_modified
+    db_movie = await async_crud.get_movie_by_title(db, title=title)
+    if db_movie is None:
+        logging.warning("movie not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    response.headers["ETag"] = etags.movie_etag("movie", db_movie.id, db_movie.version) # type: ignore
+    logging.info(f"user viewed movie: {db_movie.title}")
+    return db_movie
+
+
+# endpoint for retrieving movies by release year
+@router.get("/search/{release_year}", response_model=schemas.Movie)
+async def read_movie_by_release_year(release_year: int, db: async_crud.ReadSession = Depends(dependencies.read_db)):
+    db_movie = await async_crud.get_movie_by_release_year(db, release_year=release_year)
+    if db_movie is None:
+        logging.warning("movie not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND , detail="Movie not found")
+    logging.info(f"user viewed movie: {db_movie.title}")
+    return db_movie
+
+# endpoint for making updates to listed movies, current user dependency injection in place.
+@router.put("/{movie_id}", response_model=schemas.Movie)
+def update_movie(movie_id: int, movie: schemas.MovieCreate, db: Session = Depends(dependencies.get_db), current_user: models.User = Depends(dependencies.get_current_user)):
+    # the ownership check is part of the UPDATE, the movie is only looked up again when nothing was updated
+    db_movie = crud.update_movie_by_id(db, movie_id=movie_id, movie=movie, owner_id=current_user.id) # type: ignore
+    if db_movie is None:
+        if crud.get_movie_by_id(db, movie_id=movie_id) is None:
+            logging.warning("movie not found, failed to update")
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+        logging.warning("Unauthorized movie update attempt by user")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this movie")
+    logging.info(f"Movie updated: {movie.title} by user {current_user.username}")
+    return db_movie
+
+# endpoint for deleting listed movies, current user dependency injection in place.
+@router.delete("/{movie_id}", response_model=schemas.Movie)
+def delete_movie(movie_id: int, db: Session = Depends(dependencies.get_db), current_user: models.User = Depends(dependencies.get_current_user)):
+    db_movie = crud.get_movie_by_id(db, movie_id=movie_id)
+    if db_movie is None:
+        logging.warning("movie not found, failed to delete")
+        raise HTTPException(status_code=404, detail="Movie not found")
+    if db_movie.owner_id != current_user.id: # type: ignore
+        logging.warning(f"Unauthorized movie deletion attempt by user {current_user.username}")
+        raise HTTPException(status_code=403, detail="Not authorized to delete this movie")
+    logging.info(f"Movie deleted: {db_movie.title} by user {current_user.username}")
+    return crud.delete_movie_by_id(db, movie_id=movie_id)
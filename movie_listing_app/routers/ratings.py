@@ -1,73 +1,136 @@
-import logging
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import schemas, models, crud, dependencies
-from movie_listing_app.logging_config import configure_logging
-
-router = APIRouter(
-    prefix="/ratings",
-    tags=["ratings"],
-)
-
-configure_logging()
-
-# endpoint to rate a movie by movie id
-@router.post("/", response_model=schemas.Rating, status_code=status.HTTP_201_CREATED)
-def create_rating(
-    rating: schemas.RatingCreate,
-    db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(dependencies.get_current_user)
-):
-    db_movie = crud.get_movie_by_id(db, movie_id=rating.movie_id)
-    if not db_movie:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
-    logging.info(f"User created rating for movie with id: {db_movie}")
-    return crud.create_rating(db=db, rating=rating, user_id=current_user.id) # type: ignore
-
-# endpoint to rate a movie by title 
-@router.post("/title/{title}/", response_model=schemas.Rating, status_code=status.HTTP_201_CREATED)
-def create_rating_by_title(
-    title: str,
-    rating: schemas.RatingCreate,
-    db: Session = Depends(dependencies.get_db),
-    current_user: models.User = Depends(dependencies.get_current_user)
-):
-    logging.info(f"User {current_user.username} is creating a rating for movie '{title}'")
-    return crud.create_rating_by_title(db=db, rating=rating, user_id=current_user.id, title=title) # type: ignore
-
-# endpoint to get average ratings of a movie by movie id
-@router.get("/movie_ratings/{movie_id}", response_model=List[schemas.Rating])
-def read_ratings_by_movie(movie_id: int, db: Session = Depends(dependencies.get_db)):
-    logging.info(f"User read ratings for movie with id: {movie_id}")
-    return crud.get_ratings_by_movie(db, movie_id=movie_id)
-
-# endpoint to get average ratings of a movie by title
-@router.get("/by_title/{title}/", response_model=float) 
-def get_average_rating_by_title(title: str, db: Session = Depends(dependencies.get_db)):
-    logging.info(f"Fetching average rating for movie '{title}'")
-    movie = crud.get_movie_by_title(db=db, title=title)
-    if not movie:
-        logging.error(f"Movie not found for title '{title}' during rating retrieval")
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
-    
-    avg_rating = movie.rating if movie.rating is not None else 0.0
-    
-    logging.info(f"Average rating for movie '{movie.title}' is {avg_rating}")
-    return avg_rating
-
-# endpoint to get the score for a movie
-@router.get("/score/{score}", response_model=List[schemas.Rating])
-def read_ratings_by_score(score: int, db: Session = Depends(dependencies.get_db)):
-    logging.info(f"User read ratings with score: {score}")
-    return crud.get_ratings_by_score(db, score=score)
-
-# endpoint to delete a rating by rating id, current user dependency injection in place.
-@router.delete("/{rating_id}", response_model=schemas.Rating)
-def delete_rating(rating_id: int, db: Session = Depends(dependencies.get_db), current_user: models.User = Depends(dependencies.get_current_user)):
-    db_rating = crud.get_rating(db, rating_id=rating_id)
-    if db_rating is None or db_rating.user_id != current_user.id: # type: ignore
-        logging.warning(f"Unauthorized movie deletion attempt by user {current_user.username}")
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this rating")
-    logging.info(f"User deleted rating with id: {rating_id}")
-    return crud.delete_rating(db, rating_id=rating_id)
\ No newline at end of file
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.orm import Session
+from typing import List, Literal, Union
+from .. import schemas, models, crud, async_crud, dependencies, etags
+from movie_listing_app.logging_config import configure_logging
+
+router = APIRouter(
+    prefix="/ratings",
+    tags=["ratings"],
+)
+
+configure_logging()
+
+
+def as_view(ratings, view: str):
+    # summaries are built here, so the response never reads the columns the query left out
+    return [schemas.RatingSummary.model_validate(rating) for rating in ratings] if view == "summary" else ratings
+
+# endpoint to rate a movie by movie id
+@router.post("/", response_model=schemas.Rating, status_code=status.HTTP_201_CREATED)
+def create_rating(
+    rating: schemas.RatingCreate,
+    db: Session = Depends(dependencies.get_db),
+    current_user: models.User = Depends(dependencies.get_current_user)
+):
+    db_rating = crud.create_rating(db=db, rating=rating, user_id=current_user.id) # type: ignore
+    if db_rating is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    logging.info(f"User created rating for movie with id: {rating.movie_id}")
+    return db_rating
+
+# endpoint to rate a movie by title 
+@router.post("/title/{title}/", response_model=schemas.Rating, status_code=status.HTTP_201_CREATED)
+def create_rating_by_title(
+    title: str,
+    rating: schemas.RatingCreate,
+    db: Session = Depends(dependencies.get_db),
+    current_user: models.User = Depends(dependencies.get_current_user)
+):
+    logging.info(f"User {current_user.username} is creating a rating for movie '{title}'")
+    return crud.create_rating_by_title(db=db, rating=rating, user_id=current_user.id, title=title) # type: ignore
+
+# endpoint for administrators to ingest many ratings at once, e.g. from a partner feed.
+# users and movies are given by id or by username/title, unresolved rows are reported by index and skipped.
+@router.post("/bulk", response_model=schemas.BulkRatingReport)
+def create_ratings_bulk(
+    bulk: schemas.BulkRatingCreate,
+    db: Session = Depends(dependencies.get_db),
+    current_admin: models.User = Depends(dependencies.get_current_admin)
+):
+    # the aggregate recompute expires the session, read the username before it
+    username = current_admin.username
+    inserted, errors, movie_ids = crud.create_ratings_bulk(db, items=bulk.ratings)
+    logging.info(f"Admin {username} ingested {inserted} ratings ({len(errors)} failed) for {len(movie_ids)} movies")
+    return {
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": [{"index": index, "error": error} for index, error in errors],
+        "movies_updated": len(movie_ids),
+    }
+
+# endpoint to get average ratings of a movie by movie id
+# view=summary returns schemas.RatingSummary (no review, user or movie) from a query that only reads those columns.
+@router.get("/movie_ratings/{movie_id}", response_model=List[Union[schemas.Rating, schemas.RatingSummary]])
+async def read_ratings_by_movie(movie_id: int, request: Request, response: Response, view: Literal["full", "summary"] = "full",
+                                db: async_crud.ReadSession = Depends(dependencies.read_db)):
+    # the version is read first, a rating written meanwhile makes the ETag stale rather than the list
+    version = await async_crud.get_movie_version(db, movie_id=movie_id)
+    not_modified = etags.conditional(request, response, "ratings", version)
+    if not_modified is not None:
+        logging.info(f"ratings for movie with id {movie_id} not modified")
+        return not_modified
+    logging.info(f"User read ratings for movie with id: {movie_id}")
+    return as_view(await async_crud.get_ratings_by_movie(db, movie_id=movie_id, view=view), view)
+
+# endpoint to get the rating distribution of a movie: ratings per score, mean, median and standard deviation
+@router.get("/movie_stats/{movie_id}", response_model=schemas.RatingStats)
+async def read_rating_stats(movie_id: int, request: Request, response: Response,
+                            db: async_crud.ReadSession = Depends(dependencies.read_db)):
+    if "if-none-match" in request.headers:
+        version = await async_crud.get_movie_version(db, movie_id=movie_id)
+        not_modified = etags.conditional(request, response, "rating-stats", version)
+        if not_modified is not None:
+            logging.info(f"rating statistics for movie with id {movie_id} not modified")
+            return not_modified
+    stats = await async_crud.get_rating_stats(db, movie_id=movie_id)
+    if stats is None:
+        logging.warning(f"Movie not found for id {movie_id} during rating statistics retrieval")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    response.headers["ETag"] = etags.movie_etag("rating-stats", movie_id, stats["version"])
+    logging.info(f"User read rating statistics for movie with id: {movie_id}")
+    return stats
+
+# endpoint to get average ratings of a movie by title
+@router.get("/by_title/{title}/", response_model=float) 
+async def get_average_rating_by_title(title: str, request: Request, response: Response,
+                                      db: async_crud.ReadSession = Depends(dependencies.read_db)):
+    logging.info(f"Fetching average rating for movie '{title}'")
+    if "if-none-match" in request.headers:
+        version = await async_crud.get_movie_version(db, title=title)
+        not_modified = etags.conditional(request, response, "rating", version)
+        if not_modified is not None:
+            logging.info(f"Average rating for movie '{title}' not modified")
+            return not_modified
+    movie = await async_crud.get_movie_by_title(db, title=title)
+    if not movie:
+        logging.error(f"Movie not found for title '{title}' during rating retrieval")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    response.headers["ETag"] = etags.movie_etag("rating", movie.id, movie.version) # type: ignore
+    
+    avg_rating = movie.rating if movie.rating is not None else 0.0
+    
+    logging.info(f"Average rating for movie '{movie.title}' is {avg_rating}")
+    return avg_rating
+
+# endpoint to get the score for a movie
+@router.get("/score/{score}", response_model=List[Union[schemas.Rating, schemas.RatingSummary]])
+async def read_ratings_by_score(score: int, view: Literal["full", "summary"] = "full",
+                                db: async_crud.ReadSession = Depends(dependencies.read_db)):
+    logging.info(f"User read ratings with score: {score}")
+    return as_view(await async_crud.get_ratings_by_score(db, score=score, view=view), view)
+
+# endpoint to delete a rating by rating id, current user dependency injection in place.
+@router.delete("/{rating_id}", response_model=schemas.Rating)
+def delete_rating(rating_id: int, db: Session = Depends(dependencies.get_db), current_user: models.User = Depends(dependencies.get_current_user)):
+    db_rating = crud.get_rating(db, rating_id=rating_id)
+    if db_rating is None or db_rating.user_id != current_user.id: # type: ignore
+        logging.warning(f"Unauthorized movie deletion attempt by user {current_user.username}")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this rating")
+    db_rating = crud.delete_rating(db, rating_id=rating_id)
+    if db_rating is None:
+        # deleted since it was looked up
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rating not found")
+    logging.info(f"User deleted rating with id: {rating_id}")
+    return db_rating
\ No newline at end of file
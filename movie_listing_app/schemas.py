@@ -1,88 +1,228 @@
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
-
-class UserBase(BaseModel):
-    first_name: str
-    last_name: str
-    username: str
-    email: str
-
-class UserCreate(UserBase):
-    password: str
-
-class User(UserBase):
-    id: int
-
-    class Config:
-        from_attributes = True
-        arbitrary_types_allowed = True
-
-class UserLogin(BaseModel):
-    username: str
-    password: str
-
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-
-class MovieBase(BaseModel):
-    title: str
-    release_year: Optional[int] = None
-    genre: Optional[str] = None
-    synopsis: Optional[str] = None
-
-class MovieCreate(MovieBase):
-    pass
-
-class Movie(MovieBase):
-    id: int
-    rating: Optional[float] = None
-    owner_id: int
-    owner: User
-
-    class Config:
-        from_attributes = True
-        arbitrary_types_allowed = True
-
-class RatingBase(BaseModel):
-    rating: int
-    review: Optional[str] = None
-
-class RatingCreate(RatingBase):
-    movie_id: int
-
-class Rating(RatingBase):
-    id: int
-    user_id: int
-    movie_id: int
-    user: User
-    movie: Movie
-
-    class Config:
-        from_attributes = True
-        arbitrary_types_allowed = True
-
-class CommentBase(BaseModel):
-    comment: str
-
-class CommentCreate(CommentBase):
-    movie_id: int  
-    parent_comment_id: Optional[int] = None
-
-class Comment(CommentBase):
-    id: int
-    user_id: int
-    movie_id: int
-    created_at: datetime
-    user: User
-    movie: Movie
-    parent_comment: Optional["Comment"] = None
-    replies: List["Comment"] = []
-
-    class Config:
-        from_attributes = True
-        arbitrary_types_allowed = True
-
-# Enable forward references for nested comments
-Comment.model_rebuild()
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Optional, Union
+from datetime import datetime
+
+class UserBase(BaseModel):
+    first_name: str
+    last_name: str
+    username: str
+    email: str
+
+class UserCreate(UserBase):
+    password: str
+
+class User(UserBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+        arbitrary_types_allowed = True
+
+class UserLogin(BaseModel):
+    username: str
+    password: str
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+
+class MovieBase(BaseModel):
+    title: str
+    release_year: Optional[int] = None
+    genre: Optional[str] = None
+    synopsis: Optional[str] = None
+
+class MovieCreate(MovieBase):
+    pass
+
+class Movie(MovieBase):
+    id: int
+    rating: Optional[float] = None
+    rating_count: int = 0
+    comment_count: int = 0
+    owner_id: int
+    owner: User
+
+    class Config:
+        from_attributes = True
+        arbitrary_types_allowed = True
+
+# list view of a movie (view=summary), without the synopsis and the owner
+class MovieSummary(BaseModel):
+    id: int
+    title: str
+    release_year: Optional[int] = None
+    genre: Optional[str] = None
+    rating: Optional[float] = None
+    rating_count: int = 0
+    comment_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+class MoviePage(BaseModel):
+    items: List[Union[Movie, MovieSummary]]
+    next_cursor: Optional[str] = None
+
+class MovieSearchResult(BaseModel):
+    movie: Union[Movie, MovieSummary]
+    score: float
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    weighted_rating: float
+    movie: Union[Movie, MovieSummary]
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
+
+class RatingBase(BaseModel):
+    rating: int
+    review: Optional[str] = None
+
+# the 1 to 5 bound is checked on input only, ratings stored before it existed are still listed
+class RatingCreate(RatingBase):
+    rating: int = Field(..., ge=1, le=5)
+    movie_id: int
+
+class RatingStats(BaseModel):
+    movie_id: int
+    rating_count: int
+    # number of ratings per score, 1 to 5
+    histogram: Dict[int, int]
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    std_dev: Optional[float] = None
+
+class BulkRatingItem(RatingBase):
+    rating: int = Field(..., ge=1, le=5)
+    # the user and the movie are each given either by id or by name
+    user_id: Optional[int] = None
+    username: Optional[str] = None
+    movie_id: Optional[int] = None
+    title: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_references(self):
+        if (self.user_id is None) == (self.username is None):
+            raise ValueError("give exactly one of user_id and username")
+        if (self.movie_id is None) == (self.title is None):
+            raise ValueError("give exactly one of movie_id and title")
+        return self
+
+class BulkRatingCreate(BaseModel):
+    ratings: List[BulkRatingItem] = Field(..., max_length=10000)
+
+class BulkRatingError(BaseModel):
+    index: int
+    error: str
+
+class BulkRatingReport(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkRatingError]
+    movies_updated: int
+
+class Rating(RatingBase):
+    id: int
+    user_id: int
+    movie_id: int
+    user: User
+    movie: Movie
+
+    class Config:
+        from_attributes = True
+        arbitrary_types_allowed = True
+
+# list view of a rating (view=summary), without the review and the nested user and movie
+class RatingSummary(BaseModel):
+    id: int
+    rating: int
+    user_id: int
+    movie_id: int
+
+    class Config:
+        from_attributes = True
+
+class CommentBase(BaseModel):
+    comment: str
+
+class CommentCreate(CommentBase):
+    movie_id: int  
+    parent_comment_id: Optional[int] = None
+
+class Comment(CommentBase):
+    id: int
+    user_id: int
+    movie_id: int
+    parent_comment_id: Optional[int] = None
+    created_at: datetime
+    reply_count: int = 0
+    user: User
+    movie: Movie
+    parent_comment: Optional["Comment"] = None
+    replies: List["Comment"] = []
+
+    class Config:
+        from_attributes = True
+        arbitrary_types_allowed = True
+
+class CommentThread(CommentBase):
+    id: int
+    user_id: int
+    movie_id: int
+    parent_comment_id: Optional[int] = None
+    created_at: datetime
+    reply_count: int = 0
+    user: User
+    replies: List["CommentThread"] = []
+    replies_truncated: bool = False
+
+    class Config:
+        from_attributes = True
+        arbitrary_types_allowed = True
+
+# a comment on a comment page, its replies are fetched separately from GET /comments/{id}/replies
+class CommentEntry(CommentBase):
+    id: int
+    user_id: int
+    movie_id: int
+    parent_comment_id: Optional[int] = None
+    created_at: datetime
+    reply_count: int = 0
+    user: User
+    has_replies: bool = False
+
+    class Config:
+        from_attributes = True
+
+class CommentPage(BaseModel):
+    items: List[CommentEntry]
+    next_cursor: Optional[str] = None
+
+class PoolStats(BaseModel):
+    # engine label: "primary", "replica-0", ... and "async-primary", ... in async mode
+    name: str
+    pool: str
+    # false for pools that are not queue pools (e.g. SQLite in memory), which only report their class
+    instrumented: bool
+    size: Optional[int] = None
+    checked_out: Optional[int] = None
+    idle: Optional[int] = None
+    overflow: Optional[int] = None
+    checkouts: Optional[int] = None
+    timeouts: Optional[int] = None
+    wait_seconds_total: Optional[float] = None
+    wait_seconds_mean: Optional[float] = None
+    wait_seconds_max: Optional[float] = None
+
+# Enable forward references for nested comments
+Comment.model_rebuild()
+CommentThread.model_rebuild()
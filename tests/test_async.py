@@ -0,0 +1,80 @@
+# tests/test_async.py
+
+import os
+import uuid
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from movie_listing_app.main import app
+from tests.test_database import get_test_db, Base, engine, TestingSessionLocal
+from movie_listing_app.dependencies import get_db, get_read_db
+from movie_listing_app import crud, database, models
+
+# Override the get_db and get_read_db dependencies to use the test database
+app.dependency_overrides[get_db] = get_test_db
+app.dependency_overrides[get_read_db] = get_test_db
+
+# Create the test database tables
+Base.metadata.create_all(bind=engine)
+
+def seed_rated_movie():
+    suffix = uuid.uuid4().hex[:8]
+    db = TestingSessionLocal()
+    try:
+        user = models.User(first_name="async", last_name="reader", username=f"async_{suffix}",
+                           email=f"async_{suffix}@example.com", password="not-a-real-hash")
+        db.add(user)
+        db.flush()
+        movie = models.Movie(title=f"Async Movie {suffix}", release_year=1999, genre=f"Async {suffix}", owner_id=user.id)
+        db.add(movie)
+        db.flush()
+        db.add(models.Rating(rating=4, review="good", user_id=user.id, movie_id=movie.id))
+        db.add(models.Comment(comment="first", user_id=user.id, movie_id=movie.id))
+        db.flush()
+        crud.recompute_movie_ratings(db, [movie.id])
+        db.commit()
+        return movie.id, f"Async {suffix}"
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_read_endpoints_serve_async_sessions(monkeypatch):
+    movie_id, genre = seed_rated_movie()
+    paths = [
+        f"/movies/-/filter?genre={genre}",
+        f"/ratings/movie_ratings/{movie_id}",
+        f"/ratings/movie_stats/{movie_id}",
+        f"/comments/movie/{movie_id}",
+        f"/leaderboards/genre/{genre}",
+    ]
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        threadpool_responses = [(await ac.get(path)).json() for path in paths]
+
+    async_engine = create_async_engine(database.async_database_url(os.environ["TEST_DATABASE_URL"]))
+    AsyncTestingSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+    async def get_async_test_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
+    monkeypatch.setitem(app.dependency_overrides, get_read_db, get_async_test_db)
+    try:
+        async with AsyncClient(app=app, base_url="http://test") as ac:
+            async_responses = []
+            for path in paths:
+                response = await ac.get(path)
+                assert response.status_code == 200
+                async_responses.append(response.json())
+    finally:
+        await async_engine.dispose()
+
+    assert async_responses == threadpool_responses
+    assert [movie["id"] for movie in async_responses[0]["items"]] == [movie_id]
+    assert async_responses[1][0]["user"]["username"].startswith("async_")
+    assert async_responses[3][0]["comment"] == "first"
+
+def test_async_database_url():
+    assert database.async_database_url("postgresql://user:secret@db:5432/movies").render_as_string(hide_password=False) \
+        == "postgresql+asyncpg://user:secret@db:5432/movies"
+    assert str(database.async_database_url("postgresql+psycopg2://db/movies")) == "postgresql+asyncpg://db/movies"
+    assert str(database.async_database_url("sqlite:///./test.db")) == "sqlite+aiosqlite:///./test.db"
@@ -1,16 +1,227 @@
-# tests/test_comments.py
-
-import pytest
-from httpx import AsyncClient
-from movie_listing_app.main import app
-from tests.test_database import get_test_db, Base, engine
-from sqlalchemy.orm import Session
-from movie_listing_app.dependencies import get_db
-from movie_listing_app import models
-
-# Override the get_db dependency to use the test database
-app.dependency_overrides[get_db] = get_test_db
-
-# Create the test database tables
-Base.metadata.create_all(bind=engine)
-
+# tests/test_comments.py
+
+import datetime
+import uuid
+import pytest
+from httpx import AsyncClient
+from movie_listing_app.main import app
+from tests.test_database import get_test_db, Base, engine, TestingSessionLocal, count_queries
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from movie_listing_app.dependencies import get_db, get_read_db
+from movie_listing_app import models
+
+# Override the get_db and get_read_db dependencies to use the test database
+app.dependency_overrides[get_db] = get_test_db
+app.dependency_overrides[get_read_db] = get_test_db
+
+# Create the test database tables
+Base.metadata.create_all(bind=engine)
+
+def seed_comment_thread():
+    # one movie with a root comment, a reply and a reply to the reply
+    db = TestingSessionLocal()
+    try:
+        suffix = uuid.uuid4().hex[:8]
+        user = models.User(
+            first_name="thread",
+            last_name="author",
+            username=f"author_{suffix}",
+            email=f"author_{suffix}@example.com",
+            password="not-a-real-hash"
+        )
+        db.add(user)
+        db.flush()
+        movie = models.Movie(title=f"Thread Movie {suffix}", release_year=1999, genre="Drama", owner_id=user.id)
+        db.add(movie)
+        db.flush()
+        parent_id = None
+        for text in ("root", "reply", "nested reply"):
+            comment = models.Comment(comment=text, user_id=user.id, movie_id=movie.id, parent_comment_id=parent_id)
+            db.add(comment)
+            db.flush()
+            parent_id = comment.id
+        db.commit()
+        return movie.id
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_read_comment_thread_in_one_query():
+    movie_id = seed_comment_thread()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        with count_queries() as queries:
+            response = await ac.get(f"/comments/movie/{movie_id}")
+    assert response.status_code == 200
+    # the movie version for the ETag, then the whole thread in one query
+    assert len(queries) == 2
+    thread = response.json()
+    assert len(thread) == 1
+    assert thread[0]["comment"] == "root"
+    assert thread[0]["replies"][0]["comment"] == "reply"
+    assert thread[0]["replies"][0]["replies"][0]["comment"] == "nested reply"
+
+@pytest.mark.asyncio
+async def test_read_comment_thread_depth_limit():
+    movie_id = seed_comment_thread()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get(f"/comments/movie/{movie_id}", params={"max_depth": 2})
+    assert response.status_code == 200
+    # the cut off reply stays out of the response instead of becoming a thread of its own
+    assert len(response.json()) == 1
+    reply = response.json()[0]["replies"][0]
+    assert reply["replies"] == []
+    assert reply["replies_truncated"] is True
+
+@pytest.mark.asyncio
+async def test_create_comment():
+    movie_id = seed_comment_thread()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/auth/login", data={
+            "username": "testuser4",
+            "password": "password123"
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        with count_queries() as queries:
+            response = await ac.post("/comments/", json={"comment": "Great!", "movie_id": movie_id}, headers=headers)
+        assert response.status_code == 201
+        # the user lookup of the authentication, the movie lookup, the insert and the movie's comment count
+        assert [query.split()[0] for query in queries] == ["SELECT", "SELECT", "INSERT", "UPDATE"]
+        assert response.json()["comment"] == "Great!"
+        assert response.json()["replies"] == []
+        assert response.json()["movie"]["comment_count"] == 1
+        parent_id = response.json()["id"]
+
+        response = await ac.post("/comments/", json={"comment": "Agreed", "movie_id": movie_id, "parent_comment_id": parent_id},
+                                 headers=headers)
+        assert response.status_code == 201
+        assert response.json()["movie"]["comment_count"] == 2
+        assert response.json()["reply_count"] == 0
+        assert response.json()["parent_comment_id"] == parent_id
+
+        response = await ac.get(f"/comments/movie/{movie_id}", params={"pagination": "cursor"})
+        parent = next(comment for comment in response.json()["items"] if comment["id"] == parent_id)
+        assert parent["reply_count"] == 1
+        assert parent["has_replies"] is True
+
+        response = await ac.post("/comments/", json={"comment": "Lost", "movie_id": 0}, headers=headers)
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_create_reply_checks_the_parent_comment():
+    movie_id = seed_comment_thread()
+    other_movie_id = seed_comment_thread()
+    db = TestingSessionLocal()
+    try:
+        other_parent_id = db.query(models.Comment.id).filter(models.Comment.movie_id == other_movie_id).first().id
+        missing_parent_id = db.query(func.max(models.Comment.id)).scalar() + 1
+    finally:
+        db.close()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/auth/login", data={"username": "testuser4", "password": "password123"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await ac.post("/comments/", json={"comment": "Orphan", "movie_id": movie_id, "parent_comment_id": missing_parent_id},
+                                 headers=headers)
+        assert response.status_code == 404
+        response = await ac.post("/comments/", json={"comment": "Elsewhere", "movie_id": movie_id, "parent_comment_id": other_parent_id},
+                                 headers=headers)
+        assert response.status_code == 400
+    db = TestingSessionLocal()
+    try:
+        # neither reply was inserted or counted
+        assert db.query(models.Comment).filter(models.Comment.movie_id == movie_id).count() == 3
+        assert db.get(models.Movie, movie_id).comment_count == 0
+        assert db.get(models.Comment, other_parent_id).reply_count == 0
+    finally:
+        db.close()
+
+def seed_comment_pages():
+    # a movie with five top-level comments, two of them posted at the same moment, and three replies on the oldest
+    db = TestingSessionLocal()
+    try:
+        suffix = uuid.uuid4().hex[:8]
+        user = models.User(first_name="page", last_name="author", username=f"pager_{suffix}",
+                           email=f"pager_{suffix}@example.com", password="not-a-real-hash")
+        db.add(user)
+        db.flush()
+        movie = models.Movie(title=f"Paged Movie {suffix}", owner_id=user.id)
+        db.add(movie)
+        db.flush()
+        start = datetime.datetime(2024, 1, 1)
+        minutes = {"first": 0, "second": 1, "third": 2, "fourth": 2, "fifth": 3}
+        comments = {
+            text: models.Comment(comment=text, user_id=user.id, movie_id=movie.id, created_at=start + datetime.timedelta(minutes=minute))
+            for text, minute in minutes.items()
+        }
+        db.add_all(comments.values())
+        db.flush()
+        for index in range(3):
+            db.add(models.Comment(comment=f"reply {index}", user_id=user.id, movie_id=movie.id,
+                                  parent_comment_id=comments["first"].id, created_at=start + datetime.timedelta(hours=index + 1)))
+        comments["first"].reply_count = 3
+        movie.comment_count = 8
+        db.commit()
+        return movie.id, comments["first"].id
+    finally:
+        db.close()
+
+async def read_comment_pages(ac: AsyncClient, path: str, params: dict):
+    pages = []
+    while True:
+        response = await ac.get(path, params=params)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append([comment["comment"] for comment in page["items"]])
+        if page["next_cursor"] is None:
+            return pages, page
+        params = dict(params, cursor=page["next_cursor"])
+
+@pytest.mark.asyncio
+async def test_comment_pages_and_replies():
+    movie_id, first_id = seed_comment_pages()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        with count_queries() as queries:
+            response = await ac.get(f"/comments/movie/{movie_id}", params={"pagination": "cursor", "limit": 2})
+        # the movie version for the ETag and the page
+        assert len(queries) == 2
+        assert [comment["has_replies"] for comment in response.json()["items"]] == [False, False]
+        assert [comment["reply_count"] for comment in response.json()["items"]] == [0, 0]
+
+        newest, newest_last_page = await read_comment_pages(ac, f"/comments/movie/{movie_id}", {"pagination": "cursor", "limit": 2})
+        oldest, last_page = await read_comment_pages(
+            ac, f"/comments/movie/{movie_id}", {"pagination": "cursor", "order": "oldest", "limit": 2}
+        )
+        replies, _ = await read_comment_pages(ac, f"/comments/{first_id}/replies", {"limit": 2})
+
+        response = await ac.get(f"/comments/movie/{movie_id}", params={"pagination": "cursor", "order": "newest",
+                                                                        "cursor": response.json()["next_cursor"][::-1]})
+        assert response.status_code == 400
+        response = await ac.get("/comments/0/replies")
+        assert response.status_code == 404
+
+    # ties on created_at are broken by id, replies stay out of the top-level pages
+    assert newest == [["fifth", "fourth"], ["third", "second"], ["first"]]
+    assert oldest == [["first", "second"], ["third", "fourth"], ["fifth"]]
+    assert last_page["items"][0]["user"]["username"].startswith("pager_")
+    assert newest_last_page["items"][0]["has_replies"] is True
+    assert newest_last_page["items"][0]["reply_count"] == 3
+    assert replies == [["reply 0", "reply 1"], ["reply 2"]]
+
+@pytest.mark.asyncio
+async def test_comment_reads_are_conditional():
+    movie_id, first_id = seed_comment_pages()
+    paths = [f"/comments/movie/{movie_id}", f"/comments/{first_id}/replies"]
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        etags = [(await ac.get(path)).headers["ETag"] for path in paths]
+        for path, etag in zip(paths, etags):
+            response = await ac.get(path, headers={"If-None-Match": etag})
+            assert response.status_code == 304
+
+        response = await ac.post("/auth/login", data={"username": "testuser4", "password": "password123"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await ac.post("/comments/", json={"comment": "news", "movie_id": movie_id, "parent_comment_id": first_id}, headers=headers)
+        for path, etag in zip(paths, etags):
+            response = await ac.get(path, headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert response.headers["ETag"] != etag
+    assert response.json()["items"][-1]["comment"] == "news"
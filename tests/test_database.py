@@ -1,25 +1,45 @@
-# movie_listing_app/test_database.py
-
-import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from movie_listing_app.database import Base
-from dotenv import load_dotenv
-
-# Load environment variables from the .env file
-load_dotenv()
-
-TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
-print(TEST_DATABASE_URL)
-
-engine = create_engine(TEST_DATABASE_URL) # type: ignore
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base.metadata.create_all(bind=engine)
-
-def get_test_db():
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# movie_listing_app/test_database.py
+
+import os
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from movie_listing_app.database import Base, enable_sqlite_foreign_keys
+from dotenv import load_dotenv
+
+# Load environment variables from the .env file
+load_dotenv()
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+print(TEST_DATABASE_URL)
+
+engine = enable_sqlite_foreign_keys(create_engine(TEST_DATABASE_URL)) # type: ignore
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+Base.metadata.create_all(bind=engine)
+
+def get_test_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@contextmanager
+def count_queries(bind=engine):
+    """
+    Records every SQL statement sent to the test database inside the block.
+
+    :param bind: engine to listen on, the test engine by default.
+    :return: list that collects the executed statements.
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
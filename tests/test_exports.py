@@ -0,0 +1,83 @@
+# tests/test_exports.py
+
+import csv
+import gzip
+import io
+import json
+import pytest
+from httpx import AsyncClient
+from movie_listing_app.main import app
+from tests.test_database import get_test_db, Base, engine, TestingSessionLocal, count_queries
+from movie_listing_app.dependencies import get_db, get_read_db
+from movie_listing_app import exporter, models
+
+# Override the get_db and get_read_db dependencies to use the test database
+app.dependency_overrides[get_db] = get_test_db
+app.dependency_overrides[get_read_db] = get_test_db
+
+# Create the test database tables
+Base.metadata.create_all(bind=engine)
+
+async def login(ac: AsyncClient):
+    response = await ac.post("/auth/login", data={
+        "username": "testuser4",
+        "password": "password123"
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def seed_export_movies(count: int):
+    db = TestingSessionLocal()
+    try:
+        owner = db.query(models.User).filter(models.User.username == "testuser4").first()
+        db.add_all([
+            models.Movie(title=f'Export "{index}", part {index}', release_year=2000 + index, owner_id=owner.id)
+            for index in range(count)
+        ])
+        db.commit()
+        return [movie_id for (movie_id,) in db.query(models.Movie.id).order_by(models.Movie.id)]
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_export_movies_ndjson_resumes_after_id(monkeypatch):
+    movie_ids = seed_export_movies(5)
+    # several cursor batches per export
+    monkeypatch.setattr(exporter, "EXPORT_BATCH_SIZE", 2)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/export/movies")
+        assert response.status_code == 401
+
+        headers = await login(ac)
+        with count_queries() as queries:
+            response = await ac.get("/export/movies", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["id"] for row in rows] == movie_ids
+        # the authentication, then a single streamed SELECT
+        assert len(queries) == 2
+
+        response = await ac.get("/export/movies", params={"after_id": movie_ids[-3]}, headers=headers)
+    resumed = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in resumed] == movie_ids[-2:]
+    assert resumed[-1]["title"] == rows[-1]["title"]
+    assert set(resumed[-1]) == {"id", "title", "release_year", "genre", "synopsis", "rating", "rating_count", "owner_id"}
+
+@pytest.mark.asyncio
+async def test_export_csv_gzip_round_trips():
+    seed_export_movies(3)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        headers = await login(ac)
+        response = await ac.get("/export/movies", params={"format": "csv"}, headers=headers)
+        plain = response.text
+        response = await ac.get("/export/movies", params={"format": "csv", "gzip": True}, headers=headers)
+        assert response.headers["content-type"] == "application/gzip"
+        assert response.headers["content-disposition"] == 'attachment; filename="movies.csv.gz"'
+        assert gzip.decompress(response.content).decode() == plain
+
+        response = await ac.get("/export/comments", params={"format": "csv", "after_id": 10 ** 9}, headers=headers)
+    assert response.text.splitlines() == ["id,comment,user_id,movie_id,parent_comment_id,created_at"]
+
+    rows = list(csv.DictReader(io.StringIO(plain)))
+    assert rows[-1]["title"] == 'Export "2", part 2'
+    assert rows[-1]["genre"] == ""
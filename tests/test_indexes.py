@@ -0,0 +1,56 @@
+# tests/test_indexes.py
+
+import ast
+import inspect
+from movie_listing_app import crud, models
+from movie_listing_app.database import Base
+
+# query methods whose arguments select rows
+FILTER_METHODS = {"filter", "where"}
+
+# columns only compared next to an indexed key of the same statement (the movie id of
+# the aggregate updates), where they narrow rows that were already found
+RESIDUAL_FILTER_COLUMNS = {
+    ("movies", "rating_sum"),
+    ("movies", "rating_count"),
+}
+
+
+def crud_filter_columns():
+    # every models.<Model>.<column> referenced inside a .filter() or .where() call in crud
+    found = set()
+    for node in ast.walk(ast.parse(inspect.getsource(crud))):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in FILTER_METHODS):
+            continue
+        for argument in node.args:
+            for child in ast.walk(argument):
+                if (
+                    isinstance(child, ast.Attribute)
+                    and isinstance(child.value, ast.Attribute)
+                    and isinstance(child.value.value, ast.Name)
+                    and child.value.value.id == "models"
+                ):
+                    model = getattr(models, child.value.attr)
+                    found.add((model.__tablename__, child.attr))
+    return found
+
+
+def leading_indexed_columns():
+    # columns that lead an index, a primary key or a unique constraint
+    leading = set()
+    for table in Base.metadata.tables.values():
+        for index in table.indexes:
+            leading.add((table.name, list(index.columns)[0].name))
+        for constraint in table.constraints:
+            columns = list(getattr(constraint, "columns", []))
+            if columns and constraint.__class__.__name__ in ("PrimaryKeyConstraint", "UniqueConstraint"):
+                leading.add((table.name, columns[0].name))
+    return leading
+
+
+def test_crud_filters_are_indexed():
+    filters = crud_filter_columns()
+    # the scan itself has to find the lookups it is meant to guard
+    assert {("ratings", "movie_id"), ("movies", "title_normalized"), ("users", "username")} <= filters
+    missing = filters - leading_indexed_columns() - RESIDUAL_FILTER_COLUMNS
+    assert not missing, f"crud filters on columns without an index: {sorted(missing)}"
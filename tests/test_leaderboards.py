@@ -0,0 +1,105 @@
+# tests/test_leaderboards.py
+
+import uuid
+import pytest
+from httpx import AsyncClient
+from movie_listing_app.main import app
+from tests.test_database import get_test_db, Base, engine, TestingSessionLocal, count_queries
+from movie_listing_app.dependencies import get_db, get_read_db
+from movie_listing_app import models, crud
+
+# Override the get_db and get_read_db dependencies to use the test database
+app.dependency_overrides[get_db] = get_test_db
+app.dependency_overrides[get_read_db] = get_test_db
+
+# Create the test database tables
+Base.metadata.create_all(bind=engine)
+
+def seed_rated_movies(genre: str, movies: dict):
+    # movies maps (title, release_year) to the scores of its ratings, each score from a different user
+    db = TestingSessionLocal()
+    try:
+        voters = max(len(scores) for scores in movies.values())
+        users = [
+            models.User(first_name="seed", last_name="voter", username=f"voter_{uuid.uuid4().hex[:8]}",
+                        email=f"voter_{uuid.uuid4().hex[:8]}@example.com", password="not-a-real-hash")
+            for _ in range(voters)
+        ]
+        db.add_all(users)
+        db.flush()
+        movie_ids = {}
+        for (title, release_year), scores in movies.items():
+            movie = models.Movie(title=title, release_year=release_year, genre=genre, owner_id=users[0].id)
+            db.add(movie)
+            db.flush()
+            movie_ids[title] = movie.id
+            db.add_all([models.Rating(rating=score, user_id=user.id, movie_id=movie.id) for user, score in zip(users, scores)])
+        db.flush()
+        crud.recompute_movie_ratings(db, movie_ids=list(movie_ids.values()))
+        db.commit()
+        return movie_ids
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_leaderboards_rank_by_weighted_rating():
+    genre = f"Leaderboard {uuid.uuid4().hex[:8]}"
+    seed_rated_movies(genre, {
+        ("One Perfect Vote", 1994): [5],
+        ("Loved By Many", 1999): [5, 5, 4, 5, 5, 4, 5, 5, 5, 4, 5, 5],
+        ("Solid Favourite", 2003): [4, 4, 4, 4, 4, 4, 4, 4],
+        ("Divisive", 2007): [1, 5, 1, 5],
+        ("Unrated", 2005): [],
+    })
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        with count_queries() as queries:
+            response = await ac.get(f"/leaderboards/genre/{genre}")
+        assert response.status_code == 200
+        assert len(queries) == 1
+        entries = response.json()
+
+        response = await ac.get("/leaderboards/decade/1995", params={"limit": 100})
+        nineties = [entry["movie"]["title"] for entry in response.json() if entry["movie"]["genre"] == genre]
+        response = await ac.get(f"/leaderboards/genre/{genre}", params={"skip": 1, "limit": 1})
+        second = response.json()
+        response = await ac.get("/leaderboards/")
+    assert response.status_code == 200
+
+    assert [entry["movie"]["title"] for entry in entries] == ["Loved By Many", "Solid Favourite", "One Perfect Vote", "Divisive"]
+    assert [entry["rank"] for entry in entries] == [1, 2, 3, 4]
+    # (5 + 3.0 * 10) / (1 + 10)
+    assert entries[2]["weighted_rating"] == pytest.approx(35 / 11)
+    assert nineties == ["Loved By Many", "One Perfect Vote"]
+    assert second == [dict(entries[1], rank=2)]
+
+@pytest.mark.asyncio
+async def test_leaderboard_follows_new_ratings_and_refresh(monkeypatch):
+    genre = f"Leaderboard {uuid.uuid4().hex[:8]}"
+    movie_ids = seed_rated_movies(genre, {("Underdog", 2010): [3], ("Leader", 2011): [4, 3]})
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/auth/login", data={
+            "username": "testuser4",
+            "password": "password123"
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await ac.get(f"/leaderboards/genre/{genre}")
+        assert [entry["movie"]["title"] for entry in response.json()] == ["Leader", "Underdog"]
+        await ac.post("/ratings/", json={"rating": 5, "movie_id": movie_ids["Underdog"]}, headers=headers)
+        response = await ac.get(f"/leaderboards/genre/{genre}")
+        assert [entry["movie"]["title"] for entry in response.json()] == ["Underdog", "Leader"]
+
+        db = TestingSessionLocal()
+        try:
+            assert crud.refresh_leaderboards(db) == 0
+            with monkeypatch.context() as patch:
+                patch.setattr(crud, "LEADERBOARD_MIN_VOTES", 0)
+                assert crud.refresh_leaderboards(db) > 0
+                db.commit()
+                response = await ac.get(f"/leaderboards/genre/{genre}")
+            # back to the configured settings for the other tests
+            crud.refresh_leaderboards(db)
+            db.commit()
+        finally:
+            db.close()
+    # without the prior the scores are the plain averages
+    assert [entry["weighted_rating"] for entry in response.json()] == [4.0, 3.5]
@@ -0,0 +1,66 @@
+# tests/test_metrics.py
+
+import os
+import uuid
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine, exc
+from movie_listing_app.main import app
+from movie_listing_app import database, pool, models, crud
+from movie_listing_app.dependencies import get_db
+from tests.test_database import get_test_db, TestingSessionLocal
+
+# Override the get_db dependency to use the test database
+app.dependency_overrides[get_db] = get_test_db
+
+def seed_user(role: str):
+    db = TestingSessionLocal()
+    try:
+        username = f"{role}_{uuid.uuid4().hex[:8]}"
+        db.add(models.User(first_name="pool", last_name="reader", username=username, email=f"{username}@example.com",
+                           password=crud.pwd_context.hash("password123"), role=role))
+        db.commit()
+        return username
+    finally:
+        db.close()
+
+async def login(ac: AsyncClient, username: str):
+    response = await ac.post("/auth/login", data={"username": username, "password": "password123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.mark.asyncio
+async def test_pool_stats_endpoint():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        assert (await ac.get("/metrics/pool")).status_code == 401
+        response = await ac.get("/metrics/pool", headers=await login(ac, seed_user("user")))
+        assert response.status_code == 403
+        response = await ac.get("/metrics/pool", headers=await login(ac, seed_user("admin")))
+    assert response.status_code == 200
+    primary = response.json()[0]
+    assert primary["name"] == "primary"
+    assert primary["instrumented"] == isinstance(database.engine.pool, pool.InstrumentedQueuePool)
+
+def test_pool_counts_checkouts_and_timeouts():
+    url = os.environ["TEST_DATABASE_URL"]
+    engine = create_engine(url, **pool.pool_options(url, pool_size=1, max_overflow=0, pool_timeout=0.05))
+    try:
+        assert isinstance(engine.pool, pool.InstrumentedQueuePool)
+        with engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+            stats = pool.pool_stats("test", engine)
+        assert stats["checked_out"] == 1
+        assert stats["overflow"] == 0
+        assert stats["checkouts"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["wait_seconds_max"] >= 0.05
+        assert pool.pool_stats("test", engine)["idle"] == 1
+    finally:
+        engine.dispose()
+
+def test_pool_options_skip_pools_without_a_queue():
+    assert pool.pool_options("sqlite://") == {"pool_pre_ping": pool.DB_POOL_PRE_PING}
+    options = pool.pool_options("postgresql+asyncpg://db/movies", pool_size=20)
+    assert options["poolclass"] is pool.InstrumentedAsyncQueuePool
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == pool.DB_MAX_OVERFLOW
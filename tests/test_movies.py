@@ -1,38 +1,367 @@
-# tests/test_movies.py
-
-import pytest
-from httpx import AsyncClient
-from movie_listing_app.main import app
-from tests.test_database import get_test_db, Base, engine
-from movie_listing_app.dependencies import get_db
-
-# Override the get_db dependency to use the test database
-app.dependency_overrides[get_db] = get_test_db
-
-# Create the test database tables
-Base.metadata.create_all(bind=engine)
-
-@pytest.mark.asyncio
-async def test_create_movie():
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        response = await ac.post("/auth/login", data={
-            "username": "testuser4",
-            "password": "password123"
-        })
-        token = response.json()["access_token"]
-
-        response = await ac.post("/movies/", json={
-            "title": "Inception",
-            "release_year": 2010,
-            "genre": "Sci-Fi",
-            "synopsis": "A thief who steals corporate secrets through the use of dream-sharing technology..."
-        }, headers={"Authorization": f"Bearer {token}"})
-    assert response.status_code == 201
-    assert response.json()["title"] == "Inception"
-
-@pytest.mark.asyncio
-async def test_get_movies():
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        response = await ac.get("/movies/")
-    assert response.status_code == 200
-    assert isinstance(response.json(), list)
+# tests/test_movies.py
+
+import uuid
+import pytest
+from httpx import AsyncClient
+from movie_listing_app.main import app
+from tests.test_database import get_test_db, Base, engine, TestingSessionLocal, count_queries
+from movie_listing_app.dependencies import get_db, get_read_db
+from movie_listing_app import crud, models
+
+# Override the get_db and get_read_db dependencies to use the test database
+app.dependency_overrides[get_db] = get_test_db
+app.dependency_overrides[get_read_db] = get_test_db
+
+# Create the test database tables
+Base.metadata.create_all(bind=engine)
+
+@pytest.mark.asyncio
+async def test_create_movie():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/auth/login", data={
+            "username": "testuser4",
+            "password": "password123"
+        })
+        token = response.json()["access_token"]
+
+        response = await ac.post("/movies/", json={
+            "title": "Inception",
+            "release_year": 2010,
+            "genre": "Sci-Fi",
+            "synopsis": "A thief who steals corporate secrets through the use of dream-sharing technology..."
+        }, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 201
+    assert response.json()["title"] == "Inception"
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("title", ["search", "filter", "batch"])
+async def test_read_movie_titled_like_a_listing_route(title):
+    db = TestingSessionLocal()
+    try:
+        owner = db.query(models.User).filter(models.User.username == "testuser4").first()
+        db.add(models.Movie(title=title, owner_id=owner.id))
+        db.commit()
+    finally:
+        db.close()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get(f"/movies/{title}")
+    assert response.status_code == 200
+    assert response.json()["title"] == title
+
+@pytest.mark.asyncio
+async def test_delete_movie_cascades_in_the_database():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/auth/login", data={
+            "username": "testuser4",
+            "password": "password123"
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await ac.post("/movies/", json={"title": f"Doomed {uuid.uuid4().hex[:8]}"}, headers=headers)
+        movie_id = response.json()["id"]
+        owner_id = response.json()["owner_id"]
+
+        db = TestingSessionLocal()
+        try:
+            db.add(models.Rating(rating=4, user_id=owner_id, movie_id=movie_id))
+            root = models.Comment(comment="root", user_id=owner_id, movie_id=movie_id)
+            db.add(root)
+            db.flush()
+            db.add(models.Comment(comment="reply", user_id=owner_id, movie_id=movie_id, parent_comment_id=root.id))
+            db.commit()
+        finally:
+            db.close()
+
+        with count_queries() as queries:
+            response = await ac.delete(f"/movies/{movie_id}", headers=headers)
+    assert response.status_code == 200
+    # the ratings and comments are deleted by ON DELETE CASCADE, never loaded
+    assert [query.split()[0] for query in queries if "ratings" in query or "comments" in query] == []
+    assert [query.split()[0] for query in queries][-1] == "DELETE"
+    db = TestingSessionLocal()
+    try:
+        assert db.query(models.Rating).filter(models.Rating.movie_id == movie_id).count() == 0
+        assert db.query(models.Comment).filter(models.Comment.movie_id == movie_id).count() == 0
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_read_movies_batch_in_request_order():
+    suffix = uuid.uuid4().hex[:8]
+    db = TestingSessionLocal()
+    try:
+        owner = models.User(first_name="batch", last_name="owner", username=f"batch_{suffix}",
+                            email=f"batch_{suffix}@example.com", password="not-a-real-hash")
+        db.add(owner)
+        db.flush()
+        movies = [models.Movie(title=f"Batch {name} {suffix}", owner_id=owner.id) for name in ("One", "Two", "Three")]
+        db.add_all(movies)
+        db.commit()
+        ids = [movie.id for movie in movies]
+    finally:
+        db.close()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        with count_queries() as queries:
+            response = await ac.get("/movies/-/batch", params={"ids": [ids[2], 0, ids[0], ids[2]]})
+        by_title = await ac.get("/movies/-/batch", params={"titles": [f"batch two {suffix}", "Missing", f"BATCH ONE {suffix}"]})
+        summary = await ac.get("/movies/-/batch", params={"ids": [ids[1], 0], "view": "summary"})
+        neither = await ac.get("/movies/-/batch")
+        both = await ac.get("/movies/-/batch", params={"ids": [ids[0]], "titles": ["Batch"]})
+        too_many = await ac.get("/movies/-/batch", params={"ids": list(range(crud.MAX_BATCH_MOVIES + 1))})
+    assert response.status_code == 200
+    # one IN query with the owners joined
+    assert len(queries) == 1
+    assert [movie and movie["id"] for movie in response.json()] == [ids[2], None, ids[0], ids[2]]
+    assert response.json()[0]["owner"]["username"] == f"batch_{suffix}"
+    assert [movie and movie["id"] for movie in by_title.json()] == [ids[1], None, ids[0]]
+    assert "owner" not in summary.json()[0]
+    assert summary.json()[1] is None
+    assert neither.status_code == both.status_code == 400
+    assert too_many.status_code == 422
+
+@pytest.mark.asyncio
+async def test_get_movies():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/movies/")
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+def seed_movies_with_distinct_owners(count: int, ratings=()):
+    # every movie gets its own owner so a lazy owner load would cost one query per row
+    db = TestingSessionLocal()
+    try:
+        for index in range(count):
+            suffix = uuid.uuid4().hex[:8]
+            owner = models.User(
+                first_name="seed",
+                last_name="owner",
+                username=f"owner_{suffix}",
+                email=f"owner_{suffix}@example.com",
+                password="not-a-real-hash"
+            )
+            db.add(owner)
+            db.flush()
+            rating = ratings[index] if index < len(ratings) else None
+            db.add(models.Movie(title=f"Seed Movie {suffix}", release_year=2000, genre="Drama", rating=rating, owner_id=owner.id))
+        db.commit()
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_get_movies_query_count_is_flat():
+    seed_movies_with_distinct_owners(5)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        with count_queries() as small_page:
+            response = await ac.get("/movies/", params={"limit": 1})
+        assert response.status_code == 200
+        with count_queries() as large_page:
+            response = await ac.get("/movies/", params={"limit": 5})
+        assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert len(small_page) == len(large_page) == 1
+
+@pytest.mark.asyncio
+async def test_get_movies_cursor_pagination_by_rating():
+    seed_movies_with_distinct_owners(5, ratings=(4.5, 2.0, 4.5, None, 3.0))
+    db = TestingSessionLocal()
+    try:
+        total = db.query(models.Movie).count()
+    finally:
+        db.close()
+
+    seen = []
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        params = {"pagination": "cursor", "order_by": "rating", "limit": 2}
+        while True:
+            response = await ac.get("/movies/", params=params)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page["items"]) <= 2
+            seen.extend(page["items"])
+            if page["next_cursor"] is None:
+                break
+            params["cursor"] = page["next_cursor"]
+
+    assert len(seen) == total
+    assert len({movie["id"] for movie in seen}) == total
+    rated = [movie["rating"] for movie in seen if movie["rating"] is not None]
+    assert rated == sorted(rated, reverse=True)
+    # unrated movies are listed after every rated one
+    assert all(movie["rating"] is None for movie in seen[len(rated):])
+
+@pytest.mark.asyncio
+async def test_get_movies_rejects_foreign_cursor():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/movies/", params={"pagination": "cursor", "limit": 1})
+        cursor = response.json()["next_cursor"]
+        response = await ac.get("/movies/", params={"order_by": "rating", "cursor": cursor})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_search_movies_ranks_and_follows_updates():
+    suffix = uuid.uuid4().hex[:8]
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/auth/login", data={
+            "username": "testuser4",
+            "password": "password123"
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = await ac.post("/movies/", json={
+            "title": f"Zorblax {suffix}",
+            "genre": "Sci-Fi",
+            "synopsis": "An astronaut drifts through space."
+        }, headers=headers)
+        title_match_id = response.json()["id"]
+        response = await ac.post("/movies/", json={
+            "title": f"Quiet Harbor {suffix}",
+            "genre": "Drama",
+            "synopsis": f"A sailor dreams of Zorblax {suffix}."
+        }, headers=headers)
+        synopsis_match_id = response.json()["id"]
+
+        response = await ac.get("/movies/-/search", params={"q": f"zorblax {suffix}"})
+        assert response.status_code == 200
+        results = response.json()
+        assert [result["movie"]["id"] for result in results] == [title_match_id, synopsis_match_id]
+        assert results[0]["score"] > results[1]["score"]
+
+        response = await ac.put(f"/movies/{synopsis_match_id}", json={
+            "title": f"Quiet Harbor {suffix}",
+            "genre": "Drama",
+            "synopsis": "A sailor stays home."
+        }, headers=headers)
+        assert response.status_code == 200
+        response = await ac.get("/movies/-/search", params={"q": f"zorblax {suffix}"})
+    assert [result["movie"]["id"] for result in response.json()] == [title_match_id]
+
+@pytest.mark.asyncio
+async def test_import_movies_streams_batches_and_reports_bad_rows():
+    suffix = uuid.uuid4().hex[:8]
+    ndjson = "\n".join([
+        f'{{"title": "Imported One {suffix}", "release_year": 1999, "genre": "Drama"}}',
+        f'{{"title": "Imported Café {suffix}"}}',
+        "",
+        '{"release_year": 2001}',
+        "not json",
+        f'{{"title": "Imported Three {suffix}", "release_year": "soon"}}',
+        f'{{"title": "Imported Four {suffix}", "synopsis": "Last line without a newline"}}',
+    ])
+    csv_body = (
+        "title,release_year,genre,synopsis\r\n"
+        f'Imported Five {suffix},2005,,"A synopsis, with a comma\r\nand a line break"\r\n'
+        f"Imported Six {suffix},,Comedy,\r\n"
+    )
+
+    async def chunked(body: str):
+        # split inside lines and multi-byte characters, like a real upload would be
+        raw = body.encode()
+        for start in range(0, len(raw), 7):
+            yield raw[start:start + 7]
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/movies/import", content=ndjson.encode())
+        assert response.status_code == 401
+
+        response = await ac.post("/auth/login", data={
+            "username": "testuser4",
+            "password": "password123"
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = await ac.post("/movies/import", params={"batch_size": 2}, content=chunked(ndjson), headers=headers)
+        assert response.status_code == 200
+        report = response.json()
+        assert report["imported"] == 3
+        assert report["failed"] == 3
+        assert [error["line"] for error in report["errors"]] == [4, 5, 6]
+        assert "title" in report["errors"][0]["error"]
+        assert "release_year" in report["errors"][2]["error"]
+
+        response = await ac.post("/movies/import", params={"format": "csv"}, content=chunked(csv_body), headers=headers)
+        assert response.json() == {"imported": 2, "failed": 0, "errors": [], "errors_truncated": False}
+
+        response = await ac.get(f"/movies/imported five {suffix}", params={"movie_title": f"imported five {suffix}"})
+    assert response.status_code == 200
+    movie = response.json()
+    assert movie["genre"] is None
+    assert movie["synopsis"] == "A synopsis, with a comma\r\nand a line break"
+    assert movie["owner"]["username"] == "testuser4"
+
+    db = TestingSessionLocal()
+    try:
+        imported = db.query(models.Movie).filter(models.Movie.title.like(f"Imported % {suffix}")).all()
+    finally:
+        db.close()
+    assert len(imported) == 5
+    assert all(movie.title_normalized == movie.title.lower() for movie in imported)
+
+def seed_filter_movies(genre: str):
+    db = TestingSessionLocal()
+    try:
+        owner = db.query(models.User).filter(models.User.username == "testuser4").first()
+        movies = [
+            models.Movie(title="beta", release_year=1995, genre=genre, rating=4.0, owner_id=owner.id),
+            models.Movie(title="Alpha", release_year=2001, genre=genre, rating=4.0, owner_id=owner.id),
+            models.Movie(title="delta", release_year=2003, genre=genre, rating=2.5, owner_id=owner.id),
+            models.Movie(title="Gamma", release_year=2005, genre=genre, rating=None, owner_id=owner.id),
+            models.Movie(title="Epsilon", release_year=None, genre=genre, rating=5.0, owner_id=owner.id),
+            models.Movie(title="Zeta", release_year=2002, genre=f"{genre} other", rating=4.5, owner_id=owner.id),
+        ]
+        db.add_all(movies)
+        db.commit()
+    finally:
+        db.close()
+
+async def read_all_pages(ac: AsyncClient, params: dict):
+    titles = []
+    while True:
+        response = await ac.get("/movies/-/filter", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        titles.extend(movie["title"] for movie in page["items"])
+        if page["next_cursor"] is None:
+            return titles
+        params = dict(params, cursor=page["next_cursor"])
+
+@pytest.mark.asyncio
+async def test_filter_movies_combines_filters_and_sorts():
+    genre = f"Genre {uuid.uuid4().hex[:8]}"
+    seed_filter_movies(genre)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        by_rating = await read_all_pages(ac, {"genre": genre, "limit": 2})
+        by_title = await read_all_pages(ac, {"genre": genre, "sort": "title", "limit": 2})
+        in_range = await read_all_pages(ac, {"genre": genre, "year_from": 2000, "year_to": 2004, "sort": "release_year", "limit": 1})
+        rated = await read_all_pages(ac, {"genre": genre, "min_rating": 4, "sort": "title"})
+
+        response = await ac.get("/movies/-/filter", params={"genre": genre, "sort": "title", "limit": 1})
+        response = await ac.get("/movies/-/filter", params={"genre": genre, "sort": "rating", "cursor": response.json()["next_cursor"]})
+    assert response.status_code == 400
+
+    # ties on the rating are broken by the newest id first, unrated movies come last
+    assert by_rating == ["Epsilon", "Alpha", "beta", "delta", "Gamma"]
+    assert by_title == ["Alpha", "beta", "delta", "Epsilon", "Gamma"]
+    assert in_range == ["delta", "Alpha"]
+    assert rated == ["Alpha", "beta", "Epsilon"]
+
+@pytest.mark.asyncio
+async def test_summary_view_reads_only_summary_columns():
+    genre = f"Genre {uuid.uuid4().hex[:8]}"
+    seed_filter_movies(genre)
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        full = await ac.get("/movies/-/filter", params={"genre": genre, "sort": "title", "limit": 2})
+        with count_queries() as queries:
+            summary = await ac.get("/movies/-/filter", params={"genre": genre, "sort": "title", "limit": 2, "view": "summary"})
+        next_page = await ac.get("/movies/-/filter", params={
+            "genre": genre, "sort": "title", "limit": 2, "view": "summary", "cursor": summary.json()["next_cursor"]
+        })
+        listed = await ac.get("/movies/", params={"limit": 1, "view": "summary"})
+    assert summary.status_code == 200
+    assert [movie["title"] for movie in summary.json()["items"]] == [movie["title"] for movie in full.json()["items"]]
+    assert set(summary.json()["items"][0]) == {"id", "title", "release_year", "genre", "rating", "rating_count", "comment_count"}
+    assert set(full.json()["items"][0]) >= {"synopsis", "owner"}
+    assert [movie["title"] for movie in next_page.json()["items"]] == ["delta", "Epsilon"]
+    assert set(listed.json()[0]) == {"id", "title", "release_year", "genre", "rating", "rating_count", "comment_count"}
+    # one query, without the synopsis column or the owner join
+    assert len(queries) == 1
+    assert "synopsis" not in queries[0]
+    assert "users" not in queries[0]
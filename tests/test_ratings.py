@@ -1,34 +1,409 @@
-# tests/test_ratings.py
-
-import pytest
-from httpx import AsyncClient
-from movie_listing_app.main import app
-from tests.test_database import get_test_db, Base, engine
-from movie_listing_app.dependencies import get_db
-
-# Override the get_db dependency to use the test database
-app.dependency_overrides[get_db] = get_test_db
-
-# Create the test database tables
-Base.metadata.create_all(bind=engine)
-
-@pytest.mark.asyncio
-async def test_create_rating():
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        response = await ac.post("/auth/login", data={
-            "username": "testuser4",
-            "password": "password123"
-        })
-        token = response.json()["access_token"]
-
-        response = await ac.get("/movies/")
-        movie_id = response.json()[0]["id"]
-
-        response = await ac.post("/ratings/", json={
-            "rating": 5,
-            "review": "Amazing movie!",
-            "movie_id": movie_id
-        }, headers={"Authorization": f"Bearer {token}"})
-    assert response.status_code == 201
-    assert response.json()["rating"] == 5
-
+# tests/test_ratings.py
+
+import threading
+import uuid
+import pytest
+from httpx import AsyncClient
+from movie_listing_app.main import app
+from tests.test_database import get_test_db, Base, engine, TestingSessionLocal, count_queries
+from movie_listing_app.dependencies import get_db, get_read_db
+from movie_listing_app import models, crud, schemas
+
+# Override the get_db and get_read_db dependencies to use the test database
+app.dependency_overrides[get_db] = get_test_db
+app.dependency_overrides[get_read_db] = get_test_db
+
+# Create the test database tables
+Base.metadata.create_all(bind=engine)
+
+@pytest.mark.asyncio
+async def test_create_rating():
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/auth/login", data={
+            "username": "testuser4",
+            "password": "password123"
+        })
+        token = response.json()["access_token"]
+
+        response = await ac.get("/movies/")
+        movie_id = response.json()[0]["id"]
+
+        response = await ac.post("/ratings/", json={
+            "rating": 5,
+            "review": "Amazing movie!",
+            "movie_id": movie_id
+        }, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 201
+    assert response.json()["rating"] == 5
+
+@pytest.mark.asyncio
+async def test_average_rating_by_title_ignores_case_and_spacing():
+    suffix = uuid.uuid4().hex[:8]
+    db = TestingSessionLocal()
+    try:
+        owner = db.query(models.User).filter(models.User.username == "testuser4").first()
+        db.add(models.Movie(title=f"Crème Brûlée {suffix}", rating=4.0, owner_id=owner.id))
+        db.commit()
+    finally:
+        db.close()
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get(f"/ratings/by_title/  CRÈME   brûlée {suffix.upper()} /")
+    assert response.status_code == 200
+    assert response.json() == 4.0
+
+async def login(ac: AsyncClient, username: str = "testuser4"):
+    response = await ac.post("/auth/login", data={"username": username, "password": "password123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def seed_movie(title_prefix: str = "Rated Movie"):
+    db = TestingSessionLocal()
+    try:
+        owner = db.query(models.User).filter(models.User.username == "testuser4").first()
+        movie = models.Movie(title=f"{title_prefix} {uuid.uuid4().hex[:8]}", owner_id=owner.id)
+        db.add(movie)
+        db.commit()
+        return movie.id
+    finally:
+        db.close()
+
+def get_movie(movie_id: int):
+    db = TestingSessionLocal()
+    try:
+        return db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_rating_aggregates_follow_creates_and_deletes():
+    movie_id = seed_movie()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        raters = [await login(ac), await login(ac, seed_user())]
+        rating_ids = []
+        for score, headers in zip((5, 2), raters):
+            response = await ac.post("/ratings/", json={"rating": score, "movie_id": movie_id}, headers=headers)
+            assert response.status_code == 201
+            rating_ids.append(response.json()["id"])
+
+        movie = get_movie(movie_id)
+        assert (movie.rating_sum, movie.rating_count, movie.rating) == (7, 2, 3.5)
+
+        response = await ac.delete(f"/ratings/{rating_ids[0]}", headers=raters[0])
+        assert response.status_code == 200
+        movie = get_movie(movie_id)
+        assert (movie.rating_sum, movie.rating_count, movie.rating) == (2, 1, 2.0)
+
+        response = await ac.delete(f"/ratings/{rating_ids[1]}", headers=raters[1])
+        assert response.status_code == 200
+        movie = get_movie(movie_id)
+        assert (movie.rating_sum, movie.rating_count, movie.rating) == (0, 0, None)
+
+def test_recompute_movie_ratings_repairs_drift():
+    movie_id = seed_movie()
+    db = TestingSessionLocal()
+    try:
+        raters = db.query(models.User).filter(models.User.username.in_([seed_user(), seed_user()])).all()
+        db.add_all([
+            models.Rating(rating=4, user_id=raters[0].id, movie_id=movie_id),
+            models.Rating(rating=3, user_id=raters[1].id, movie_id=movie_id),
+        ])
+        db.commit()
+
+        assert crud.recompute_movie_ratings(db, movie_ids=[movie_id]) == 1
+        db.commit()
+        movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+        assert (movie.rating_sum, movie.rating_count, movie.rating) == (7, 2, 3.5)
+        assert crud.recompute_movie_ratings(db, movie_ids=[movie_id]) == 0
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_rating_again_replaces_the_previous_rating():
+    movie_id = seed_movie()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        headers = await login(ac)
+        with count_queries() as queries:
+            response = await ac.post("/ratings/", json={"rating": 4, "movie_id": movie_id}, headers=headers)
+        assert response.status_code == 201
+        assert response.json()["movie"]["rating_count"] == 1
+        rating_id = response.json()["id"]
+        # the user lookup of the authentication, locking the movie, the previous score, the insert and the aggregate update
+        assert [query.split()[0] for query in queries] == ["SELECT", "SELECT", "SELECT", "INSERT", "UPDATE"]
+
+        response = await ac.post(f"/ratings/title/{get_movie(movie_id).title}/", json={
+            "rating": 2, "review": "Worse the second time", "movie_id": movie_id
+        }, headers=headers)
+        assert response.status_code == 201
+        assert response.json()["id"] == rating_id
+        assert response.json()["review"] == "Worse the second time"
+
+        response = await ac.post("/ratings/", json={"rating": 4, "movie_id": 0}, headers=headers)
+    assert response.status_code == 404
+
+    movie = get_movie(movie_id)
+    assert (movie.rating_sum, movie.rating_count, movie.rating) == (2, 1, 2.0)
+    assert (movie.rating_2_count, movie.rating_4_count) == (1, 0)
+    db = TestingSessionLocal()
+    try:
+        assert db.query(models.Rating).filter(models.Rating.movie_id == movie_id).count() == 1
+    finally:
+        db.close()
+
+def seed_user(role: str = "user"):
+    db = TestingSessionLocal()
+    try:
+        suffix = uuid.uuid4().hex[:8]
+        user = models.User(
+            first_name="seed",
+            last_name="user",
+            username=f"{role}_{suffix}",
+            email=f"{role}_{suffix}@example.com",
+            password=crud.pwd_context.hash("password123"),
+            role=role
+        )
+        db.add(user)
+        db.commit()
+        return user.username
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_bulk_ratings_resolve_names_and_recompute_once():
+    admin = seed_user("admin")
+    rater = seed_user()
+    first_id, second_id = seed_movie("Bulk Rated"), seed_movie("Bulk Rated")
+    second_title = get_movie(second_id).title
+    ratings = [
+        {"rating": 5, "username": rater, "movie_id": first_id},
+        {"rating": 3, "username": "testuser4", "title": second_title.upper()},
+        {"rating": 1, "username": "no-such-user", "movie_id": first_id},
+        {"rating": 4, "username": rater, "title": "No Such Movie"},
+        {"rating": 2, "username": rater, "movie_id": 0},
+        {"rating": 4, "username": admin, "title": f"  {second_title}  ", "review": "Good"},
+        {"rating": 2, "username": admin, "movie_id": first_id},
+        {"rating": 3, "username": rater, "movie_id": first_id},
+    ]
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/auth/login", data={"username": rater, "password": "password123"})
+        response = await ac.post("/ratings/bulk", json={"ratings": ratings}, headers={
+            "Authorization": f"Bearer {response.json()['access_token']}"
+        })
+        assert response.status_code == 403
+
+        response = await ac.post("/auth/login", data={"username": admin, "password": "password123"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await ac.post("/ratings/bulk", json={"ratings": [{"rating": 5, "movie_id": first_id}]}, headers=headers)
+        assert response.status_code == 422
+
+        with count_queries() as queries:
+            response = await ac.post("/ratings/bulk", json={"ratings": ratings}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "inserted": 4,
+        "failed": 3,
+        "errors": [
+            {"index": 2, "error": "User not found"},
+            {"index": 3, "error": "Movie not found"},
+            {"index": 4, "error": "Movie not found"},
+        ],
+        "movies_updated": 2,
+    }
+    # authentication, one lookup per kind of reference used, one insert, the two statements of the recompute
+    # and the version increment of the affected movies
+    assert [query.split()[0] for query in queries] == ["SELECT"] * 4 + ["INSERT", "UPDATE", "UPDATE", "UPDATE"]
+
+    # the rater's second rating of the first movie replaced the first one
+    first, second = get_movie(first_id), get_movie(second_id)
+    assert (first.rating_sum, first.rating_count, first.rating) == (5, 2, 2.5)
+    assert (second.rating_sum, second.rating_count, second.rating) == (7, 2, 3.5)
+
+@pytest.mark.asyncio
+async def test_rating_stats_follow_histogram():
+    movie_id = seed_movie("Histogram")
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get(f"/ratings/movie_stats/{movie_id}")
+        assert response.json() == {
+            "movie_id": movie_id, "rating_count": 0, "histogram": {str(score): 0 for score in range(1, 6)},
+            "mean": None, "median": None, "std_dev": None,
+        }
+
+        raters = [await login(ac, seed_user()) for _ in range(5)]
+        response = await ac.post("/ratings/", json={"rating": 6, "movie_id": movie_id}, headers=raters[0])
+        assert response.status_code == 422
+        rating_ids = []
+        for score, headers in zip((5, 1, 4, 5, 2), raters):
+            response = await ac.post("/ratings/", json={"rating": score, "movie_id": movie_id}, headers=headers)
+            rating_ids.append(response.json()["id"])
+        response = await ac.delete(f"/ratings/{rating_ids[1]}", headers=raters[1])
+        assert response.status_code == 200
+
+        with count_queries() as queries:
+            response = await ac.get(f"/ratings/movie_stats/{movie_id}")
+        assert len(queries) == 1
+        stats = response.json()
+
+        response = await ac.get("/ratings/movie_stats/0")
+    assert response.status_code == 404
+
+    assert stats["rating_count"] == 4
+    assert stats["histogram"] == {"1": 0, "2": 1, "3": 0, "4": 1, "5": 2}
+    assert stats["mean"] == 4.0
+    assert stats["median"] == 4.5
+    assert stats["std_dev"] == pytest.approx(1.2247449)
+
+    db = TestingSessionLocal()
+    try:
+        # the maintained histogram matches the ratings table
+        assert crud.recompute_movie_ratings(db, movie_ids=[movie_id]) == 0
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_rating_lists_summary_view():
+    movie_id = seed_movie("Summary")
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        headers = await login(ac, seed_user())
+        await ac.post("/ratings/", json={"rating": 3, "review": "a long review " * 50, "movie_id": movie_id}, headers=headers)
+        full = await ac.get(f"/ratings/movie_ratings/{movie_id}")
+        with count_queries() as queries:
+            summary = await ac.get(f"/ratings/movie_ratings/{movie_id}", params={"view": "summary"})
+    assert full.json()[0]["review"].startswith("a long review")
+    assert summary.json() == [{
+        "id": full.json()[0]["id"], "rating": 3, "user_id": full.json()[0]["user_id"], "movie_id": movie_id
+    }]
+    # the movie version for the ETag and the ratings
+    assert len(queries) == 2
+    assert "review" not in queries[1]
+
+@pytest.mark.asyncio
+async def test_conditional_reads_follow_movie_version():
+    movie_id = seed_movie("Conditional")
+    title = get_movie(movie_id).title
+    paths = [f"/movies/{title}", f"/ratings/movie_ratings/{movie_id}", f"/ratings/movie_stats/{movie_id}", f"/ratings/by_title/{title}/"]
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        before = [(await ac.get(path)).headers["ETag"] for path in paths]
+        for path, etag in zip(paths, before):
+            with count_queries() as queries:
+                response = await ac.get(path, headers={"If-None-Match": etag})
+            assert response.status_code == 304
+            assert response.headers["ETag"] == etag
+            assert response.content == b""
+            # only the version lookup
+            assert len(queries) == 1
+        response = await ac.get(paths[0], headers={"If-None-Match": f'"stale", W/{before[0]}'})
+        assert response.status_code == 304
+
+        await ac.post("/ratings/", json={"rating": 4, "movie_id": movie_id}, headers=await login(ac, seed_user()))
+        after = []
+        for path, etag in zip(paths, before):
+            response = await ac.get(path, headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            after.append(response.headers["ETag"])
+    assert len(set(before)) == len(before)
+    assert all(new != old for new, old in zip(after, before))
+    assert get_movie(movie_id).version == 2
+
+def test_insert_or_update_ratings_without_on_conflict():
+    movie_id = seed_movie("Portable")
+    db = TestingSessionLocal()
+    try:
+        usernames = [seed_user(), seed_user()]
+        first, second = (db.query(models.User).filter(models.User.username == name).one().id for name in usernames)
+        db.add(models.Rating(rating=1, review="old", user_id=first, movie_id=movie_id))
+        db.commit()
+        crud.insert_or_update_ratings(db, [
+            {"rating": 5, "review": None, "user_id": first, "movie_id": movie_id},
+            {"rating": 3, "review": "new", "user_id": second, "movie_id": movie_id},
+        ])
+        db.commit()
+        ratings = db.query(models.Rating).filter(models.Rating.movie_id == movie_id).order_by(models.Rating.user_id).all()
+        assert [(rating.user_id, rating.rating, rating.review) for rating in ratings] == [(first, 5, None), (second, 3, "new")]
+    finally:
+        db.close()
+
+@pytest.mark.asyncio
+async def test_out_of_range_ratings_are_still_listed_and_deleted():
+    movie_id = seed_movie("Legacy")
+    username = seed_user()
+    db = TestingSessionLocal()
+    try:
+        user_id = db.query(models.User).filter(models.User.username == username).one().id
+        # stored before the 1 to 5 bound was validated
+        rating = models.Rating(rating=7, user_id=user_id, movie_id=movie_id)
+        db.add(rating)
+        db.commit()
+        crud.recompute_movie_ratings(db, [movie_id])
+        db.commit()
+        rating_id = rating.id
+    finally:
+        db.close()
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get(f"/ratings/movie_ratings/{movie_id}")
+        assert response.status_code == 200
+        assert response.json()[0]["rating"] == 7
+        response = await ac.delete(f"/ratings/{rating_id}", headers=await login(ac, username))
+        assert response.status_code == 200
+        response = await ac.post("/ratings/", json={"rating": 7, "movie_id": movie_id}, headers=await login(ac, username))
+        assert response.status_code == 422
+    assert get_movie(movie_id).rating_count == 0
+
+def test_concurrent_ratings_by_one_user_keep_one_rating():
+    movie_id = seed_movie("Double Submit")
+    username = seed_user()
+    db = TestingSessionLocal()
+    try:
+        user_id = db.query(models.User).filter(models.User.username == username).one().id
+    finally:
+        db.close()
+    scores = [1, 2, 3, 4, 5, 4, 3, 2]
+    start = threading.Barrier(len(scores))
+    errors = []
+
+    def submit(score: int):
+        session = TestingSessionLocal()
+        try:
+            start.wait()
+            crud.rate_movie(session, movie_id=movie_id, rating=schemas.RatingBase(rating=score), user_id=user_id)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=submit, args=(score,)) for score in scores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    db = TestingSessionLocal()
+    try:
+        ratings = db.query(models.Rating).filter(models.Rating.movie_id == movie_id).all()
+    finally:
+        db.close()
+    assert len(ratings) == 1
+    movie = get_movie(movie_id)
+    assert (movie.rating_count, movie.rating_sum) == (1, ratings[0].rating)
+    assert [movie.rating_1_count, movie.rating_2_count, movie.rating_3_count, movie.rating_4_count, movie.rating_5_count] == [
+        int(score == ratings[0].rating) for score in models.RATING_SCORES
+    ]
+
+def test_delete_rating_subtracts_the_score_it_deleted():
+    movie_id = seed_movie("Stale Delete")
+    username = seed_user()
+    db = TestingSessionLocal()
+    other = TestingSessionLocal()
+    try:
+        user_id = db.query(models.User).filter(models.User.username == username).one().id
+        rating_id = crud.rate_movie(db, movie_id=movie_id, rating=schemas.RatingBase(rating=2), user_id=user_id).id
+        # a second submit changes the score after this session read the rating
+        assert crud.get_rating(db, rating_id=rating_id).rating == 2
+        crud.rate_movie(other, movie_id=movie_id, rating=schemas.RatingBase(rating=5, review="changed"), user_id=user_id)
+        deleted = crud.delete_rating(db, rating_id=rating_id)
+        assert (deleted.id, deleted.rating, deleted.user.username, deleted.movie.id) == (rating_id, 5, username, movie_id)
+        assert crud.delete_rating(db, rating_id=rating_id) is None
+    finally:
+        other.close()
+        db.close()
+    movie = get_movie(movie_id)
+    assert (movie.rating_sum, movie.rating_count, movie.rating_2_count, movie.rating_5_count) == (0, 0, 0, 0)
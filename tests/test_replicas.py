@@ -0,0 +1,78 @@
+# tests/test_replicas.py
+
+import uuid
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from movie_listing_app.main import app
+from tests.test_database import get_test_db, Base, engine, TestingSessionLocal
+from movie_listing_app.dependencies import get_db, get_read_db, READ_PRIMARY_COOKIE
+from movie_listing_app import database
+
+# Override the get_db and get_read_db dependencies to use the test database
+app.dependency_overrides[get_db] = get_test_db
+app.dependency_overrides[get_read_db] = get_test_db
+
+# Create the test database tables
+Base.metadata.create_all(bind=engine)
+
+def stale_replica():
+    # an empty in-memory database stands in for a replica that has not replayed any writes yet
+    replica = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=replica)
+    return replica
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_until_client_writes(monkeypatch):
+    replica = stale_replica()
+    monkeypatch.setattr(database, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(database, "replica_engines", [replica])
+    monkeypatch.setattr(database, "replica_selector", database.ReplicaSelector([replica]))
+    monkeypatch.delitem(app.dependency_overrides, get_read_db)
+    genre = f"Replica {uuid.uuid4().hex[:8]}"
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.post("/auth/login", data={
+            "username": "testuser4",
+            "password": "password123"
+        })
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        response = await ac.post("/movies/", json={"title": "Replicated", "release_year": 2020, "genre": genre}, headers=headers)
+        assert response.status_code == 201
+        assert f"{READ_PRIMARY_COOKIE}=1" in response.headers["set-cookie"]
+        assert "Max-Age=5" in response.headers["set-cookie"]
+
+        # the client that wrote reads from the primary
+        response = await ac.get("/movies/-/filter", params={"genre": genre})
+        assert response.status_code == 200
+        assert [movie["genre"] for movie in response.json()["items"]] == [genre]
+
+    # other clients read from the replica, which does not have the movie yet
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/movies/-/filter", params={"genre": genre})
+        assert response.status_code == 200
+        assert response.json()["items"] == []
+        assert "set-cookie" not in response.headers
+
+def test_replica_selector_strategies():
+    class FakePool:
+        def __init__(self, checked_out):
+            self.checked_out = checked_out
+
+        def checkedout(self):
+            return self.checked_out
+
+    class FakeEngine:
+        def __init__(self, checked_out):
+            self.pool = FakePool(checked_out)
+
+    first, second, third = FakeEngine(2), FakeEngine(0), FakeEngine(0)
+    round_robin = database.ReplicaSelector([first, second, third])
+    assert [round_robin.choose() for _ in range(4)] == [first, second, third, first]
+
+    least_busy = database.ReplicaSelector([first, second, third], "least_busy")
+    assert [least_busy.choose() for _ in range(3)] == [second, second, third]
+
+    assert database.ReplicaSelector([]).choose() is database.engine